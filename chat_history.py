@@ -0,0 +1,224 @@
+"""Per-session chat history as CSV (see specs-new.md, Chat History).
+
+One file per session, named after its start time
+(`YYYY-MM-DD_HH-MM-SS.csv`); past `max_bytes` it is rotated into
+`..._part2.csv`, `..._part3.csv` and so on. Closed files are optionally
+compressed (gzip, or zstd if the `zstandard` package is installed). Row
+timestamps are local time with their UTC offset, so the hour repeated when
+DST ends stays unambiguous.
+
+append() only extends an in-memory buffer under a lock, so it can be called
+from the chat client's thread at any rate; a writer thread drains the buffer
+in batches, flushing every `flush_interval` seconds or as soon as
+`batch_size` rows are waiting. If the disk can't keep up, rows past
+`max_pending` are dropped (and counted) instead of growing memory without
+bound.
+
+    python chat_history.py --rows 200000 --rate 5000   # throughput check with synthetic rows
+"""
+import csv
+import gzip
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+try:
+    import zstandard
+except ImportError:  # zstd compression unavailable; gzip still works
+    zstandard = None
+
+COLUMNS = ["timestamp", "channel", "user", "display_name", "message", "bits"]
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def compress_file(path, compression):
+    """Compresses `path` next to itself and removes the original; returns the new path."""
+    if compression is None:
+        return path
+    target = path + COMPRESSION_SUFFIXES[compression]
+    tmp_path = target + ".tmp"
+    with open(path, "rb") as source:
+        if compression == "gzip":
+            with gzip.open(tmp_path, "wb", compresslevel=6) as destination:
+                shutil.copyfileobj(source, destination, 1024 * 1024)
+        else:
+            with open(tmp_path, "wb") as destination:
+                zstandard.ZstdCompressor(level=10).copy_stream(source, destination)
+    os.replace(tmp_path, target)
+    os.remove(path)
+    return target
+
+
+class ChatHistoryWriter:
+    def __init__(self, directory, flush_interval=1.0, batch_size=500, max_bytes=64 * 1024 * 1024, compression="gzip", max_pending=200000, on_file_closed=None):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            print("Chat history: zstandard not installed, compressing with gzip")
+            compression = "gzip"
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.max_pending = max_pending
+        self.on_file_closed = on_file_closed  # callable(path), on the writer thread, for each finished (compressed) file
+        self.session_name = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.files_closed = 0
+        self._part = 0
+        self._file = None
+        self._csv = None
+        self._path = None
+        self._pending = []
+        self._condition = threading.Condition()
+        self._stopping = False
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="chat-history", daemon=True)
+        self._thread.start()
+
+    @property
+    def path(self):
+        return self._path
+
+    def append(self, messages):
+        """Queues ChatMessages (anything with the COLUMNS' attributes) from any thread; never blocks on I/O."""
+        with self._condition:
+            room = self.max_pending - len(self._pending)
+            if room < len(messages):
+                self.rows_dropped += len(messages) - max(room, 0)
+                messages = messages[:max(room, 0)]
+            self._pending.extend(messages)
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    def close(self, timeout=5.0):
+        """Writes what is queued, closes (and compresses) the current file."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "pending": pending,
+            "files_closed": self.files_closed,
+            "path": self._path,
+        }
+
+    # Writer thread
+    def _run(self):
+        self._compress_leftovers()
+        while True:
+            with self._condition:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                batch, self._pending = self._pending, []
+                stopping = self._stopping
+            try:
+                if batch:
+                    self._write(batch)
+                if stopping:
+                    self._close_file()
+                    return
+            except OSError as e:
+                print(f"Chat history: Write failed, {len(batch)} rows lost: {e}")
+                self.rows_dropped += len(batch)
+
+    def _open_file(self):
+        self._part += 1
+        suffix = "" if self._part == 1 else f"_part{self._part}"
+        self._path = os.path.join(self.directory, f"{self.session_name}{suffix}.csv")
+        self._file = open(self._path, "w", encoding="utf-8", newline="", buffering=256 * 1024)
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(COLUMNS)
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        self._file.close()
+        path = self._path
+        self._file = self._csv = None
+        try:
+            path = compress_file(path, self.compression)
+        except OSError as e:
+            print(f"Chat history: Could not compress {path}: {e}")
+        self.files_closed += 1
+        if self.on_file_closed is not None:
+            self.on_file_closed(path)
+
+    def _write(self, batch):
+        # In slices, so a backlog drained at once still rotates close to max_bytes
+        for start in range(0, len(batch), self.batch_size):
+            if self._file is None:
+                self._open_file()
+            rows = batch[start:start + self.batch_size]
+            self._csv.writerows(
+                (datetime.fromtimestamp(message.timestamp, timezone.utc).astimezone().isoformat(timespec="milliseconds"), message.channel, message.user, message.display_name, message.text, message.bits)
+                for message in rows
+            )
+            self.rows_written += len(rows)
+            if self._file.tell() >= self.max_bytes:
+                self._close_file()
+        if self._file is not None:
+            self._file.flush()
+
+    def _compress_leftovers(self):
+        """Sessions that ended without close() (crash, kill) are still plain CSV; finish them now."""
+        if self.compression is None:
+            return
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".csv") and not name.startswith(self.session_name):
+                path = os.path.join(self.directory, name)
+                try:
+                    path = compress_file(path, self.compression)
+                except OSError as e:
+                    print(f"Chat history: Could not compress {path}: {e}")
+                    continue
+                if self.on_file_closed is not None:
+                    self.on_file_closed(path)
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import tempfile
+
+    from twitch_chat import ChatMessage
+
+    parser = argparse.ArgumentParser(description="Measure ChatHistoryWriter throughput with synthetic rows")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=50, help="rows per append(), like one socket read")
+    parser.add_argument("--compression", default="gzip", choices=["none", "gzip", "zstd"])
+    parser.add_argument("--max-mb", type=float, default=16)
+    parser.add_argument("--rate", type=float, default=0, help="rows/sec to append at (0: as fast as possible)")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    words = "gg lol pog that was insane lets go hype chat clip it first time here love the stream W o7".split()
+    messages = [ChatMessage("bench", f"user{i % 5000}", f"User{i % 5000}", " ".join(rng.choices(words, k=rng.randint(1, 16)))) for i in range(10000)]
+    with tempfile.TemporaryDirectory() as directory:
+        closed = []
+        writer = ChatHistoryWriter(directory, max_bytes=int(args.max_mb * 1024 * 1024), compression=None if args.compression == "none" else args.compression, on_file_closed=closed.append)
+        started = time.perf_counter()
+        append_seconds = 0.0
+        for i in range(0, args.rows, args.batch):
+            append_started = time.perf_counter()
+            writer.append(messages[i % len(messages):][:args.batch])
+            append_seconds += time.perf_counter() - append_started
+            ahead = (i + args.batch) / args.rate - (time.perf_counter() - started) if args.rate else 0
+            if ahead > 0:
+                time.sleep(ahead)
+        writer.close(timeout=None)
+        total_seconds = time.perf_counter() - started
+        size = sum(os.path.getsize(path) for path in closed)
+        print(f"append      {append_seconds / (args.rows / args.batch) * 1e6:.1f} us per append() of {args.batch} rows on the calling thread")
+        print(f"written     {writer.rows_written / total_seconds:.0f} rows/sec incl. compression, {writer.rows_dropped} dropped")
+        print(f"files       {len(closed)} ({size / 1048576:.1f} MB on disk)")
@@ -0,0 +1,373 @@
+"""SQLite FTS5 index over the chat history files written by chat_history.py.
+
+Finished session files are ingested incrementally (each session file once,
+whether it is found plain or compressed, in a single transaction) into a
+`messages` table with an external-content FTS5 index on the message text and
+user name. Timestamps are stored as UTC epoch milliseconds. A message's rowid
+is its timestamp shifted left by 10 bits plus a slot, allocated at ingestion
+to the first one no other row uses, so rowid order is time order: a time
+range is a rowid range, and "newest first" is a reverse rowid walk that FTS5
+and the primary key serve without sorting, however many rows match. Searching
+by user alone goes through an index on (user), which SQLite stores with the
+rowid, so it is the same walk. (Past 1024 messages in one millisecond the
+slots spill into the next millisecond's keys; those rows keep their exact
+`ts` but sort and range-filter up to that much late.)
+
+Ingestion and searching use separate connections; in WAL mode a search is
+never blocked by a file being ingested.
+
+    python chat_index.py --generate 5000000 --db /tmp/chat.sqlite3   # a year of synthetic chat, then timed queries
+"""
+import csv
+import gzip
+import io
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ROWID_SHIFT = 10  # 1024 slots per millisecond
+SCHEMA_VERSION = 2  # 2: ts column, allocated slots, files keyed by session file name without compression suffix
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    ts INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    user TEXT NOT NULL,
+    display_name TEXT NOT NULL,
+    message TEXT NOT NULL,
+    bits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_messages_user ON messages(user);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    message, user, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages
+BEGIN
+    INSERT INTO messages_fts (rowid, message, user) VALUES (NEW.id, NEW.message, NEW.user);
+END;
+"""
+
+_DROP_SCHEMA = """
+DROP TRIGGER IF EXISTS messages_fts_insert;
+DROP TABLE IF EXISTS messages_fts;
+DROP TABLE IF EXISTS messages;
+DROP TABLE IF EXISTS files;
+"""
+
+_INSERT_MESSAGE = "INSERT INTO messages (id, ts, channel, user, display_name, message, bits) VALUES (?, ?, ?, ?, ?, ?, ?)"
+_SELECT_IDS = "SELECT id FROM messages WHERE id BETWEEN ? AND ?"
+_INSERT_FILE = "INSERT OR REPLACE INTO files (name, size, rows, indexed_at) VALUES (?, ?, ?, ?)"
+_SELECT_FILES = "SELECT name FROM files"
+_FILE_INDEXED = "SELECT 1 FROM files WHERE name = ?"
+_COUNT_MESSAGES = "SELECT COUNT(*) FROM messages"
+_COLUMNS = "m.id, m.ts, m.channel, m.user, m.display_name, m.message, m.bits"
+_SEARCH_TEXT = (
+    f"SELECT {_COLUMNS} FROM messages_fts f JOIN messages m ON m.id = f.rowid "
+    "WHERE messages_fts MATCH ? AND f.rowid BETWEEN ? AND ? ORDER BY f.rowid DESC LIMIT ?"
+)
+_SEARCH_USER = f"SELECT {_COLUMNS} FROM messages m WHERE m.user = ? AND m.id BETWEEN ? AND ? ORDER BY m.id DESC LIMIT ?"
+_SEARCH_TIME = f"SELECT {_COLUMNS} FROM messages m WHERE m.id BETWEEN ? AND ? ORDER BY m.id DESC LIMIT ?"
+
+_HISTORY_FILE = re.compile(r"^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}(_part\d+)?\.csv(\.gz|\.zst)?$")
+_COMPRESSION_SUFFIX = re.compile(r"\.(gz|zst)$")
+_MAX_ROWID = (1 << 63) - 1
+_SLOTS = 1 << ROWID_SHIFT
+_BATCH_ROWS = 5000
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MILLISECOND = timedelta(milliseconds=1)
+
+
+@dataclass
+class ChatSearchResult:
+    timestamp: float
+    channel: str
+    user: str
+    display_name: str
+    message: str
+    bits: int
+
+
+def rowid_for(timestamp, slot=0):
+    return (int(timestamp * 1000) << ROWID_SHIFT) | slot
+
+
+def epoch_ms(text):
+    """A history file timestamp -> UTC epoch milliseconds.
+
+    ChatHistoryWriter writes local time with its UTC offset; files from before
+    that have no offset and are read as local time, which is ambiguous for the
+    repeated hour when DST ends.
+    """
+    parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone()
+    return (parsed - _EPOCH) // _MILLISECOND
+
+
+def _session_file(name):
+    """Index identity of a history file: a closed file is compressed after it is found plain, not changed."""
+    return _COMPRESSION_SUFFIX.sub("", name)
+
+
+def _open_history_file(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise OSError("zstandard is not installed")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True), encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def fts_query(text):
+    """User text -> FTS5 query: every word must appear, a trailing * keeps prefix matching."""
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " AND ".join(terms)
+
+
+class ChatHistoryIndex:
+    def __init__(self, path, history_dir):
+        self.path = path
+        self.history_dir = history_dir
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._write_conn = self._connect()
+        version = self._write_conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            # Everything here is derived from the history files; ingest_pending() rebuilds it
+            if self._write_conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages'").fetchone():
+                print(f"Chat index: Index format changed, rebuilding {os.path.basename(path)}")
+            self._write_conn.executescript(_DROP_SCHEMA)
+            self._write_conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._write_conn.executescript(_SCHEMA)
+        self._read_conn = self._connect()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def close(self):
+        with self._write_lock, self._read_lock:
+            self._write_conn.close()
+            self._read_conn.close()
+
+    # Ingestion
+    def ingest(self, path):
+        """Indexes one finished history file (skipped if it is already indexed, plain or compressed); returns rows added."""
+        name = os.path.basename(path)
+        size = os.path.getsize(path)
+        with self._write_lock:
+            if self._write_conn.execute(_FILE_INDEXED, (_session_file(name),)).fetchone():
+                return 0
+            started = time.perf_counter()
+            cursor = self._write_conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                rows = 0
+                with _open_history_file(path) as f:
+                    reader = csv.reader(f)
+                    header = next(reader, None)
+                    if header is None:
+                        cursor.execute("COMMIT")
+                        return 0
+                    columns = {column: index for index, column in enumerate(header)}
+                    batch = []
+                    for row in reader:
+                        try:
+                            batch.append((
+                                epoch_ms(row[columns["timestamp"]]),
+                                row[columns["channel"]],
+                                row[columns["user"]].lower(),
+                                row[columns["display_name"]],
+                                row[columns["message"]],
+                                int(row[columns["bits"]] or 0),
+                            ))
+                        except (KeyError, IndexError, ValueError):
+                            continue  # truncated last line of a crashed session, or a foreign file
+                        if len(batch) >= _BATCH_ROWS:
+                            rows += self._insert(cursor, batch)
+                            batch = []
+                    rows += self._insert(cursor, batch)
+                cursor.execute(_INSERT_FILE, (_session_file(name), size, rows, time.time()))
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+        print(f"Chat index: {name} indexed, {rows} messages in {time.perf_counter() - started:.2f}s")
+        return rows
+
+    @staticmethod
+    def _insert(cursor, batch):
+        """Inserts (ts, ...) rows under the first free rowid at or after each one's timestamp; returns the count."""
+        if not batch:
+            return 0
+        checked = (max(row[0] for row in batch) << ROWID_SHIFT) + _SLOTS - 1
+        # Empty unless another file covers the same time (or this file repeats a batch's millisecond)
+        taken = {key for key, in cursor.execute(_SELECT_IDS, (min(row[0] for row in batch) << ROWID_SHIFT, checked))}
+        rows = []
+        for row in batch:
+            rowid = row[0] << ROWID_SHIFT
+            while True:
+                if rowid > checked:  # spilled past the looked-up keys
+                    taken.update(key for key, in cursor.execute(_SELECT_IDS, (checked + 1, checked + _SLOTS)))
+                    checked += _SLOTS
+                if rowid not in taken:
+                    break
+                rowid += 1
+            taken.add(rowid)
+            rows.append((rowid,) + row)
+        cursor.executemany(_INSERT_MESSAGE, rows)
+        return len(rows)
+
+    def ingest_pending(self, skip=()):
+        """Indexes finished history files not indexed yet, oldest first; `skip` names files still being written."""
+        if not os.path.isdir(self.history_dir):
+            return 0
+        with self._write_lock:
+            known = {name for name, in self._write_conn.execute(_SELECT_FILES)}
+        skip = {os.path.basename(path) for path in skip if path}
+        added = 0
+        for name in sorted(os.listdir(self.history_dir)):
+            if not _HISTORY_FILE.match(name) or name in skip or _session_file(name) in known:
+                continue
+            path = os.path.join(self.history_dir, name)
+            if not os.path.exists(path):
+                continue  # compressed away meanwhile; its .gz/.zst comes through on_file_closed
+            added += self.ingest_closed_file(path)
+        return added
+
+    def ingest_closed_file(self, path):
+        """ingest() that logs failures instead of raising; for ChatHistoryWriter's on_file_closed hook."""
+        try:
+            return self.ingest(path)
+        except (OSError, EOFError, csv.Error, sqlite3.Error) as e:
+            print(f"Chat index: Could not index {os.path.basename(path)}: {e}")
+            return 0
+
+    # Search
+    def search(self, text=None, user=None, since=None, until=None, limit=200):
+        """Newest-first messages matching all given filters; `since`/`until` are Unix timestamps."""
+        low = rowid_for(since) if since is not None else 0
+        high = rowid_for(until, _SLOTS - 1) if until is not None else _MAX_ROWID
+        user = user.strip().lstrip("@").lower() if user else None
+        query = fts_query(text) if text else ""
+        if query:
+            query = f"message : ({query})"
+            if user:
+                # The user column is in the FTS index too, so both filters intersect posting lists
+                query = f'user : "{user.replace(chr(34), chr(34) * 2)}" AND {query}'
+            rows = self._search_text(query, user, low, high, limit)
+        else:
+            if user:
+                sql, params = _SEARCH_USER, (user, low, high, limit)
+            else:
+                sql, params = _SEARCH_TIME, (low, high, limit)
+            with self._read_lock:
+                rows = self._read_conn.execute(sql, params).fetchall()
+        return [
+            ChatSearchResult(ts / 1000, channel, row_user, display_name, message, bits)
+            for _, ts, channel, row_user, display_name, message, bits in rows
+        ]
+
+    def _search_text(self, query, user, low, high, limit):
+        if not user:
+            with self._read_lock:
+                return self._read_conn.execute(_SEARCH_TEXT, (query, low, high, limit)).fetchall()
+        # FTS matches the user's name tokens, not the exact name ("pog" also matches "pog_master"),
+        # so page backwards through the matches until `limit` rows have the exact name
+        rows = []
+        page = limit * 4
+        while len(rows) < limit and low <= high:
+            with self._read_lock:
+                batch = self._read_conn.execute(_SEARCH_TEXT, (query, low, high, page)).fetchall()
+            rows.extend(row for row in batch if row[3] == user)
+            if len(batch) < page:
+                break
+            high = batch[-1][0] - 1
+        return rows[:limit]
+
+    def stats(self):
+        with self._read_lock:
+            files = self._read_conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            messages = self._read_conn.execute(_COUNT_MESSAGES).fetchone()[0]
+        return {"files": files, "messages": messages}
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import tempfile
+
+    from chat_history import ChatHistoryWriter
+    from twitch_chat import ChatMessage
+
+    parser = argparse.ArgumentParser(description="Build a synthetic chat history index and time some queries")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "chat-index-bench.sqlite3"))
+    parser.add_argument("--generate", type=int, default=0, help="messages to generate, spread over the last year")
+    parser.add_argument("--sessions", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    words = "gg lol pog that was insane lets go hype chat clip it first time here love the stream W o7 boss fight again".split()
+    users = [f"viewer{i}" for i in range(20000)]
+    with tempfile.TemporaryDirectory() as history_dir:
+        index = ChatHistoryIndex(args.db, history_dir)
+        if args.generate:
+            start = time.time() - 365 * 86400
+            per_session = args.generate // args.sessions
+            for session in range(args.sessions):
+                session_start = start + session * (365 * 86400 / args.sessions)
+                writer = ChatHistoryWriter(history_dir, compression="gzip")
+                writer.session_name = datetime.fromtimestamp(session_start).strftime("%Y-%m-%d_%H-%M-%S")
+                batch = []
+                for i in range(per_session):
+                    user = users[int(rng.paretovariate(1.2)) % len(users)]
+                    batch.append(ChatMessage("bench", user, user.capitalize(), " ".join(rng.choices(words, k=rng.randint(1, 12))), timestamp=session_start + i * 0.25))
+                writer.append(batch)
+                writer.close(timeout=None)
+            started = time.perf_counter()
+            index.ingest_pending()
+            print(f"ingest      {args.generate} messages in {time.perf_counter() - started:.1f}s")
+        print(f"index       {index.stats()}")
+        week_ago = time.time() - 7 * 86400
+        for label, kwargs in [
+            ("text", {"text": "insane clip"}),
+            ("text+user", {"text": "gg", "user": "viewer3"}),
+            ("user", {"user": "viewer42"}),
+            ("user+week", {"user": "viewer1", "since": week_ago}),
+            ("prefix+range", {"text": "bos*", "since": week_ago - 30 * 86400, "until": week_ago}),
+        ]:
+            timings = []
+            for _ in range(20):
+                started = time.perf_counter()
+                results = index.search(**kwargs)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            print(f"{label:<12}{len(results):>4} results, median {timings[len(timings) // 2] * 1000:.2f} ms, max {timings[-1] * 1000:.2f} ms")
+        index.close()
@@ -1,53 +1,131 @@
-function cleanUpDivs() {
-    console.log("%cInjected script cleanUpDivs running...", "font-size: 24px");
+// Chat cleanup engine, injected at DocumentCreation (see webchat_transparent.install_chat_scripts).
+//
+// Instead of sweeping every div once after load, a MutationObserver waits for
+// the chat log, hides the siblings along its ancestor chain once, and from then
+// on only looks at newly added nodes: anything attached next to that chain is
+// hidden, so Twitch re-rendering its layout doesn't bring the UI back. Old
+// chat lines beyond `maxLines` are hidden the same way rather than removed:
+// React owns those nodes and would fail reconciling a list changed under it,
+// and Twitch drops them from its own message buffer soon enough.
+(function () {
+    if (window.__chatCleanupEngine) return;
 
-    const targetDiv = document.querySelector('div.chat-scrollable-area__message-container[data-test-selector="chat-scrollable-area__message-container"][role="log"]');
-    
-    if (!targetDiv) {
-        console.warn('Target div not found.');
-        return;
-    }
+    const config = Object.assign({ maxLines: 150 }, window.__chatCleanupConfig || {});
+    const LOG_SELECTOR = 'div.chat-scrollable-area__message-container[data-test-selector="chat-scrollable-area__message-container"][role="log"]';
+    const WELCOME_SELECTOR = 'div[data-a-target="chat-welcome-message"]';
+    const HIDDEN_CLASS = '__chat-cleanup-hidden';
+    const KEEP_TAGS = new Set(['HEAD', 'SCRIPT', 'STYLE', 'LINK', 'META']);
 
-    // Create a Set of elements to **keep**
-    const excludedDivs = new Set();
-    
-    // Add target div
-    excludedDivs.add(targetDiv);
+    let log = null;
+    let path = new WeakSet();  // the chat log and its ancestors
+    let logObserver = null;
+    let hiddenLines = 0;  // children of the log carrying HIDDEN_CLASS
+    let lastPruned = null;  // newest pruned line; older lines are all hidden already
+    const stats = { hidden: 0, pruned: 0, attached: 0 };
 
-    // Add all children of target div
-    targetDiv.querySelectorAll('div').forEach(child => excludedDivs.add(child));
+    function hide(node) {
+        if (node.nodeType !== Node.ELEMENT_NODE || KEEP_TAGS.has(node.tagName) || node.classList.contains(HIDDEN_CLASS)) return;
+        node.classList.add(HIDDEN_CLASS);
+        if (node.parentElement === log) hiddenLines++;
+        stats.hidden++;
+    }
 
-    // Add all parent elements up to <html>
-    let parent = targetDiv.parentElement;
-    while (parent) {
-        excludedDivs.add(parent);
-        parent = parent.parentElement;
+    function installStyle() {
+        if (document.getElementById(HIDDEN_CLASS)) return;
+        const style = document.createElement('style');
+        style.id = HIDDEN_CLASS;
+        style.textContent = `.${HIDDEN_CLASS} { display: none !important; }`;
+        (document.head || document.documentElement).appendChild(style);
     }
 
-    // Handle the chat welcome message removal
-    document.querySelectorAll('div[data-a-target="chat-welcome-message"]').forEach(welcomeDiv => {
-        const parentDiv = welcomeDiv.closest('div'); // Get first parent div
-        const siblingDiv = parentDiv?.nextElementSibling; // Get following sibling div
+    // As in the original sweep: the welcome message goes, and so does the div right after it
+    function hideWelcome(welcome) {
+        hide(welcome);
+        const sibling = welcome.nextElementSibling;
+        if (sibling && sibling.tagName === 'DIV') hide(sibling);
+    }
 
-        // Remove the welcome message div
-        welcomeDiv.remove();
+    function isWelcomeSibling(node) {
+        const previous = node.previousElementSibling;
+        return node.tagName === 'DIV' && previous && previous.matches(WELCOME_SELECTOR);
+    }
 
-        // Remove parent div (if found)
-        if (parentDiv) parentDiv.remove();
+    function onLogMutations(records) {
+        for (const record of records) {
+            for (const node of record.removedNodes) {
+                if (node.nodeType === Node.ELEMENT_NODE && node.classList.contains(HIDDEN_CLASS)) hiddenLines--;
+            }
+            for (const node of record.addedNodes) {
+                if (node.nodeType !== Node.ELEMENT_NODE) continue;
+                if (node.matches(WELCOME_SELECTOR)) hideWelcome(node);
+                else if (isWelcomeSibling(node)) hide(node);  // rendered after the welcome message
+                else node.querySelectorAll(WELCOME_SELECTOR).forEach(hideWelcome);
+            }
+        }
+        prune();
+    }
 
-        // Remove the sibling div (if found)
-        if (siblingDiv && siblingDiv.tagName === 'DIV') siblingDiv.remove();
-    });
+    function prune() {
+        let excess = log.childElementCount - hiddenLines - config.maxLines;
+        if (excess <= 0) return;
+        let node = lastPruned && lastPruned.parentElement === log ? lastPruned.nextElementSibling : log.firstElementChild;
+        while (excess > 0 && node) {
+            if (!node.classList.contains(HIDDEN_CLASS)) {
+                node.classList.add(HIDDEN_CLASS);
+                hiddenLines++;
+                stats.pruned++;
+                excess--;
+                lastPruned = node;
+            }
+            node = node.nextElementSibling;
+        }
+    }
+
+    function attach(found) {
+        log = found;
+        path = new WeakSet();
+        hiddenLines = 0;
+        lastPruned = null;
+        installStyle();
+        // One pass over the siblings along the ancestor chain, not over every div in the page
+        for (let node = log; node && node !== document.documentElement; node = node.parentElement) {
+            path.add(node);
+            for (const sibling of node.parentElement ? node.parentElement.children : []) {
+                if (sibling !== node) hide(sibling);
+            }
+        }
+        document.querySelectorAll(WELCOME_SELECTOR).forEach(hideWelcome);
+        if (logObserver) logObserver.disconnect();
+        logObserver = new MutationObserver(onLogMutations);
+        logObserver.observe(log, { childList: true });
+        prune();
+        stats.attached++;
+        console.log(`Chat cleanup: attached to chat log (max ${config.maxLines} lines)`);
+    }
 
-    // Remove all divs that are **not** in excludedDivs
-    document.querySelectorAll('div').forEach(div => {
-        if (!excludedDivs.has(div)) {
-            div.remove();
+    function onMutations(records) {
+        if (!log || !log.isConnected) {
+            const found = document.querySelector(LOG_SELECTOR);
+            if (!found) return;
+            attach(found);  // first render, or Twitch replaced the chat log
+            return;
+        }
+        for (const record of records) {
+            // Only children of the kept chain matter; anything deeper is inside a hidden node or the log itself
+            if (!path.has(record.target) || record.target === log) continue;
+            for (const node of record.addedNodes) {
+                if (!path.has(node)) hide(node);
+            }
         }
-    });
+    }
 
-    console.log('Cleanup complete.');
-}
+    const observer = new MutationObserver(onMutations);
+    observer.observe(document, { childList: true, subtree: true });
 
-// Run the function
-cleanUpDivs();
+    window.__chatCleanupEngine = {
+        config,
+        stats,
+        setMaxLines(maxLines) { config.maxLines = maxLines; if (log) prune(); },
+        disconnect() { observer.disconnect(); if (logObserver) logObserver.disconnect(); },
+    };
+})();
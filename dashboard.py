@@ -1,47 +1,311 @@
+import asyncio
+import json
+import random
 import signal
+import sqlite3
 import sys
 import os
-
-from PyQt6.QtCore import QTimer, QPoint, QSize, QRectF, Qt, QRect, QEvent
-from PyQt6.QtGui import QColor, QKeySequence, QPainter, QIcon, QPixmap, QAction, QFont, QActionGroup, QFontMetrics, QTextOption
+import math
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+
+from PyQt6.QtCore import QObject, QTimer, QPoint, QPointF, QSize, QRectF, Qt, QRect, QEvent, QUrl, pyqtSignal, QAbstractListModel, QModelIndex
+from PyQt6.QtGui import QColor, QKeySequence, QPainter, QIcon, QPixmap, QImage, QAction, QFont, QActionGroup, QFontMetrics, QTextOption, QTextCursor, QTextLayout, QTextCharFormat
+from PyQt6.QtNetwork import QNetworkAccessManager, QNetworkReply, QNetworkRequest
 from PyQt6.QtSvg import QSvgRenderer
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QSystemTrayIcon, QMenu, QFontDialog, QCheckBox,
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit, QRadioButton,
     QGroupBox, QSlider, QColorDialog, QFileDialog, QKeySequenceEdit, QStackedWidget,
-    QTextEdit, QFrame, QSizePolicy
+    QTextEdit, QFrame, QSizePolicy, QInputDialog, QComboBox, QListView, QStyledItemDelegate, QAbstractItemView
+)
+
+try: 
+    import aiohttp
+except ImportError:  # no WebSocket push then; TTSController keeps polling over HTTP
+    aiohttp = None
+
+from chat_history import ChatHistoryWriter
+from chat_index import ChatHistoryIndex
+from emote_cache import EmoteCache
+from twitch_chat import TWITCH_IRC_HOST, TWITCH_IRC_PORT, TwitchChatClient
+from twitch_eventsub import (
+    EVENTSUB_SUBSCRIPTIONS_URL, EVENTSUB_WS_URL, Coalescer, EventBus, EventLogger, EventSubClient,
+    RaidEvent, StreamStatusEvent, TTSBitsForwarder, load_creds
 )
 
 # ... (Controller classes remain the same)
 # ======================
 # Controller Classes
 # ======================
-class TTSController:
-    def __init__(self):
-        self._queue_size = 22
+class TTSSocketClient(QObject):
+    """Persistent WebSocket to the TTS server's /ws, run by an asyncio loop in its own thread.
+
+    Events are handed to the GUI thread through `event_received` (a queued
+    connection, since this object lives in the GUI thread); dropped
+    connections are retried with jittered exponential backoff.
+    """
+    event_received = pyqtSignal(object)
+    connection_changed = pyqtSignal(bool)
+
+    def __init__(self, url, min_backoff=0.25, max_backoff=10.0): 
+        super().__init__()
+        self._url = url
+        self._min_backoff = min_backoff
+        self._max_backoff = max_backoff
+        self._loop = None
+        self._ws = None
+        self._wake = None
+        self._stopping = False
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name="tts-ws", daemon=True)
+
+    def start(self): 
+        self._thread.start()
+
+    def stop(self): 
+        self._stopping = True
+        loop, ws = self._loop, self._ws
+        if loop is not None: 
+            if ws is not None: 
+                asyncio.run_coroutine_threadsafe(ws.close(), loop)
+            loop.call_soon_threadsafe(self._wake.set)
+        self._thread.join(2.0)
+
+    def send(self, payload): 
+        """Sends a command from any thread; False when not connected, so the caller can fall back to HTTP."""
+        loop, ws = self._loop, self._ws
+        if loop is None or ws is None or ws.closed: 
+            return False
+        asyncio.run_coroutine_threadsafe(ws.send_json(payload), loop)
+        return True
+
+    async def _run(self): 
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        backoff = self._min_backoff
+        async with aiohttp.ClientSession() as session: 
+            while not self._stopping: 
+                try: 
+                    async with session.ws_connect(self._url, heartbeat=10.0) as ws: 
+                        self._ws = ws
+                        backoff = self._min_backoff
+                        self.connection_changed.emit(True)
+                        async for msg in ws: 
+                            if msg.type == aiohttp.WSMsgType.TEXT: 
+                                try: 
+                                    event = json.loads(msg.data)
+                                except ValueError: 
+                                    continue
+                                self.event_received.emit(event)
+                            elif msg.type == aiohttp.WSMsgType.ERROR: 
+                                break
+                except (aiohttp.ClientError, OSError, asyncio.TimeoutError): 
+                    pass
+                finally: 
+                    if self._ws is not None: 
+                        self._ws = None
+                        self.connection_changed.emit(False)
+                if self._stopping: 
+                    break
+                delay = backoff * random.uniform(0.5, 1.0)
+                backoff = min(backoff * 2, self._max_backoff)
+                try: 
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError: 
+                    pass
+
+
+class TTSController(QObject):
+    """Client of the local TTS server (tts/tts_server.py).
+
+    With aiohttp installed, status changes are pushed over a WebSocket and
+    commands go the same way; otherwise (or while it is reconnecting)
+    requests go through QNetworkAccessManager and the status is polled.
+    Nothing blocks the GUI thread either way.
+    """
+    queue_status_changed = pyqtSignal(str)
+    storage_status_changed = pyqtSignal(str)
+    clip_cache_status_changed = pyqtSignal(str)
+    push_latency_status_changed = pyqtSignal(str)
+
+    def __init__(self, server_url="http://127.0.0.1:8765", status_poll_ms=2000, use_websocket=True):
+        super().__init__()
+        self._queue_size = 0
+        self._playing = False
+        self._storage_status = ""
+        self._clip_cache_status = "Clip cache: –"
+        self._push_latencies = deque(maxlen=200)  # server event -> status applied, seconds
         self._autoplay = False
         self._queue_prefix = "🗣️: "
+        self._playing_prefix = "🔊: "
+        self._server_url = server_url.rstrip("/")
+        self._server_available = None
+        self._network = QNetworkAccessManager(self)
+        self._status_timer = QTimer(self)
+        self._status_timer.timeout.connect(self.refresh_status)
+        self._status_timer.start(status_poll_ms)
+        self.refresh_status()
+        self._socket = None
+        if use_websocket and aiohttp is not None: 
+            self._socket = TTSSocketClient(f"{self._server_url.replace('http', 'ws', 1)}/ws")
+            self._socket.event_received.connect(self._on_socket_event)
+            self._socket.connection_changed.connect(self._on_socket_connection_changed)
+            self._socket.start()
     
+    @property
+    def server_url(self): 
+        return self._server_url
+
     @property
     def queue_size(self): 
         return self._queue_size
     
     @property
     def queue_status(self): 
-        return f"{self._queue_prefix}{self._queue_size}"
+        return f"{self._playing_prefix if self._playing else self._queue_prefix}{self._queue_size}"
+    
+    def set_queue_size(self, size): 
+        if size != self._queue_size: 
+            self._queue_size = size
+            self.queue_status_changed.emit(self.queue_status)
+
+    def set_playing(self, playing): 
+        if playing != self._playing: 
+            self._playing = playing
+            self.queue_status_changed.emit(self.queue_status)
+
+    @property
+    def push_latency_status(self): 
+        if not self._push_latencies: 
+            return "Push latency: –"
+        latencies = sorted(self._push_latencies)
+        p50 = latencies[len(latencies) // 2] * 1000
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+        return f"Push latency: p50 {p50:.1f} ms, p95 {p95:.1f} ms"
+
+    @property
+    def storage_status(self): 
+        return self._storage_status
+
+    def set_storage_usage(self, usage): 
+        lines = []
+        for queue_type, queue_usage in usage.items(): 
+            budget = queue_usage.get("budget_bytes")
+            limit = f" / {budget / 1048576:.0f} MB" if budget else ""
+            lines.append(f"{queue_type.capitalize()}: {queue_usage['items']} items, {queue_usage['bytes'] / 1048576:.1f} MB{limit}, {queue_usage['evicted']} evicted")
+        status = "\n".join(lines)
+        if status != self._storage_status: 
+            self._storage_status = status
+            self.storage_status_changed.emit(status)
+
+    @property
+    def clip_cache_status(self): 
+        return self._clip_cache_status
+
+    def set_clip_cache_stats(self, stats): 
+        hit_rate = stats.get("hit_rate")
+        rate = f" ({hit_rate:.0%})" if hit_rate is not None else ""
+        status = f"Clip cache: {stats['hits']} hits / {stats['misses']} misses{rate}, {stats['bytes'] / 1048576:.1f} MB"
+        if status != self._clip_cache_status: 
+            self._clip_cache_status = status
+            self.clip_cache_status_changed.emit(status)
+
+    def _request(self, path):
+        request = QNetworkRequest(QUrl(f"{self._server_url}{path}"))
+        request.setHeader(QNetworkRequest.KnownHeaders.ContentTypeHeader, "application/json")
+        return request
+
+    def _post(self, path, payload=None):
+        if self._socket is not None and self._socket.send({"command": path.lstrip("/"), **(payload or {})}): 
+            return
+        reply = self._network.post(self._request(path), json.dumps(payload or {}).encode("utf-8"))
+        reply.finished.connect(lambda: self._on_reply(reply))
+
+    def close(self): 
+        if self._socket is not None: 
+            self._socket.stop()
+
+    def refresh_status(self):
+        reply = self._network.get(self._request("/status"))
+        reply.finished.connect(lambda: self._on_reply(reply))
+
+    def _on_reply(self, reply):
+        if reply.error() != QNetworkReply.NetworkError.NoError: 
+            if self._server_available is not False: 
+                print(f"TTS: Server unavailable ({reply.errorString()})")
+            self._server_available = False
+        else: 
+            if self._server_available is not True: 
+                print("TTS: Connected to server")
+            self._server_available = True
+            try: 
+                self._apply_status(json.loads(bytes(reply.readAll()).decode("utf-8") or "{}"))
+            except ValueError as e: 
+                print(f"TTS: Bad server reply: {e}")
+        reply.deleteLater()
+
+    def _apply_status(self, status): 
+        if "queue_size" in status: 
+            self.set_queue_size(status["queue_size"])
+        if "playing" in status: 
+            self.set_playing(bool(status["playing"]))
+        if "storage" in status: 
+            self.set_storage_usage(status["storage"])
+        if "clip_cache" in status: 
+            self.set_clip_cache_stats(status["clip_cache"])
+
+    def _on_socket_event(self, event): 
+        if event.get("type") == "status": 
+            self._apply_status(event.get("status", {}))
+            # Labels are updated synchronously by the signals above, so this covers event -> label text
+            if "sent_at" in event: 
+                self._push_latencies.append(time.time() - event["sent_at"])
+                self.push_latency_status_changed.emit(self.push_latency_status)
+        elif event.get("type") == "error": 
+            print(f"TTS: Server rejected {event.get('command')}: {event.get('error')}")
+
+    def _on_socket_connection_changed(self, connected): 
+        # Pushed updates replace polling while the socket is up
+        if connected: 
+            print("TTS: WebSocket connected")
+            self._server_available = True
+            self._status_timer.stop()
+        else: 
+            print("TTS: WebSocket disconnected, polling until it reconnects")
+            self._status_timer.start()
     
     def play(self): 
         print("TTS: Playing next item")
+        self._post("/play")
     
     def stop(self): 
         print("TTS: Stopping playback")
+        self._post("/stop")
+    
+    def skip(self): 
+        print("TTS: Skipping current item")
+        self._post("/skip")
     
     def toggle_autoplay(self, state): 
-        self._autoplay = state
+        self._autoplay = bool(state)
         print(f"TTS: Autoplay {'✓' if state else '⨯'}")
+        self._post("/autoplay", {"enabled": self._autoplay})
+
+    def set_mode(self, mode): 
+        print(f"TTS: Mode {mode}")
+        self._post("/mode", {"mode": mode})
+
+    def clear_queue(self): 
+        self._post("/queue/clear")
+
+class OBSController(QObject):
+    status_changed = pyqtSignal(str)
 
-class OBSController:
     def __init__(self): 
+        super().__init__()
         self._recording = False
         self._status_prefix = "🎥: "
     
@@ -49,12 +313,20 @@ class OBSController:
     def status(self): 
         return f"{self._status_prefix}Rec •" if self._recording else f"{self._status_prefix}Stop ⏹"
     
+    def set_recording(self, recording): 
+        if recording != self._recording: 
+            self._recording = recording
+            self.status_changed.emit(self.status)
+    
     def toggle_recording(self): 
-        self._recording = not self._recording
+        self.set_recording(not self._recording)
         print("OBS: Toggled recording state")
 
-class ViewerController:
+class ViewerController(QObject):
+    count_status_changed = pyqtSignal(str)
+
     def __init__(self): 
+        super().__init__()
         self._count = 123
         self._count_prefix = "👀: "
     
@@ -65,42 +337,888 @@ class ViewerController:
     @property
     def count_status(self): 
         return f"{self._count_prefix}{self._count}"
-
-class AdController:
-    def __init__(self):
-        self._time_till_next = 30 * 60
+    
+    def set_count(self, count): 
+        if count != self._count: 
+            self._count = count
+            self.count_status_changed.emit(self.count_status)
+
+    def apply_update(self, update): 
+        """Coalesced EventSub update: raiders join the count, going offline resets it."""
+        if update.get("online") is False: 
+            self.set_count(0)
+        if update.get("raid_viewers"): 
+            self.set_count(self._count + update["raid_viewers"])
+
+class AdController(QObject):
+    """Ad schedule modeled as absolute monotonic deadlines.
+
+    Nothing is decremented: the countdown is computed from the clock on demand
+    and the timer is only armed for the next visible second boundary (or the
+    next schedule event while the display is hidden). `clock` can be replaced
+    with a fake monotonic clock for testing.
+    """
+    display_changed = pyqtSignal(str)
+
+    def __init__(self, clock=time.monotonic, cooldown=30 * 60, ad_duration=90):
+        super().__init__()
+        self._clock = clock
+        self._cooldown = cooldown
+        self._ad_duration = ad_duration
         self._double_ad = False
-        self._timer = QTimer()
-        self._timer.timeout.connect(self._decrement_time)
-        self._timer.start(1000)
+        self._next_ad_at = self._clock() + cooldown
+        self._ad_slots = []  # [(start, end), ...] of the running ad break; two slots in double mode
+        self._accumulated_delay = 0.0
+        self._display_active = True
+        self._last_display = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._refresh)
+        self._refresh()
+
+    def _advance(self, now):
+        # Catch up on every deadline that passed, anchored on the deadline itself so nothing drifts
+        while True:
+            if self._ad_slots and now >= self._ad_slots[-1][1]: 
+                self._ad_slots = []
+            elif not self._ad_slots and now >= self._next_ad_at: 
+                self._start_break(self._next_ad_at)
+            else: 
+                return
+
+    def _start_break(self, start):
+        slot_count = 2 if self._double_ad else 1
+        self._ad_slots = [(start + i * self._ad_duration, start + (i + 1) * self._ad_duration) for i in range(slot_count)]
+        self._next_ad_at = self._ad_slots[-1][1] + self._cooldown * slot_count
+        print(f"Ad: Ad break started ({slot_count} ad{'s' if slot_count > 1 else ''})")
+
+    def _seconds_to_next_event(self, now):
+        if self._ad_slots: 
+            return self._ad_slots[-1][1] - now
+        return self._next_ad_at - now
+
+    def _refresh(self):
+        now = self._clock()
+        self._advance(now)
+        display = self._format_display(now)
+        if display != self._last_display: 
+            self._last_display = display
+            self.display_changed.emit(display)
+        self._arm_timer(now)
+
+    def _arm_timer(self, now):
+        remaining = self._seconds_to_next_event(now)
+        if self._display_active: 
+            # Time until the displayed (ceil) second changes
+            wait = remaining - (math.ceil(remaining) - 1)
+        else: 
+            wait = remaining
+        self._timer.start(max(1, math.ceil(wait * 1000)))
+
+    @staticmethod
+    def _format_seconds(seconds):
+        seconds = max(0, math.ceil(seconds))
+        return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+    def _format_display(self, now):
+        if self._ad_slots: 
+            return self._format_seconds(self._ad_slots[-1][1] - now)
+        return f"{self._format_seconds(self._next_ad_at - now)} ⏳"
+
+    @property
+    def display(self): 
+        now = self._clock()
+        self._advance(now)
+        return self._format_display(now)
+
+    @property
+    def is_ad_running(self): 
+        self._advance(self._clock())
+        return bool(self._ad_slots)
+
+    @property
+    def current_ad_slot(self): 
+        now = self._clock()
+        self._advance(now)
+        for index, (start, end) in enumerate(self._ad_slots): 
+            if start <= now < end: 
+                return index + 1
+        return 0
+
+    @property
+    def time_till_next_seconds(self): 
+        now = self._clock()
+        self._advance(now)
+        return max(0.0, self._next_ad_at - now)
 
-    def _decrement_time(self):
-        if self._time_till_next > 0: 
-            self._time_till_next -= 1
-            
     @property
     def time_till_next_display(self): 
-        minutes = self._time_till_next // 60
-        seconds = self._time_till_next % 60
-        return f"{minutes:02d}:{seconds:02d}"
+        return self._format_seconds(self.time_till_next_seconds)
     
     @property
     def time_till_next(self): 
-        return self._time_till_next // 60
+        return int(self.time_till_next_seconds // 60)
+
+    @property
+    def accumulated_delay(self): 
+        return self._accumulated_delay
+
+    def set_display_active(self, active): 
+        self._display_active = active
+        self._refresh()
     
     def delay(self, minutes): 
-        self._time_till_next += minutes * 60
-        print(f"Ad: Delayed by {minutes} minutes")
+        seconds = float(minutes) * 60
+        self._advance(self._clock())
+        self._next_ad_at += seconds
+        self._accumulated_delay += seconds
+        print(f"Ad: Delayed by {minutes:g} minutes")
+        self._refresh()
         
     def run(self): 
         print("Ad: Running ad now")
         if self._double_ad: 
             print("Ad: Running second ad (double mode)")
+        now = self._clock()
+        self._advance(now)
+        if not self._ad_slots: 
+            self._start_break(now)
+        self._refresh()
             
+    def begin_break(self, duration_seconds): 
+        """An ad break Twitch reports as started (EventSub channel.ad_break.begin); replaces the local estimate."""
+        now = self._clock()
+        self._ad_slots = [(now, now + duration_seconds)]
+        self._next_ad_at = now + duration_seconds + self._cooldown
+        print(f"Ad: Ad break started by Twitch ({duration_seconds}s)")
+        self._refresh()
+
     def toggle_double(self, state): 
-        self._double_ad = state
+        self._double_ad = bool(state)
         print(f"Ad: Double mode {'✓' if state else '⨯'}")
 
+class EventSubThread(QObject):
+    """Runs twitch_eventsub's client and event bus on an asyncio loop in its own thread.
+
+    The consumers run on that loop too: the JSON event log and the TTS bits
+    forwarder see every event, viewer and ad updates are coalesced there, so
+    the GUI thread gets at most one signal per `ui_interval` for each.
+    """
+    viewers_changed = pyqtSignal(object)  # {"raid_viewers": int, "online": bool or None}
+    ad_break_started = pyqtSignal(object)  # the latest AdBreakEvent
+    connection_changed = pyqtSignal(bool)
+
+    def __init__(self, creds, url=EVENTSUB_WS_URL, subscriptions_url=EVENTSUB_SUBSCRIPTIONS_URL, log_path=None, tts_server_url=None, ui_interval=0.25): 
+        super().__init__()
+        self._creds = creds
+        self._url = url
+        self._subscriptions_url = subscriptions_url
+        self._log_path = log_path
+        self._tts_server_url = tts_server_url
+        self._ui_interval = ui_interval
+        self.bus = None
+        self._loop = None
+        self._task = None
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name="eventsub", daemon=True)
+
+    def start(self): 
+        self._thread.start()
+
+    def stop(self): 
+        loop = self._loop
+        if loop is not None: 
+            loop.call_soon_threadsafe(lambda: self._task.cancel())
+            self._thread.join(3.0)
+
+    @staticmethod
+    def _reduce_viewers(state, event): 
+        state = state or {"raid_viewers": 0, "online": None}
+        if isinstance(event, RaidEvent): 
+            state["raid_viewers"] += event.viewers
+        elif isinstance(event, StreamStatusEvent): 
+            state["online"] = event.online
+        return state
+
+    async def _run(self): 
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self.bus = bus = EventBus()
+        logger = EventLogger(self._log_path) if self._log_path else None
+        if logger is not None: 
+            bus.subscribe("log", logger.handle, maxsize=1024)
+        bits = None
+        if self._tts_server_url: 
+            bits = TTSBitsForwarder(self._tts_server_url)
+            bus.subscribe("tts_bits", bits.handle, maxsize=1024, types=["channel.cheer"])
+        viewers = Coalescer(self.viewers_changed.emit, self._reduce_viewers, self._ui_interval)
+        bus.subscribe("viewers", viewers.handle, maxsize=64, types=["channel.raid", "stream.online", "stream.offline"])
+        ads = Coalescer(self.ad_break_started.emit, lambda state, event: event, self._ui_interval)
+        bus.subscribe("ads", ads.handle, maxsize=4, policy="drop_oldest", types=["channel.ad_break.begin"])
+        await bus.start()
+        client = EventSubClient(
+            bus, self._creds.get("TWITCH_CLIENT_ID", ""), self._creds.get("TWITCH_AUTH_TOKEN", ""), self._creds.get("TWITCH_BROADCASTER_ID", ""),
+            self._url, self._subscriptions_url, on_connection_changed=self.connection_changed.emit,
+        )
+        try: 
+            await client.run()
+        except asyncio.CancelledError: 
+            pass
+        finally: 
+            await bus.stop()
+            if bits is not None: 
+                await bits.close()
+            if logger is not None: 
+                logger.close()
+            print(f"EventSub: Stopped, {bus.stats()}")
+
+# ======================
+# Background Rendering
+# ======================
+class BackgroundRenderer:
+    """Shared background image cache for MainWindow and StreamWindow.
+
+    The source image is parsed once per (path, mtime) and rasterized into a
+    QPixmap per (path, scale, opacity, base color, device pixel ratio), so a
+    repaint is a single blit instead of an SVG parse.
+    """
+    def __init__(self, max_cached_pixmaps=16, stat_interval=1.0):
+        self._max_cached_pixmaps = max_cached_pixmaps
+        self._stat_interval = stat_interval  # seconds between mtime checks of the same path
+        self._stat_cache = {}  # path -> (checked_at, mtime_ns or None)
+        self._sources = {}  # path -> (mtime_ns, QSvgRenderer | QImage | None)
+        self._pixmaps = OrderedDict()  # LRU: key -> QPixmap
+
+    def _current_mtime(self, path):
+        now = time.monotonic()
+        cached = self._stat_cache.get(path)
+        if cached and now - cached[0] < self._stat_interval:
+            return cached[1]
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        self._stat_cache[path] = (now, mtime)
+        return mtime
+
+    def _load_source(self, path, mtime):
+        cached = self._sources.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        source = None
+        if path.lower().endswith(".svg"):
+            renderer = QSvgRenderer(path)
+            if renderer.isValid():
+                source = renderer
+        else:
+            image = QImage(path)
+            if not image.isNull():
+                source = image
+        if source is None:
+            print(f"Background: could not load image {path}")
+        self._sources[path] = (mtime, source)
+        for key in [key for key in self._pixmaps if key[0] == path and key[1] != mtime]:
+            del self._pixmaps[key]
+        return source
+
+    def _rasterize(self, source, scale, opacity, base_color, device_pixel_ratio):
+        original_size = source.defaultSize() if isinstance(source, QSvgRenderer) else source.size()
+        scaled_width = int(original_size.width() * scale)
+        scaled_height = int(original_size.height() * scale)
+        if scaled_width <= 0 or scaled_height <= 0:
+            return None
+        pixmap = QPixmap(max(1, round(scaled_width * device_pixel_ratio)), max(1, round(scaled_height * device_pixel_ratio)))
+        pixmap.setDevicePixelRatio(device_pixel_ratio)
+        pixmap.fill(base_color)
+        target = QRectF(0, 0, scaled_width, scaled_height)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        if isinstance(source, QSvgRenderer):
+            source.render(painter, target)
+        else:
+            painter.drawImage(target, source)
+        overlay_color_img = QColor(base_color)
+        overlay_color_img.setAlpha(int(opacity * 255))
+        painter.fillRect(target, overlay_color_img)
+        painter.end()
+        return pixmap
+
+    def pixmap(self, path, scale, opacity, base_color, device_pixel_ratio=1.0):
+        mtime = self._current_mtime(path)
+        if mtime is None:
+            return None
+        key = (path, mtime, round(scale, 4), round(opacity, 4), base_color.rgba(), device_pixel_ratio)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+            return pixmap
+        source = self._load_source(path, mtime)
+        if source is None:
+            return None
+        pixmap = self._rasterize(source, scale, opacity, base_color, device_pixel_ratio)
+        if pixmap is None:
+            return None
+        self._pixmaps[key] = pixmap
+        while len(self._pixmaps) > self._max_cached_pixmaps:
+            self._pixmaps.popitem(last=False)
+        return pixmap
+
+    def paint(self, painter, rect, path, scale, opacity, base_color, device_pixel_ratio=1.0):
+        pixmap = self.pixmap(path, scale, opacity, base_color, device_pixel_ratio)
+        if pixmap is None:
+            return
+        size = pixmap.deviceIndependentSize()
+        x = (rect.width() - int(size.width())) // 2
+        y = (rect.height() - int(size.height())) // 2
+        painter.drawPixmap(x, y, pixmap)
+
+    def clear(self):
+        self._stat_cache.clear()
+        self._sources.clear()
+        self._pixmaps.clear()
+
+# ======================
+# Whiteboard Mirroring
+# ======================
+class WhiteboardMirror:
+    """Mirrors edits of the editable whiteboard into the read-only stream copy.
+
+    Only the range reported by QTextDocument.contentsChange is replaced in the
+    target document. A CRC32 of both documents is compared shortly after the
+    last edit and the target is fully resynced if they ever drift apart.
+    """
+    def __init__(self, source_edit, target_edit, verify_delay_ms=500):
+        self._source = source_edit.document()
+        self._target = target_edit.document()
+        self._target.setUndoRedoEnabled(False)
+        self.full_resyncs = 0
+        self.drift_count = 0
+        self._verify_timer = QTimer(target_edit)
+        self._verify_timer.setSingleShot(True)
+        self._verify_timer.setInterval(verify_delay_ms)
+        self._verify_timer.timeout.connect(self.verify)
+        self._source.contentsChange.connect(self._apply_change)
+
+    def _apply_change(self, position, chars_removed, chars_added):
+        # characterCount() includes the trailing paragraph separator, which can't be selected
+        if position + chars_removed > self._target.characterCount() - 1 or position + chars_added > self._source.characterCount() - 1:
+            self.resync()
+            return
+        text = ""
+        if chars_added:
+            source_cursor = QTextCursor(self._source)
+            source_cursor.setPosition(position)
+            source_cursor.setPosition(position + chars_added, QTextCursor.MoveMode.KeepAnchor)
+            text = source_cursor.selectedText().replace("\u2029", "\n")
+        target_cursor = QTextCursor(self._target)
+        target_cursor.setPosition(position)
+        target_cursor.setPosition(position + chars_removed, QTextCursor.MoveMode.KeepAnchor)
+        target_cursor.insertText(text)
+        if self._target.characterCount() != self._source.characterCount():
+            self.resync()
+        else:
+            self._verify_timer.start()
+
+    def verify(self):
+        source_crc = zlib.crc32(self._source.toPlainText().encode("utf-8"))
+        target_crc = zlib.crc32(self._target.toPlainText().encode("utf-8"))
+        if source_crc != target_crc:
+            self.drift_count += 1
+            print(f"Whiteboard: mirror drift detected ({self.drift_count}), resyncing")
+            self.resync()
+        return source_crc == target_crc
+
+    def resync(self):
+        self._verify_timer.stop()
+        self._target.setPlainText(self._source.toPlainText())
+        self.full_resyncs += 1
+
+class WhiteboardAutosaver:
+    """Debounced, atomic whiteboard autosave running off the GUI thread.
+
+    Keystrokes only restart a debounce timer; when it fires the text is
+    snapshotted on the GUI thread and handed to a writer thread, which writes
+    it to a temp file, fsyncs and renames it over the target. Requests that
+    are superseded before they reach the disk are counted in coalesced_writes.
+    """
+    def __init__(self, path, text_source, debounce_ms=400, parent=None):
+        self._path = path
+        self._text_source = text_source
+        self._cond = threading.Condition()
+        self._pending = None
+        self._writing = False
+        self._stopping = False
+        self.completed_writes = 0
+        self.coalesced_writes = 0
+        self._debounce_timer = QTimer(parent)
+        self._debounce_timer.setSingleShot(True)
+        self._debounce_timer.setInterval(debounce_ms)
+        self._debounce_timer.timeout.connect(self._submit)
+        self._thread = threading.Thread(target=self._run, name="whiteboard-autosave", daemon=True)
+        self._thread.start()
+
+    def request_save(self):
+        if self._debounce_timer.isActive():
+            self.coalesced_writes += 1
+        self._debounce_timer.start()
+
+    def _submit(self):
+        text = self._text_source()
+        with self._cond:
+            if self._pending is not None:
+                self.coalesced_writes += 1
+            self._pending = text
+            self._cond.notify_all()
+
+    def flush(self, timeout=5.0):
+        if self._debounce_timer.isActive():
+            self._debounce_timer.stop()
+            self._submit()
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending is None and not self._writing, timeout)
+
+    def close(self, timeout=5.0):
+        self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        print(f"Whiteboard: {self.completed_writes} autosave writes, {self.coalesced_writes} coalesced")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._stopping)
+                if self._pending is None:
+                    return
+                text, self._pending = self._pending, None
+                self._writing = True
+            try:
+                self._write_atomic(text)
+                self.completed_writes += 1
+            except Exception as e:
+                print(f"Error saving whiteboard: {e}")
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def _write_atomic(self, text):
+        directory = os.path.dirname(self._path) or "."
+        fd, tmp_path = tempfile.mkstemp(prefix=".whiteboard-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+# ======================
+# Chat View
+# ======================
+class LazyChatView(QWidget):
+    """Chat page of view_stack; the QWebEngineView behind it is created on demand.
+
+    QtWebEngine (a whole Chromium renderer) dominates startup time and RAM, so
+    the module is only imported and the view only built by prewarm() after
+    the main window is up, or when the chat is first shown without a prewarm
+    scheduled. Chat is the default page, so with prewarm the window comes up
+    with an empty chat page that fills in once the timer fires. While another
+    view is active the page can be frozen or discarded through the page
+    lifecycle API ("frozen" keeps the DOM but stops scripts and timers,
+    "discarded" drops the renderer and reloads on return).
+    """
+    view_created = pyqtSignal(object)
+
+    def __init__(self, url, inactive_lifecycle="frozen", max_lines=150, parent=None): 
+        super().__init__(parent)
+        if inactive_lifecycle not in (None, "frozen", "discarded"): 
+            raise ValueError(f"Unknown lifecycle state: {inactive_lifecycle}")
+        self._url = url
+        self._inactive_lifecycle = inactive_lifecycle
+        self._max_lines = max_lines
+        self._view = None
+        self._prewarm_pending = False
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+
+    @property
+    def view(self): 
+        return self._view
+
+    def ensure_view(self): 
+        if self._view is not None: 
+            return self._view
+        self._prewarm_pending = False
+        started = time.perf_counter()
+        from PyQt6.QtWebEngineWidgets import QWebEngineView
+        from webchat_transparent import install_chat_scripts
+        self._view = QWebEngineView(self)
+        self._view.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+        self._view.setStyleSheet("background: transparent;")
+        self._view.page().setBackgroundColor(Qt.GlobalColor.transparent)
+        install_chat_scripts(self._view.page(), self._max_lines)
+        self._view.setUrl(QUrl(self._url))
+        self._layout.addWidget(self._view)
+        print(f"Chat: WebEngine view created in {time.perf_counter() - started:.2f}s")
+        self.view_created.emit(self._view)
+        return self._view
+
+    def prewarm(self, delay_ms=1500): 
+        """Builds the view shortly after startup so the first switch is instant; it sleeps once loaded if still hidden."""
+        def build(): 
+            if self._view is None: 
+                self.ensure_view().loadFinished.connect(lambda ok: self.set_active(False) if not self.isVisible() else None)
+        self._prewarm_pending = True
+        QTimer.singleShot(delay_ms, build)
+
+    def set_active(self, active): 
+        if self._view is None: 
+            if active: 
+                self.ensure_view()
+            return
+        from PyQt6.QtWebEngineCore import QWebEnginePage
+        page = self._view.page()
+        if active: 
+            if page.lifecycleState() != QWebEnginePage.LifecycleState.Active: 
+                page.setLifecycleState(QWebEnginePage.LifecycleState.Active)
+        elif self._inactive_lifecycle is not None: 
+            # A page can only be frozen/discarded while hidden, i.e. after view_stack switched away
+            state = QWebEnginePage.LifecycleState.Frozen if self._inactive_lifecycle == "frozen" else QWebEnginePage.LifecycleState.Discarded
+            page.setLifecycleState(state)
+            print(f"Chat: Page {self._inactive_lifecycle}")
+
+    def showEvent(self, event): 
+        super().showEvent(event)
+        if self._view is None and not self._prewarm_pending: 
+            # Deferred so the main window paints before Chromium starts
+            QTimer.singleShot(0, lambda: self.ensure_view() if self.isVisible() else None)
+
+class ChatClientThread(QObject):
+    """Runs a twitch_chat.TwitchChatClient on an asyncio loop in its own thread.
+
+    Each socket read arrives as one `messages_received` batch (a queued
+    connection into the GUI thread), so a raid costs one model update per
+    burst rather than one per line. With a ChatHistoryWriter, batches are
+    also handed to it straight from the client thread, without going
+    through the Qt event loop.
+    """
+    messages_received = pyqtSignal(object)
+
+    def __init__(self, channel, host=TWITCH_IRC_HOST, port=TWITCH_IRC_PORT, history=None): 
+        super().__init__()
+        self._history = history
+        self._client = TwitchChatClient(channel, self._on_messages, host, port)
+        self._loop = None
+        self._task = None
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name="twitch-chat", daemon=True)
+
+    @property
+    def client(self): 
+        return self._client
+
+    def start(self): 
+        self._thread.start()
+
+    def stop(self): 
+        loop = self._loop
+        if loop is not None: 
+            loop.call_soon_threadsafe(lambda: self._task.cancel())
+            self._thread.join(2.0)
+
+    def _on_messages(self, messages): 
+        if self._history is not None: 
+            self._history.append(messages)
+        self.messages_received.emit(messages)
+
+    async def _run(self): 
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        try: 
+            await self._client.run()
+        except asyncio.CancelledError: 
+            self._client.stop()
+
+class ChatListModel(QAbstractListModel):
+    """The last `max_lines` chat messages; older ones are dropped from the top in one removeRows per batch."""
+    def __init__(self, max_lines=150, parent=None): 
+        super().__init__(parent)
+        self._max_lines = max_lines
+        self._messages = deque()
+
+    @property
+    def max_lines(self): 
+        return self._max_lines
+
+    def rowCount(self, parent=QModelIndex()): 
+        return 0 if parent.isValid() else len(self._messages)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole): 
+        if not index.isValid(): 
+            return None
+        message = self._messages[index.row()]
+        if role == Qt.ItemDataRole.UserRole: 
+            return message
+        if role == Qt.ItemDataRole.DisplayRole: 
+            return f"{message.display_name}: {message.text}"
+        return None
+
+    def append_messages(self, messages): 
+        messages = messages[-self._max_lines:]
+        excess = len(self._messages) + len(messages) - self._max_lines
+        if excess > 0: 
+            self.beginRemoveRows(QModelIndex(), 0, excess - 1)
+            for _ in range(excess): 
+                self._messages.popleft()
+            self.endRemoveRows()
+        first = len(self._messages)
+        self.beginInsertRows(QModelIndex(), first, first + len(messages) - 1)
+        self._messages.extend(messages)
+        self.endInsertRows()
+
+EMOTE_PLACEHOLDER = "\u2002"  # stands in for an emote's text; letter spacing widens it to the emote
+
+def _utf16_len(text): 
+    return len(text.encode("utf-16-le")) // 2  # QTextLayout positions are UTF-16 code units
+
+class ChatLineDelegate(QStyledItemDelegate):
+    """Paints "Name: text" lines from QTextLayouts cached per (message id, width).
+
+    A chat line never changes once received, so its wrapped layout is built
+    once; sizeHint and every repaint while scrolling reuse it. The cache is an
+    LRU a bit larger than the model's line cap. Emotes take a square slot one
+    line high in the layout and are drawn over it from the EmoteCache, so a
+    line's layout doesn't change when its emotes finish loading.
+    """
+    def __init__(self, view, font, max_entries=300, emote_cache=None, parent=None): 
+        super().__init__(parent)
+        self._view = view  # lines are as wide as its viewport
+        self._max_entries = max_entries
+        self._layouts = OrderedDict()
+        self._emote_cache = emote_cache
+        self.painted_animated = False  # reset by the view on each animation tick
+        self.padding = 4
+        self.text_color = QColor("white")
+        self.set_font(font)
+
+    def set_font(self, font): 
+        self._font = font
+        self._name_font = QFont(font)
+        self._name_font.setBold(True)
+        metrics = QFontMetrics(font)
+        self.emote_size = metrics.height()
+        self._emote_format = QTextCharFormat()
+        self._emote_format.setFontLetterSpacingType(QFont.SpacingType.AbsoluteSpacing)
+        self._emote_format.setFontLetterSpacing(self.emote_size - metrics.horizontalAdvance(EMOTE_PLACEHOLDER))
+        if self._emote_cache is not None: 
+            self._emote_cache.set_size(self.emote_size, self._view.devicePixelRatioF())
+        self._layouts.clear()
+
+    def _display_text(self, message, prefix): 
+        """Message text with each emote replaced by EMOTE_PLACEHOLDER, and [(position, emote id), ...]."""
+        parts = [prefix]
+        slots = []
+        position = _utf16_len(prefix)
+        cursor = 0
+        for emote_id, first, last in message.emotes: 
+            if first < cursor or last >= len(message.text): 
+                continue
+            chunk = message.text[cursor:first]
+            parts.append(chunk)
+            position += _utf16_len(chunk)
+            slots.append((position, emote_id))
+            parts.append(EMOTE_PLACEHOLDER)
+            position += 1
+            cursor = last + 1
+        parts.append(message.text[cursor:])
+        return "".join(parts), slots
+
+    def _layout(self, message, width): 
+        key = (message.id, width)
+        cached = self._layouts.get(key)
+        if cached is not None: 
+            self._layouts.move_to_end(key)
+            return cached
+        prefix = f"* {message.display_name} " if message.action else f"{message.display_name}: "
+        text, slots = self._display_text(message, prefix)
+        layout = QTextLayout(text, self._font)
+        name_format = QTextCharFormat()
+        name_format.setFont(self._name_font)
+        name_format.setForeground(QColor(message.color or "#A0A0A0"))
+        name_range = QTextLayout.FormatRange()
+        name_range.start, name_range.length, name_range.format = 0, _utf16_len(prefix) if message.action else _utf16_len(message.display_name) + 1, name_format
+        formats = [name_range]
+        if message.action: 
+            action_range = QTextLayout.FormatRange()
+            action_format = QTextCharFormat()
+            action_format.setFontItalic(True)
+            action_format.setForeground(QColor(message.color or "#A0A0A0"))
+            action_range.start, action_range.length, action_range.format = _utf16_len(prefix), _utf16_len(text) - _utf16_len(prefix), action_format
+            formats.append(action_range)
+        for position, _ in slots: 
+            emote_range = QTextLayout.FormatRange()
+            emote_range.start, emote_range.length, emote_range.format = position, 1, self._emote_format
+            formats.append(emote_range)
+        layout.setFormats(formats)
+        option = QTextOption()
+        option.setWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
+        layout.setTextOption(option)
+        layout.setCacheEnabled(True)
+        layout.beginLayout()
+        y = 0.0
+        while True: 
+            line = layout.createLine()
+            if not line.isValid(): 
+                break
+            line.setLineWidth(max(1, width - 2 * self.padding))
+            # Lines with emotes may be taller than the font; text is centred vertically on the emote
+            line_height = max(line.height(), self.emote_size) if slots else line.height()
+            line.setPosition(QPointF(0, y + (line_height - line.height()) / 2))
+            y += line_height
+        layout.endLayout()
+        height = math.ceil(layout.boundingRect().height() + self.padding)
+        self._layouts[key] = (layout, slots, height)
+        if len(self._layouts) > self._max_entries: 
+            self._layouts.popitem(last=False)
+        return layout, slots, height
+
+    def paint(self, painter, option, index): 
+        message = index.data(Qt.ItemDataRole.UserRole)
+        layout, slots, _ = self._layout(message, self._view.viewport().width())
+        origin = QPointF(option.rect.left() + self.padding, option.rect.top() + self.padding / 2)
+        painter.save()
+        painter.setPen(self.text_color)
+        layout.draw(painter, origin)
+        if slots and self._emote_cache is not None: 
+            clock_ms = self._emote_cache.clock_ms()
+            for position, emote_id in slots: 
+                emote = self._emote_cache.get(emote_id)
+                if emote is None: 
+                    continue
+                line = layout.lineForTextPosition(position)
+                x = line.cursorToX(position)
+                x = x[0] if isinstance(x, tuple) else x
+                top = origin.y() + line.y() + (line.height() - self.emote_size) / 2
+                painter.drawPixmap(QPointF(origin.x() + x, top), emote.frame_at(clock_ms))
+                self.painted_animated = self.painted_animated or emote.animated
+        painter.restore()
+
+    def sizeHint(self, option, index): 
+        message = index.data(Qt.ItemDataRole.UserRole)
+        width = self._view.viewport().width()
+        return QSize(width, self._layout(message, width)[2])
+
+class NativeChatView(QWidget):
+    """Chat page of view_stack drawn by Qt from IRC messages, without QtWebEngine.
+
+    Same set_active()/prewarm() surface as LazyChatView so MainWindow can use
+    either. Only the visible rows are laid out and painted (QListView is
+    virtualized), with at most `max_lines` messages kept. Incoming batches
+    are gathered for `update_interval_ms`, so a busy chat costs one model
+    update and one scroll per interval rather than one per socket read.
+    Test locally with fake_irc_server.py and host/port pointed at it.
+    """
+    def __init__(self, channel, font, host=TWITCH_IRC_HOST, port=TWITCH_IRC_PORT, max_lines=150, emote_cache=None, prefetch_emote_ids=(), history=None, update_interval_ms=100, parent=None): 
+        super().__init__(parent)
+        self.emote_cache = emote_cache
+        self._prefetch_emote_ids = list(prefetch_emote_ids)
+        self.model = ChatListModel(max_lines, self)
+        self.list_view = QListView(self)
+        self.delegate = ChatLineDelegate(self.list_view, font, max_entries=max_lines * 2, emote_cache=emote_cache, parent=self)
+        self.list_view.setModel(self.model)
+        self.list_view.setItemDelegate(self.delegate)
+        self.list_view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.list_view.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.list_view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.list_view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.list_view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.list_view.setFrameShape(QFrame.Shape.NoFrame)
+        self.list_view.setStyleSheet("background: transparent;")
+        self.list_view.viewport().setAutoFillBackground(False)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.list_view)
+        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+        self._active = True
+        self._pending = []
+        self._incoming = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(update_interval_ms)
+        self._flush_timer.timeout.connect(self._flush_incoming)
+        if emote_cache is not None: 
+            emote_cache.emote_loaded.connect(lambda emote_id: self.list_view.viewport().update() if self._active else None)
+            emote_cache.frame_tick.connect(self._on_frame_tick)
+        self.client_thread = ChatClientThread(channel, host, port, history)
+        self.client_thread.messages_received.connect(self.on_messages)
+        self.client_thread.start()
+
+    def on_messages(self, messages): 
+        if self.emote_cache is not None: 
+            self.emote_cache.note_messages(messages)
+        if not self._active: 
+            # Hidden behind the whiteboard: just keep the newest lines, insert them when shown again
+            self._pending.extend(messages)
+            del self._pending[:-self.model.max_lines]
+            return
+        self._incoming.extend(messages)
+        if not self._flush_timer.isActive(): 
+            self._flush_timer.start()
+
+    def _flush_incoming(self): 
+        messages, self._incoming = self._incoming, []
+        if not messages: 
+            return
+        if self._active: 
+            self._append(messages)
+        else: 
+            self._pending.extend(messages)
+            del self._pending[:-self.model.max_lines]
+
+    def _append(self, messages): 
+        scrollbar = self.list_view.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 4
+        self.model.append_messages(messages)
+        if at_bottom: 
+            self.list_view.scrollToBottom()
+
+    def prewarm(self, delay_ms=1500): 
+        """Prefetches the usual emotes shortly after startup; the view itself has nothing heavy to build."""
+        if self.emote_cache is not None: 
+            QTimer.singleShot(delay_ms, lambda: self.emote_cache.prefetch(self._prefetch_emote_ids))
+
+    def _on_frame_tick(self): 
+        # Animated emotes share frames and a clock, so one repaint advances all of them
+        if self._active and self.delegate.painted_animated: 
+            self.delegate.painted_animated = False
+            self.list_view.viewport().update()
+
+    def set_active(self, active): 
+        self._active = active
+        if not active and self._incoming: 
+            self._flush_incoming()  # into _pending, ahead of whatever arrives while hidden
+        if active and self._pending: 
+            pending, self._pending = self._pending, []
+            self._append(pending)
+            self.list_view.scrollToBottom()
+
+    def set_font(self, font): 
+        self.delegate.set_font(font)
+        self.list_view.doItemsLayout()
+
+    def close_client(self): 
+        self.client_thread.stop()
+        if self.emote_cache is not None: 
+            self.emote_cache.close()
+
 class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
@@ -121,10 +1239,31 @@ class MainWindow(QWidget):
         self._background_qcolor = QColor(background_color)
         self._background_image_path = "img/bg.svg"
         self._tray_icon_path = "img/tray_icon.svg"
+        self._chat_url = "https://www.twitch.tv/popout/zackrawrr/chat?popout="
+        self._chat_prewarm = True
+        self._chat_inactive_lifecycle = "frozen"  # None, "frozen" or "discarded" while the whiteboard is shown
+        self._chat_max_lines = 150
+        self._chat_mode = "web"  # "web" (QtWebEngine popout page) or "native" (IRC + Qt list, no Chromium)
+        self._chat_channel = "zackrawrr"
+        self._chat_irc_host = TWITCH_IRC_HOST  # "127.0.0.1" with fake_irc_server.py
+        self._chat_irc_port = TWITCH_IRC_PORT
+        self._emote_cache_dir = os.path.join(os.path.expanduser("~"), ".twitch-panel", "emotes")
+        self._emote_cache_budget_bytes = 32 * 1024 * 1024  # decoded pixmaps in RAM; the disk cache is unbounded (a few KB per emote)
+        self._chat_history_enabled = True
+        self._chat_history_dir = os.path.join(os.path.expanduser("~"), ".twitch-panel", "chat_history")
+        self._chat_history_compression = "gzip"  # None, "gzip" or "zstd" for finished session files
+        self._chat_history_max_bytes = 64 * 1024 * 1024  # per file, then rotated into _part2, ...
+        self._chat_index_path = os.path.join(os.path.expanduser("~"), ".twitch-panel", "chat_history.sqlite3")
+        self._eventsub_creds_path = os.path.join("config", "creds.env")
+        self._eventsub_url = EVENTSUB_WS_URL  # "ws://127.0.0.1:8080/ws" with fake_eventsub_server.py
+        self._eventsub_subscriptions_url = EVENTSUB_SUBSCRIPTIONS_URL  # "http://127.0.0.1:8080/eventsub/subscriptions" with the fake
+        self._eventsub_log_path = os.path.join(os.path.expanduser("~"), ".twitch-panel", "eventsub.log")
+        self._emote_prefetch_ids = []  # e.g. the channel's own emote ids; the most used emotes of past sessions are always prefetched
         self._default_window_size = (400, 400)
         self._whiteboard_content_path = os.path.join(os.path.expanduser("~"), ".twitch-panel", "whiteboard.txt")
         os.makedirs(os.path.dirname(self._whiteboard_content_path), exist_ok=True)
         print(f"Whiteboard will be saved to: {self._whiteboard_content_path}")
+        self.whiteboard_autosaver = WhiteboardAutosaver(self._whiteboard_content_path, lambda: self.whiteboard.toPlainText(), parent=self)
         self.button_height = 32
         self.button_color = QColor("white")
         self.button_text_color = QColor("navy")
@@ -138,6 +1277,11 @@ class MainWindow(QWidget):
         self.buttons = []
         self.labels = []
         self.checkboxes = []
+        self.status_labels = []
+        self._status_text_width_cache = {}
+        self._digit_shape_table = str.maketrans("123456789", "000000000")
+        self._deferred_status_texts = {}  # label -> text that arrived while the header preview covered the status bar
+        self.background_renderer = BackgroundRenderer()
         self.stream_window = StreamWindow(main_window_ref=self)
         self.stream_window.move(-10000, -10000)
         self.stream_window.show()
@@ -158,22 +1302,43 @@ class MainWindow(QWidget):
         self.installEventFilter(self)
         self.load_whiteboard()
         QApplication.instance().installEventFilter(self)
-        self.ad_label_update_timer = QTimer(self)
-        self.ad_label_update_timer.timeout.connect(self.update_ad_time_label)
-        self.ad_label_update_timer.start(1000)
-
-    def update_ad_time_label(self):
-        is_preview_active = self.header_preview_container and self.header_preview_container.isVisible()
-        if is_preview_active: 
-            return 
-        if hasattr(self, 'time_till_next_label'): 
-            self.time_till_next_label.setText(f"📢: {self.ad_controller.time_till_next_display}")
-        if hasattr(self, 'obs_status_label'): 
-            self.obs_status_label.setText(self.obs_controller.status)
-        if hasattr(self, 'viewers_label'): 
-            self.viewers_label.setText(self.viewer_controller.count_status)
-        if hasattr(self, 'tts_queue_label'): 
-            self.tts_queue_label.setText(self.tts_controller.queue_status)
+        self.ad_controller.display_changed.connect(lambda display: self.set_status_label_text(self.time_till_next_label, f"📢: {display}"))
+        self.obs_controller.status_changed.connect(lambda status: self.set_status_label_text(self.obs_status_label, status))
+        self.viewer_controller.count_status_changed.connect(lambda status: self.set_status_label_text(self.viewers_label, status))
+        self.tts_controller.queue_status_changed.connect(lambda status: self.set_status_label_text(self.tts_queue_label, status))
+        self.tts_controller.storage_status_changed.connect(self.tts_queue_label.setToolTip)
+        self.eventsub = None
+        self.start_eventsub()
+        if self._chat_prewarm: 
+            self.chat_view.prewarm()  # timer-based, fires once the event loop runs after show()
+
+    def set_status_label_text(self, label, text):
+        # Status labels have a fixed width derived from the text with every digit
+        # replaced by "0", so ticking digits never invalidate the status bar layout.
+        if self.header_preview_container and self.header_preview_container.isVisible(): 
+            # The status bar is hidden behind the preview; apply the latest text once it is back
+            self._deferred_status_texts[label] = text
+            return
+        if label.text() == text: 
+            return
+        width = self._status_text_width(label, text)
+        if label.minimumWidth() != width or label.maximumWidth() != width: 
+            label.setFixedWidth(width)
+        label.setText(text)
+
+    def _status_text_width(self, label, text):
+        label.ensurePolished()
+        shape = text.translate(self._digit_shape_table)
+        key = (label.font().key(), shape)
+        width = self._status_text_width_cache.get(key)
+        if width is None: 
+            width = QFontMetrics(label.font()).horizontalAdvance(shape) + 2
+            self._status_text_width_cache[key] = width
+        return width
+
+    def refresh_status_label_widths(self):
+        for label in self.status_labels: 
+            label.setFixedWidth(self._status_text_width(label, label.text()))
 
     def eventFilter(self, obj, event):
         if event.type() == QEvent.Type.MouseButtonPress:
@@ -223,9 +1388,7 @@ class MainWindow(QWidget):
             if os.path.exists(path_to_load):
                 with open(path_to_load, 'r', encoding='utf-8') as f: 
                     loaded_content = f.read()
-                self.whiteboard.setPlainText(loaded_content)
-                if hasattr(self,'stream_window') and self.stream_window: 
-                    self.stream_window.whiteboard.setPlainText(loaded_content)
+                self.whiteboard.setPlainText(loaded_content) # mirrored to stream_window by whiteboard_mirror
                 if loaded_content: 
                     print(f"Loaded {len(loaded_content)} characters.")
             else: 
@@ -261,6 +1424,22 @@ class MainWindow(QWidget):
         tts_group.addAction(tts_mentions_action)
         tts_menu.addAction(tts_bits_action)
         tts_menu.addAction(tts_mentions_action)
+        tts_bits_action.triggered.connect(lambda: self.tts_controller.set_mode("bits"))
+        tts_mentions_action.triggered.connect(lambda: self.tts_controller.set_mode("mentions"))
+        tts_menu.addSeparator()
+        tts_clip_cache_action = QAction(self.tts_controller.clip_cache_status, self)
+        tts_clip_cache_action.setEnabled(False)
+        tts_menu.addAction(tts_clip_cache_action)
+        self.tts_controller.clip_cache_status_changed.connect(tts_clip_cache_action.setText)
+        tts_push_latency_action = QAction(self.tts_controller.push_latency_status, self)
+        tts_push_latency_action.setEnabled(False)
+        tts_menu.addAction(tts_push_latency_action)
+        self.tts_controller.push_latency_status_changed.connect(tts_push_latency_action.setText)
+        emote_cache_action = None
+        if isinstance(self.chat_view, NativeChatView) and self.chat_view.emote_cache is not None: 
+            emote_cache_action = QAction(self.chat_view.emote_cache.status, self)
+            emote_cache_action.setEnabled(False)
+            tray_menu.aboutToShow.connect(lambda: emote_cache_action.setText(self.chat_view.emote_cache.status))  # counts change as messages arrive
         
         profiles_menu = QMenu("Profiles", self)
         default_profile_action = QAction("Default", self)
@@ -273,6 +1452,10 @@ class MainWindow(QWidget):
         profiles_menu.addAction(new_profile_action)
         profiles_menu.addAction(duplicate_profile_action)
 
+        search_history_action = QAction("Search Chat History", self)
+        search_history_action.setEnabled(self.chat_index is not None)
+        search_history_action.triggered.connect(self.open_chat_search)
+
         current_profile_settings_action = QAction("Profile Settings", self)
         current_profile_settings_action.triggered.connect(self.open_profile_settings)
 
@@ -284,7 +1467,10 @@ class MainWindow(QWidget):
         tray_menu.addAction(show_main_action)
         tray_menu.addAction(show_stream_action)
         tray_menu.addMenu(tts_menu)
+        if emote_cache_action is not None: 
+            tray_menu.addAction(emote_cache_action)
         tray_menu.addMenu(profiles_menu)
+        tray_menu.addAction(search_history_action)
         tray_menu.addAction(current_profile_settings_action)
         tray_menu.addAction(settings_action)
         tray_menu.addAction(exit_action)
@@ -306,6 +1492,7 @@ class MainWindow(QWidget):
             self.show_stream_action.setChecked(self.stream_window.isVisible())
         else: 
             self.show_main_action.setChecked(self.isVisible())
+        self.ad_controller.set_display_active(self.isVisible())
             
     def _update_preview_label_text(self, text):
         if self.header_preview_label and self.header_preview_container:
@@ -394,6 +1581,7 @@ class MainWindow(QWidget):
         for checkbox in self.checkboxes: 
             checkbox.setStyleSheet(checkbox_style_sheet)
             checkbox.setFont(self.button_font)
+        self.refresh_status_label_widths()
         self.update()
         if hasattr(self, 'stream_window') and self.stream_window: 
             self.stream_window.update()
@@ -410,7 +1598,8 @@ class MainWindow(QWidget):
         self.obs_status_label = self.create_label(self.obs_controller.status)
         self.viewers_label = self.create_label(self.viewer_controller.count_status)
         self.tts_queue_label = self.create_label(self.tts_controller.queue_status)
-        self.time_till_next_label = self.create_label(f"📢: {self.ad_controller.time_till_next_display}")
+        self.time_till_next_label = self.create_label(f"📢: {self.ad_controller.display}")
+        self.status_labels = [self.obs_status_label, self.viewers_label, self.tts_queue_label, self.time_till_next_label]
         status_layout.addWidget(self.view_toggle)
         status_layout.addSpacing(10)
         status_layout.addWidget(self.obs_status_label)
@@ -423,6 +1612,7 @@ class MainWindow(QWidget):
         status_layout.addSpacing(10)
         self.status_bar.setLayout(status_layout)
         self.status_bar.setFixedHeight(self.actual_status_bar_height)
+        self.refresh_status_label_widths()
         self.controls_bar = QWidget()
         controls_layout = QHBoxLayout()
         controls_layout.setContentsMargins(5,5,5,5)
@@ -445,6 +1635,7 @@ class MainWindow(QWidget):
         tts_label = self.create_label("🗣️")
         play_button = self.create_button("▶")
         stop_button = self.create_button("⏹")
+        skip_button = self.create_button("⏭")
         autoplay_toggle = self.create_checkbox("📜")
         ads_layout.addWidget(ads_label)
         ads_layout.addWidget(run_button)
@@ -455,6 +1646,7 @@ class MainWindow(QWidget):
         tts_layout.addWidget(tts_label)
         tts_layout.addWidget(play_button)
         tts_layout.addWidget(stop_button)
+        tts_layout.addWidget(skip_button)
         tts_layout.addWidget(autoplay_toggle)
         tts_group.setLayout(tts_layout)
         controls_layout.addWidget(ads_group,0,Qt.AlignmentFlag.AlignLeft)
@@ -470,7 +1662,8 @@ class MainWindow(QWidget):
         self.whiteboard.setStyleSheet(f"QTextEdit {{ background: transparent; border: none; font-size: {self.whiteboard_font.pointSize()}px; font-family: \"{self.whiteboard_font.family()}\"; padding-top: 10px; }}")
         self.whiteboard.setReadOnly(False)
         self.whiteboard.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
-        self.whiteboard.textChanged.connect(self.sync_whiteboard)
+        self.whiteboard_mirror = WhiteboardMirror(self.whiteboard, self.stream_window.whiteboard)
+        self.whiteboard.textChanged.connect(self.autosave_whiteboard)
         self.whiteboard.setWordWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
         self.whiteboard.focusInEvent = lambda e: print("Whiteboard: Focus IN")
         self.whiteboard.focusOutEvent = lambda e: print("Whiteboard: Focus OUT")
@@ -480,26 +1673,72 @@ class MainWindow(QWidget):
             self.raise_()
             event.accept()
         self.whiteboard.mousePressEvent = whiteboard_mouse_press
-        self.view_stack.addWidget(QWidget())
+        self.chat_history = None
+        self.chat_history_client = None
+        self.chat_index = None
+        if self._chat_history_enabled: 
+            self.chat_index = ChatHistoryIndex(self._chat_index_path, self._chat_history_dir)
+            # Files are indexed on the writer's thread as they close; older ones by a one-off catch-up thread
+            self.chat_history = ChatHistoryWriter(self._chat_history_dir, max_bytes=self._chat_history_max_bytes, compression=self._chat_history_compression, on_file_closed=self.chat_index.ingest_closed_file)
+            threading.Thread(target=self.chat_index.ingest_pending, args=([self.chat_history.session_name + ".csv"],), name="chat-index", daemon=True).start()
+            print(f"Chat history will be saved to: {self.chat_history.directory}")
+        if self._chat_mode == "native": 
+            self.emote_cache = EmoteCache(self._emote_cache_dir, self._emote_cache_budget_bytes, parent=self)
+            self.chat_view = NativeChatView(self._chat_channel, self.chat_font, self._chat_irc_host, self._chat_irc_port, self._chat_max_lines, self.emote_cache, self._emote_prefetch_ids, self.chat_history)
+        else: 
+            self.chat_view = LazyChatView(self._chat_url, self._chat_inactive_lifecycle, self._chat_max_lines)
+            if self.chat_history is not None: 
+                # The web page's messages aren't reachable from Python; read the channel over IRC for the history only
+                self.chat_history_client = ChatClientThread(self._chat_channel, self._chat_irc_host, self._chat_irc_port, self.chat_history)
+                self.chat_history_client.start()
+        self.view_stack.addWidget(self.chat_view)
         self.view_stack.addWidget(self.whiteboard)
         self.main_layout.addWidget(self.status_bar)
         self.main_layout.addWidget(self.controls_bar)
         self.main_layout.addWidget(self.view_stack,1)
         self.setLayout(self.main_layout)
         self.view_toggle.clicked.connect(self.toggle_view)
-        delay_button.clicked.connect(lambda: self.ad_controller.delay(5))
+        delay_button.clicked.connect(self.prompt_ad_delay)
         delay_5min_button.clicked.connect(lambda: self.ad_controller.delay(5))
         run_button.clicked.connect(self.ad_controller.run)
         double_toggle.stateChanged.connect(self.ad_controller.toggle_double)
         play_button.clicked.connect(self.tts_controller.play)
         stop_button.clicked.connect(self.tts_controller.stop)
+        skip_button.clicked.connect(self.tts_controller.skip)
         autoplay_toggle.stateChanged.connect(self.tts_controller.toggle_autoplay)
 
+    def start_eventsub(self): 
+        if aiohttp is None: 
+            print("EventSub: aiohttp not installed, not listening for events")
+            return
+        creds = load_creds(self._eventsub_creds_path)
+        missing = [key for key in ("TWITCH_CLIENT_ID", "TWITCH_AUTH_TOKEN", "TWITCH_BROADCASTER_ID") if not creds.get(key)]
+        if missing and self._eventsub_url == EVENTSUB_WS_URL:  # the fake server takes anything
+            print(f"EventSub: {', '.join(missing)} missing in {self._eventsub_creds_path}, not listening for events")
+            return
+        self.eventsub = EventSubThread(creds, self._eventsub_url, self._eventsub_subscriptions_url, self._eventsub_log_path, self.tts_controller.server_url)
+        self.eventsub.viewers_changed.connect(self.viewer_controller.apply_update)
+        self.eventsub.ad_break_started.connect(lambda event: self.ad_controller.begin_break(event.duration_seconds))
+        self.eventsub.start()
+
+    def prompt_ad_delay(self):
+        dialog = QInputDialog(self)
+        dialog.setWindowTitle("Delay Ad")
+        dialog.setLabelText("Delay next ad by (minutes):")
+        dialog.setInputMode(QInputDialog.InputMode.DoubleInput)
+        dialog.setDoubleRange(0.1, 180.0)
+        dialog.setDoubleDecimals(1)
+        dialog.setDoubleValue(5.0)
+        self.center_window(dialog)
+        if dialog.exec(): 
+            self.ad_controller.delay(dialog.doubleValue())
+
     def toggle_view(self):
         current_index = self.view_stack.currentIndex()
         new_index = 1 - current_index
         self.view_stack.setCurrentIndex(new_index)
         is_chat_view = (new_index == 0)
+        self.chat_view.set_active(is_chat_view)
         self.controls_bar.setVisible(is_chat_view)
         if not is_chat_view: 
             self.whiteboard.setFocus()
@@ -576,18 +1815,13 @@ class MainWindow(QWidget):
             self.setCursor(Qt.CursorShape.ArrowCursor)
 
     def sync_whiteboard(self):
-        if hasattr(self,'stream_window') and self.stream_window: 
-            content=self.whiteboard.toPlainText()
-            self.stream_window.whiteboard.setPlainText(content)
-            self.autosave_whiteboard()
+        # Full resync; regular edits are mirrored incrementally by whiteboard_mirror
+        if hasattr(self,'whiteboard_mirror') and self.whiteboard_mirror: 
+            self.whiteboard_mirror.resync()
 
     def autosave_whiteboard(self):
         if self._whiteboard_content_path:
-            try:
-                with open(self._whiteboard_content_path,'w',encoding='utf-8') as f: 
-                    f.write(self.whiteboard.toPlainText())
-            except Exception as e: 
-                print(f"Error saving whiteboard: {e}")
+            self.whiteboard_autosaver.request_save()
 
     def open_settings(self):
         if not hasattr(self,"settings_window") or not self.settings_window: 
@@ -596,7 +1830,25 @@ class MainWindow(QWidget):
         self.settings_window.show()
         self.settings_window.activateWindow()
 
+    def open_chat_search(self): 
+        if not hasattr(self,"chat_search_window") or not self.chat_search_window: 
+            self.chat_search_window=ChatSearchDialog(self.chat_index,self)
+        self.center_window(self.chat_search_window)
+        self.chat_search_window.show()
+        self.chat_search_window.activateWindow()
+
     def exit_app(self): 
+        self.whiteboard_autosaver.close()
+        self.tts_controller.close()
+        if self.eventsub is not None: 
+            self.eventsub.stop()
+        if isinstance(self.chat_view, NativeChatView): 
+            self.chat_view.close_client()
+        if self.chat_history_client is not None: 
+            self.chat_history_client.stop()
+        if self.chat_history is not None: 
+            self.chat_history.close()  # indexes the session's last file on the way out
+            self.chat_index.close()
         self.tray_icon.hide()
         QApplication.quit()
 
@@ -617,19 +1869,7 @@ class MainWindow(QWidget):
         painter=QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         painter.fillRect(self.rect(),self._background_qcolor)
-        if os.path.exists(self._background_image_path):
-            renderer=QSvgRenderer(self._background_image_path)
-            if renderer.isValid():
-                original_size=renderer.defaultSize()
-                scaled_width=int(original_size.width()*self._image_scale_modifier)
-                scaled_height=int(original_size.height()*self._image_scale_modifier)
-                scaled_size=QSize(scaled_width,scaled_height)
-                x=(self.width()-scaled_size.width())//2
-                y=(self.height()-scaled_size.height())//2
-                renderer.render(painter,QRectF(x,y,scaled_size.width(),scaled_size.height()))
-                overlay_color_img=QColor(self._background_qcolor)
-                overlay_color_img.setAlpha(int(self._background_opacity*255))
-                painter.fillRect(QRectF(x,y,scaled_size.width(),scaled_size.height()),overlay_color_img)
+        self.background_renderer.paint(painter,self.rect(),self._background_image_path,self._image_scale_modifier,self._background_opacity,self._background_qcolor,self.devicePixelRatioF())
         overlay_color_bar=QColor(255,255,255,128)
         is_preview_active = self.header_preview_container and self.header_preview_container.isVisible()
         if self.status_bar.isVisible() and not is_preview_active: 
@@ -703,6 +1943,9 @@ class MainWindow(QWidget):
                 if self.main_layout.indexOf(self._original_status_bar_widget)==-1: 
                     self.main_layout.insertWidget(self._status_bar_index_in_layout,self._original_status_bar_widget)
                 self._original_status_bar_widget.show()
+            deferred, self._deferred_status_texts = self._deferred_status_texts, {}
+            for label, text in deferred.items(): 
+                self.set_status_label_text(label, text)
             QApplication.processEvents()
             self.update()
 
@@ -716,11 +1959,13 @@ class StreamWindow(QWidget):
         self._background_image_path = "img/bg.svg"
         self.main_window_ref = main_window_ref
         if self.main_window_ref:
+            self.background_renderer = self.main_window_ref.background_renderer
             self.header_content_height = self.main_window_ref.button_height
             self.header_margin = self.main_window_ref.status_bar_internal_margin
             self.actual_header_height = self.main_window_ref.actual_status_bar_height
             self._default_window_size = self.main_window_ref._default_window_size
         else:
+            self.background_renderer = BackgroundRenderer()
             self.header_content_height = 32
             self.header_margin = 5
             self.actual_header_height = 42
@@ -807,23 +2052,63 @@ class StreamWindow(QWidget):
         painter=QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         painter.fillRect(self.rect(),self._background_qcolor)
-        if os.path.exists(self._background_image_path):
-            renderer=QSvgRenderer(self._background_image_path)
-            if renderer.isValid():
-                original_size=renderer.defaultSize()
-                scaled_width=int(original_size.width()*self._image_scale_modifier)
-                scaled_height=int(original_size.height()*self._image_scale_modifier)
-                scaled_size=QSize(scaled_width,scaled_height)
-                x=(self.width()-scaled_size.width())//2
-                y=(self.height()-scaled_size.height())//2
-                renderer.render(painter,QRectF(x,y,scaled_size.width(),scaled_size.height()))
-                overlay_color_img=QColor(self._background_qcolor)
-                overlay_color_img.setAlpha(int(self._background_opacity*255))
-                painter.fillRect(QRectF(x,y,scaled_size.width(),scaled_size.height()),overlay_color_img)
+        self.background_renderer.paint(painter,self.rect(),self._background_image_path,self._image_scale_modifier,self._background_opacity,self._background_qcolor,self.devicePixelRatioF())
         header_rect=QRectF(0,0,self.width(),self.actual_header_height)
         overlay_color_bar=QColor(255,255,255,128)
         painter.fillRect(header_rect,overlay_color_bar)
 
+class ChatSearchDialog(QDialog):
+    """Tray "Search chat history": text, user and time range over the ChatHistoryIndex, newest first."""
+    RANGES = [("Any time", None), ("Last 24 hours", 86400), ("Last 7 days", 7 * 86400), ("Last 30 days", 30 * 86400), ("Last year", 365 * 86400)]
+
+    def __init__(self, index, parent=None): 
+        super().__init__(parent)
+        self.index = index
+        self.setWindowTitle("Search Chat History")
+        self.setMinimumSize(600, 450)
+        layout = QVBoxLayout(self)
+        fields = QHBoxLayout()
+        self.text_edit = QLineEdit()
+        self.text_edit.setPlaceholderText("Words (all must match, word* for prefix)")
+        self.user_edit = QLineEdit()
+        self.user_edit.setPlaceholderText("User")
+        self.user_edit.setFixedWidth(140)
+        self.range_box = QComboBox()
+        for label, _ in self.RANGES: 
+            self.range_box.addItem(label)
+        search_button = QPushButton("Search")
+        fields.addWidget(self.text_edit, 1)
+        fields.addWidget(self.user_edit)
+        fields.addWidget(self.range_box)
+        fields.addWidget(search_button)
+        layout.addLayout(fields)
+        self.results = QTextEdit()
+        self.results.setReadOnly(True)
+        self.results.setLineWrapMode(QTextEdit.LineWrapMode.WidgetWidth)
+        layout.addWidget(self.results, 1)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+        search_button.clicked.connect(self.search)
+        self.text_edit.returnPressed.connect(self.search)
+        self.user_edit.returnPressed.connect(self.search)
+
+    def search(self): 
+        text, user = self.text_edit.text().strip(), self.user_edit.text().strip()
+        seconds = self.RANGES[self.range_box.currentIndex()][1]
+        since = time.time() - seconds if seconds else None
+        started = time.perf_counter()
+        try: 
+            results = self.index.search(text or None, user or None, since)
+        except sqlite3.Error as e:  # e.g. a query FTS5 can't parse
+            self.status_label.setText(f"Search failed: {e}")
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.results.setPlainText("\n".join(
+            f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(result.timestamp))}  {result.display_name}: {result.message}" for result in results
+        ))
+        stats = self.index.stats()
+        self.status_label.setText(f"{len(results)} results in {elapsed_ms:.1f} ms, {stats['messages']} messages in {stats['files']} files indexed")
+
 class SettingsWindow(QDialog): # Assumed correct from previous, no changes needed for reported issues
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -852,6 +2137,7 @@ class SettingsWindow(QDialog): # Assumed correct from previous, no changes neede
     def change_chat_font(self):
         font,ok=QFontDialog.getFont(self.parent().chat_font,self,"Select Chat Font")
         if ok: self.parent().chat_font=font; print(f"Chat font changed to: {font.family()}, size: {font.pointSize()}")
+        if ok and isinstance(self.parent().chat_view,NativeChatView): self.parent().chat_view.set_font(font)
     def change_tts_font(self):
         font,ok=QFontDialog.getFont(self.parent().tts_font,self,"Select TTS Font")
         if ok: self.parent().tts_font=font; print(f"TTS font changed to: {font.family()}, size: {font.pointSize()}")
@@ -1185,6 +2471,8 @@ if __name__ == "__main__":
         with open("img/tray_icon.svg", "w") as f: 
             f.write(dummy_svg_content)
 
+    # Lets QtWebEngine be imported after the QApplication exists (the chat view is created lazily)
+    QApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
     signal.signal(signal.SIGINT, signal.SIG_DFL)
     main_window = MainWindow()
@@ -0,0 +1,282 @@
+"""Emote images for the native chat view, fetched and decoded once per emote.
+
+Three levels, checked in order:
+  - memory: decoded QPixmaps, already scaled to the chat line height, in an
+    LRU bounded by a byte budget (width * height * 4 per frame);
+  - disk: the raw CDN bytes under `cache_dir/<emote id>_<scale>`, the CDN
+    scale being picked from the drawn pixel height;
+  - network: the Twitch emote CDN.
+Decoding (and writing downloads to disk) happens on one worker thread;
+only the QImage -> QPixmap conversion runs on the GUI thread. Animated
+emotes are decoded into a single frame list that every occurrence on screen
+draws from, picking the frame from a shared clock, so a spammed emote costs
+one decode and one set of frames however many lines show it.
+
+Emote ids seen in chat are counted and persisted; at startup the most
+frequent ones (plus any ids passed in, e.g. the channel's own emote set)
+are prefetched.
+"""
+import json
+import os
+import re
+import tempfile
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtCore import QBuffer, QByteArray, QElapsedTimer, QIODevice, QObject, Qt, QTimer, QUrl, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader, QPixmap
+from PyQt6.QtNetwork import QNetworkAccessManager, QNetworkReply, QNetworkRequest
+
+EMOTE_URL = "https://static-cdn.jtvnw.net/emoticons/v2/{emote_id}/default/dark/{scale}"  # "default" serves a GIF for animated emotes
+EMOTE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_]+$")
+DEFAULT_FRAME_DELAY_MS = 100
+
+
+class EmoteImage:
+    """Decoded frames of one emote, shared by every occurrence on screen."""
+    def __init__(self, frames, delays):
+        self.frames = frames
+        self.delays = delays
+        self._ends = []
+        elapsed = 0
+        for delay in delays:
+            elapsed += delay
+            self._ends.append(elapsed)
+        self.duration = elapsed
+        self.nbytes = sum(frame.width() * frame.height() * 4 for frame in frames)
+
+    @property
+    def animated(self):
+        return len(self.frames) > 1
+
+    def frame_at(self, clock_ms):
+        if not self.animated or self.duration <= 0:
+            return self.frames[0]
+        return self.frames[min(bisect_right(self._ends, clock_ms % self.duration), len(self.frames) - 1)]
+
+
+def _decode(data, height):
+    """Worker thread: raw image bytes -> ([QImage, ...], [delay_ms, ...]) scaled to `height` pixels."""
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+    reader = QImageReader(buffer)
+    images, delays = [], []
+    while True:
+        image = reader.read()
+        if image.isNull():
+            break
+        if image.height() != height:
+            image = image.scaledToHeight(height, Qt.TransformationMode.SmoothTransformation)
+        images.append(image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied))
+        delay = reader.nextImageDelay()
+        delays.append(delay if delay > 0 else DEFAULT_FRAME_DELAY_MS)
+        if not reader.supportsAnimation() or not reader.canRead():
+            break
+    return images, delays
+
+
+class EmoteCache(QObject):
+    emote_loaded = pyqtSignal(str)
+    frame_tick = pyqtSignal()  # while animated emotes are cached; views repaint if they show one
+    _decoded = pyqtSignal(object)  # from the worker thread
+
+    def __init__(self, cache_dir, budget_bytes=32 * 1024 * 1024, scale=None, prefetch_count=200, frame_interval_ms=40, parent=None):
+        super().__init__(parent)
+        self._cache_dir = cache_dir
+        self._budget_bytes = budget_bytes
+        self._scale = scale  # CDN size "1.0" (28 px), "2.0" or "3.0"; None picks it from the drawn pixel height
+        self._prefetch_count = prefetch_count
+        self._height = 28
+        self._device_pixel_ratio = 1.0
+        self._images = OrderedDict()  # emote id -> EmoteImage, least recently drawn first
+        self._bytes = 0
+        self._pending = set()
+        self._failed = set()  # ids the CDN doesn't know; not retried this session
+        self._seen = Counter()
+        self._counters = Counter()
+        self._seen_path = os.path.join(cache_dir, "seen.json")
+        os.makedirs(cache_dir, exist_ok=True)
+        self._network = QNetworkAccessManager(self)
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="emote-decode")
+        self._decoded.connect(self._on_decoded)
+        self._clock = QElapsedTimer()
+        self._clock.start()
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setInterval(frame_interval_ms)
+        self._frame_timer.timeout.connect(self.frame_tick.emit)
+        self._load_seen()
+
+    # Lookup
+    def get(self, emote_id):
+        """The decoded emote, or None while it is loading (emote_loaded fires when it arrives).
+
+        Called on every repaint, so it isn't counted; hits and misses are
+        counted once per emote occurrence in note_messages().
+        """
+        image = self._images.get(emote_id)
+        if image is not None:
+            self._images.move_to_end(emote_id)
+            return image
+        self._load(emote_id)
+        return None
+
+    def clock_ms(self):
+        return self._clock.elapsed()
+
+    def set_size(self, height, device_pixel_ratio=1.0):
+        """Pixel height emotes are drawn at; cached pixmaps are dropped if it changes."""
+        if (height, device_pixel_ratio) == (self._height, self._device_pixel_ratio):
+            return
+        self._height = height
+        self._device_pixel_ratio = device_pixel_ratio
+        self._images.clear()
+        self._bytes = 0
+        self._frame_timer.stop()
+
+    def note_messages(self, messages):
+        """Counts emote usage and cache hits, and starts loading emotes of incoming lines before they are painted."""
+        for message in messages:
+            for emote_id, _, _ in message.emotes:
+                self._seen[emote_id] += 1
+                if emote_id in self._images:
+                    self._counters["memory_hits"] += 1
+                else:
+                    self._counters["misses"] += 1
+                    self._load(emote_id)
+
+    def prefetch(self, emote_ids=()):
+        """Loads `emote_ids` and the most frequently seen emotes of previous sessions."""
+        ids = list(dict.fromkeys([*emote_ids, *(emote_id for emote_id, _ in self._seen.most_common(self._prefetch_count))]))
+        for emote_id in ids:
+            if emote_id not in self._images:
+                self._counters["prefetched"] += 1
+                self._load(emote_id)
+        return len(ids)
+
+    # Loading
+    def _scale_for(self, height):
+        if self._scale is not None:
+            return self._scale
+        return "1.0" if height <= 28 else "2.0" if height <= 56 else "3.0"
+
+    def _disk_path(self, emote_id, height):
+        return os.path.join(self._cache_dir, f"{emote_id}_{self._scale_for(height)}")
+
+    def _load(self, emote_id):
+        if emote_id in self._pending or emote_id in self._failed:
+            return
+        if not EMOTE_ID_PATTERN.match(emote_id):
+            self._failed.add(emote_id)
+            return
+        self._pending.add(emote_id)
+        height = round(self._height * self._device_pixel_ratio)
+        path = self._disk_path(emote_id, height)
+        if os.path.exists(path):
+            self._counters["disk_loads"] += 1
+            self._worker.submit(self._decode_file, emote_id, path, height)
+        else:
+            self._counters["downloads"] += 1
+            reply = self._network.get(QNetworkRequest(QUrl(EMOTE_URL.format(emote_id=emote_id, scale=self._scale_for(height)))))
+            reply.finished.connect(lambda: self._on_download(emote_id, reply, height))
+
+    def _on_download(self, emote_id, reply, height):
+        if reply.error() != QNetworkReply.NetworkError.NoError:
+            self._pending.discard(emote_id)
+            self._counters["download_failures"] += 1
+            if reply.attribute(QNetworkRequest.Attribute.HttpStatusCodeAttribute) == 404:
+                self._failed.add(emote_id)
+            else:
+                print(f"Emotes: Download of {emote_id} failed ({reply.errorString()})")
+        else:
+            self._worker.submit(self._store_and_decode, emote_id, bytes(reply.readAll()), height)
+        reply.deleteLater()
+
+    def _decode_file(self, emote_id, path, height):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            data = b""
+        self._decoded.emit((emote_id, height, *_decode(data, height)))
+
+    def _store_and_decode(self, emote_id, data, height):
+        path = self._disk_path(emote_id, height)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self._cache_dir, prefix=".emote-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Emotes: Could not cache {emote_id} on disk: {e}")
+        self._decoded.emit((emote_id, height, *_decode(data, height)))
+
+    def _on_decoded(self, result):
+        emote_id, height, images, delays = result
+        self._pending.discard(emote_id)
+        if not images:
+            self._failed.add(emote_id)
+            self._counters["decode_failures"] += 1
+            return
+        if height != round(self._height * self._device_pixel_ratio):
+            return  # size changed while decoding; the next get() reloads it
+        frames = []
+        for image in images:
+            pixmap = QPixmap.fromImage(image)
+            pixmap.setDevicePixelRatio(self._device_pixel_ratio)
+            frames.append(pixmap)
+        image = EmoteImage(frames, delays)
+        self._images[emote_id] = image
+        self._bytes += image.nbytes
+        while self._bytes > self._budget_bytes and len(self._images) > 1:
+            _, evicted = self._images.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self._counters["evictions"] += 1
+        if image.animated and not self._frame_timer.isActive():
+            self._frame_timer.start()
+        elif not any(cached.animated for cached in self._images.values()):
+            self._frame_timer.stop()
+        self.emote_loaded.emit(emote_id)
+
+    # Counters
+    def stats(self):
+        hits, misses = self._counters["memory_hits"], self._counters["misses"]
+        return {
+            "memory_hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else None,
+            "disk_loads": self._counters["disk_loads"],
+            "downloads": self._counters["downloads"],
+            "download_failures": self._counters["download_failures"],
+            "decode_failures": self._counters["decode_failures"],
+            "prefetched": self._counters["prefetched"],
+            "evictions": self._counters["evictions"],
+            "entries": len(self._images),
+            "animated": sum(1 for image in self._images.values() if image.animated),
+            "bytes": self._bytes,
+            "budget_bytes": self._budget_bytes,
+        }
+
+    @property
+    def status(self):
+        stats = self.stats()
+        rate = f" ({stats['hit_rate']:.0%})" if stats["hit_rate"] is not None else ""
+        return f"Emotes: {stats['memory_hits']} hits / {stats['misses']} misses{rate}, {stats['entries']} cached, {stats['bytes'] / 1048576:.1f} / {self._budget_bytes / 1048576:.0f} MB"
+
+    # Persistence
+    def _load_seen(self):
+        try:
+            with open(self._seen_path, "r", encoding="utf-8") as f:
+                self._seen.update({str(emote_id): int(count) for emote_id, count in json.load(f).items()})
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def close(self):
+        self._frame_timer.stop()
+        self._worker.shutdown(wait=False, cancel_futures=True)
+        try:
+            with open(self._seen_path, "w", encoding="utf-8") as f:
+                json.dump(dict(self._seen.most_common(max(self._prefetch_count * 5, 1000))), f)
+        except OSError as e:
+            print(f"Emotes: Could not save usage counts: {e}")
@@ -0,0 +1,165 @@
+"""Local stand-in for Twitch EventSub (WebSocket transport), for testing the dashboard's event path.
+
+Serves the same two endpoints the Twitch CLI mock server does:
+  - GET  /ws: sends session_welcome, then notifications for the session's
+    subscriptions at a fixed rate, session_keepalive whenever it would
+    otherwise be silent, and (with --reconnect-after) a session_reconnect
+    pointing back at itself. Like Twitch, the old connection keeps
+    delivering until the client connects to the reconnect URL and is closed
+    30 s later if the client doesn't; the session resumes with its
+    subscriptions;
+  - POST /eventsub/subscriptions: accepts any credentials and subscribes the
+    session named in the transport.
+Events are randomized but shaped like Twitch's payloads (cheers, subs,
+gifts, raids, ad breaks), and --duplicates re-sends some notifications to
+exercise de-duplication.
+
+    python fake_eventsub_server.py --port 8080 --rate 20
+    (dashboard: _eventsub_url = "ws://127.0.0.1:8080/ws",
+     _eventsub_subscriptions_url = "http://127.0.0.1:8080/eventsub/subscriptions")
+"""
+import argparse
+import asyncio
+import random
+import uuid
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+USERS = ["raider_joe", "pixelqueen", "NoScopeNina", "glhf_gary", "lurker42", "CaptainClutch"]
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _message(message_type, payload, subscription_type=None):
+    metadata = {"message_id": str(uuid.uuid4()), "message_type": message_type, "message_timestamp": _now()}
+    if subscription_type:
+        metadata.update({"subscription_type": subscription_type, "subscription_version": "1"})
+    return {"metadata": metadata, "payload": payload}
+
+
+def fake_event(subscription_type, rng):
+    user = rng.choice(USERS)
+    user_fields = {"user_id": str(USERS.index(user) + 1000), "user_login": user.lower(), "user_name": user}
+    broadcaster = {"broadcaster_user_id": "1", "broadcaster_user_login": "streamer", "broadcaster_user_name": "Streamer"}
+    if subscription_type == "channel.cheer":
+        return {**broadcaster, **user_fields, "is_anonymous": False, "bits": rng.choice((100, 100, 500, 1000)), "message": f"Cheer100 hello from {user}"}
+    if subscription_type == "channel.subscribe":
+        return {**broadcaster, **user_fields, "tier": rng.choice(("1000", "2000", "3000")), "is_gift": rng.random() < 0.3}
+    if subscription_type == "channel.subscription.message":
+        return {**broadcaster, **user_fields, "tier": "1000", "message": {"text": "another month!", "emotes": []}, "cumulative_months": rng.randint(2, 40), "streak_months": None, "duration_months": 1}
+    if subscription_type == "channel.subscription.gift":
+        return {**broadcaster, **user_fields, "total": rng.choice((1, 5, 10)), "tier": "1000", "cumulative_total": None, "is_anonymous": False}
+    if subscription_type == "channel.raid":
+        return {"from_broadcaster_user_id": "77", "from_broadcaster_user_login": user.lower(), "from_broadcaster_user_name": user,
+                "to_broadcaster_user_id": "1", "to_broadcaster_user_login": "streamer", "to_broadcaster_user_name": "Streamer", "viewers": rng.randint(5, 2000)}
+    if subscription_type == "channel.ad_break.begin":
+        return {"broadcaster_user_id": "1", "broadcaster_user_login": "streamer", "broadcaster_user_name": "Streamer",
+                "duration_seconds": rng.choice((30, 60, 90, 180)), "started_at": _now(), "is_automatic": rng.choice(("true", "false")),
+                "requester_user_id": "1", "requester_user_login": "streamer", "requester_user_name": "Streamer"}
+    if subscription_type in ("stream.online", "stream.offline"):
+        return {**broadcaster, "id": "9001", "type": "live", "started_at": _now()} if subscription_type == "stream.online" else broadcaster
+    return {**broadcaster}
+
+
+# Relative frequency of each event type in the generated stream
+WEIGHTS = {"channel.cheer": 40, "channel.subscribe": 25, "channel.subscription.message": 15, "channel.subscription.gift": 10,
+           "channel.raid": 3, "channel.ad_break.begin": 2, "stream.online": 1, "stream.offline": 1}
+
+
+class FakeEventSubServer:
+    def __init__(self, rate=5.0, keepalive=10, reconnect_after=None, duplicates=0.0, seed=None):
+        self.rate = rate  # notifications per second per session
+        self.keepalive = keepalive
+        self.reconnect_after = reconnect_after
+        self.duplicates = duplicates
+        self.rng = random.Random(seed)
+        self.sessions = {}  # session id -> {subscription type: subscription}
+        self.connections = {}  # session id -> the connection notifications go to (the newest one)
+
+    def app(self):
+        app = web.Application()
+        app.add_routes([web.get("/ws", self.handle_ws), web.post("/eventsub/subscriptions", self.handle_subscribe)])
+        return app
+
+    async def handle_subscribe(self, request):
+        body = await request.json()
+        session_id = body.get("transport", {}).get("session_id")
+        if session_id not in self.sessions:
+            raise web.HTTPBadRequest(text="unknown session_id")
+        subscription = {"id": str(uuid.uuid4()), "status": "enabled", "type": body["type"], "version": body.get("version", "1"),
+                        "condition": body.get("condition", {}), "transport": body["transport"], "created_at": _now(), "cost": 0}
+        self.sessions[session_id][body["type"]] = subscription
+        return web.json_response({"data": [subscription], "total": len(self.sessions[session_id]), "total_cost": 0, "max_total_cost": 10}, status=202)
+
+    async def handle_ws(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        session_id = request.query.get("session")
+        if session_id not in self.sessions:
+            session_id = str(uuid.uuid4())
+            self.sessions[session_id] = {}
+        self.connections[session_id] = ws
+        await ws.send_json(_message("session_welcome", {"session": {
+            "id": session_id, "status": "connected", "connected_at": _now(), "keepalive_timeout_seconds": self.keepalive, "reconnect_url": None}}))
+        print(f"Fake EventSub: Session {session_id} connected")
+        sender = asyncio.create_task(self._stream(ws, session_id, request))
+        try:
+            async for _ in ws:
+                pass  # clients don't send anything on EventSub
+        finally:
+            sender.cancel()
+            if self.connections.get(session_id) is ws:
+                del self.connections[session_id]
+        print(f"Fake EventSub: Session {session_id} disconnected")
+        return ws
+
+    async def _stream(self, ws, session_id, request):
+        loop = asyncio.get_running_loop()
+        started = last_sent = loop.time()
+        interval = 1.0 / self.rate if self.rate > 0 else None
+        close_at = None
+        try:
+            while not ws.closed:
+                await asyncio.sleep(interval if interval else self.keepalive / 2)
+                now = loop.time()
+                if close_at is not None and now >= close_at:
+                    await ws.close()  # Twitch closes the old connection 30 s after session_reconnect
+                    return
+                if self.reconnect_after and close_at is None and now - started >= self.reconnect_after:
+                    url = f"ws://{request.host}/ws?session={session_id}"
+                    await ws.send_json(_message("session_reconnect", {"session": {
+                        "id": session_id, "status": "reconnecting", "keepalive_timeout_seconds": None, "reconnect_url": url, "connected_at": _now()}}))
+                    close_at = now + 30
+                    continue
+                subscriptions = self.sessions.get(session_id, {})
+                if interval and subscriptions and self.connections.get(session_id) is ws:
+                    types = list(subscriptions)
+                    subscription_type = self.rng.choices(types, [WEIGHTS.get(t, 1) for t in types])[0]
+                    message = _message("notification", {"subscription": subscriptions[subscription_type], "event": fake_event(subscription_type, self.rng)}, subscription_type)
+                    await ws.send_json(message)
+                    if self.rng.random() < self.duplicates:
+                        await ws.send_json(message)
+                    last_sent = now
+                elif now - last_sent >= self.keepalive * 0.8:
+                    await ws.send_json(_message("session_keepalive", {}))
+                    last_sent = now
+        except (ConnectionError, RuntimeError):
+            pass  # connection closed while sending
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--rate", type=float, default=5.0, help="notifications per second per session")
+    parser.add_argument("--keepalive", type=int, default=10, help="keepalive_timeout_seconds announced in the welcome")
+    parser.add_argument("--reconnect-after", type=float, help="send session_reconnect after this many seconds")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="fraction of notifications sent twice")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    server = FakeEventSubServer(args.rate, args.keepalive, args.reconnect_after, args.duplicates, args.seed)
+    print(f"Fake EventSub: ws://{args.host}:{args.port}/ws, {args.rate:g} events/sec per session")
+    web.run_app(server.app(), host=args.host, port=args.port, print=None)
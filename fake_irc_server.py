@@ -0,0 +1,124 @@
+"""Local stand-in for Twitch's IRC chat server, for testing the native chat view.
+
+Accepts any NICK, answers CAP/JOIN/PING like Twitch does and then streams
+tagged PRIVMSG lines into every joined channel at a fixed rate (with the
+occasional emote, /me and cheer), so the dashboard's native chat can be
+load-tested and profiled without a real channel.
+
+    python fake_irc_server.py --port 6667 --rate 50
+    (dashboard: native chat mode pointed at 127.0.0.1:6667)
+"""
+import argparse
+import asyncio
+import random
+import time
+
+USERS = ["raider_joe", "pixelqueen", "NoScopeNina", "glhf_gary", "modbot", "lurker42", "CaptainClutch", "zzz_sleepy"]
+COLORS = ["#FF4500", "#1E90FF", "#9ACD32", "#DAA520", "", "#FF69B4", "#00FF7F", "#8A2BE2"]
+WORDS = "gg lol pog that was insane lets go hype chat clip it first time here love the stream W o7".split()
+EMOTES = [("25", "Kappa"), ("88", "PogChamp"), ("1902", "Keepo"), ("354", "4Head")]
+
+
+def fake_privmsg(channel, rng):
+    user = rng.choice(USERS)
+    words = rng.choices(WORDS, k=rng.randint(1, 16))
+    emote_tags = []
+    if rng.random() < 0.3:
+        emote_id, emote = rng.choice(EMOTES)
+        position = rng.randint(0, len(words))
+        words.insert(position, emote)
+        start = len(" ".join(words[:position])) + (1 if position else 0)
+        emote_tags.append(f"{emote_id}:{start}-{start + len(emote) - 1}")
+    text = " ".join(words)
+    bits = 0
+    if rng.random() < 0.02:
+        bits = rng.choice((100, 500, 1000))
+        text = f"Cheer{bits} {text}"
+        emote_tags = []  # offsets moved; real Twitch would recompute them
+    if rng.random() < 0.05:
+        text = f"\x01ACTION {text}\x01"
+        emote_tags = []
+    tags = {
+        "badges": rng.choice(("", "subscriber/12", "moderator/1", "vip/1")),
+        "color": COLORS[USERS.index(user)],
+        "display-name": user,
+        "emotes": "/".join(emote_tags),
+        "id": f"{rng.getrandbits(64):016x}",
+        "tmi-sent-ts": str(int(time.time() * 1000)),
+    }
+    if bits:
+        tags["bits"] = str(bits)
+    raw_tags = ";".join(f"{key}={value}" for key, value in tags.items())
+    return f"@{raw_tags} :{user.lower()}!{user.lower()}@{user.lower()}.tmi.twitch.tv PRIVMSG #{channel} :{text}\r\n"
+
+
+class FakeIRCServer:
+    def __init__(self, rate=20.0, burst=1, seed=None):
+        self.rate = rate  # messages per second per channel
+        self.burst = burst  # messages written per tick
+        self.rng = random.Random(seed)
+        self.clients = 0
+
+    async def handle(self, reader, writer):
+        self.clients += 1
+        nick = "justinfan"
+        streams = []
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                command, _, rest = raw.decode("utf-8", errors="replace").strip().partition(" ")
+                command = command.upper()
+                if command == "CAP":
+                    writer.write(f":tmi.twitch.tv CAP * ACK :{rest.partition(':')[2]}\r\n".encode())
+                elif command == "NICK":
+                    nick = rest.strip()
+                    writer.write(f":tmi.twitch.tv 001 {nick} :Welcome, GLHF!\r\n:tmi.twitch.tv 376 {nick} :>\r\n".encode())
+                elif command == "JOIN":
+                    for channel in rest.strip().lstrip("#").split(",#"):
+                        writer.write(f":{nick}!{nick}@{nick}.tmi.twitch.tv JOIN #{channel}\r\n".encode())
+                        streams.append(asyncio.create_task(self._stream(writer, channel)))
+                elif command == "PING":
+                    writer.write(f":tmi.twitch.tv PONG tmi.twitch.tv {rest}\r\n".encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for stream in streams:
+                stream.cancel()
+            writer.close()
+            self.clients -= 1
+
+    async def _stream(self, writer, channel):
+        interval = self.burst / self.rate
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        try:
+            while True:
+                writer.write("".join(fake_privmsg(channel, self.rng) for _ in range(self.burst)).encode("utf-8"))
+                await writer.drain()
+                next_tick += interval
+                await asyncio.sleep(max(0.0, next_tick - loop.time()))
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Fake IRC: Listening on {host}:{port}, {self.rate:g} msgs/sec per channel")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6667)
+    parser.add_argument("--rate", type=float, default=20.0, help="messages per second per joined channel")
+    parser.add_argument("--burst", type=int, default=1, help="messages written together per tick")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    try:
+        asyncio.run(FakeIRCServer(args.rate, args.burst, args.seed).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
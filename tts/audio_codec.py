@@ -0,0 +1,41 @@
+"""On-disk formats for synthesized TTS clips.
+
+kokoro produces 24 kHz float32 audio; storing it as-is (4 bytes per sample)
+fills the mentions budget quickly. Clips can instead be written as 16-bit
+PCM WAV, lossless FLAC or Opus (in Ogg). Encoding happens on the synthesis
+worker; playback only decodes, which every format supports through
+soundfile.
+"""
+import soundfile as sf
+
+from tts_config import SAMPLE_RATE
+
+# name -> (file extension, soundfile format, soundfile subtype)
+AUDIO_FORMATS = {
+    "wav": ("wav", "WAV", "FLOAT"),
+    "pcm16": ("wav", "WAV", "PCM_16"),
+    "flac": ("flac", "FLAC", "PCM_16"),
+    "opus": ("ogg", "OGG", "OPUS"),  # needs libsndfile >= 1.0.29
+}
+
+
+def check_audio_format(name):
+    if name not in AUDIO_FORMATS:
+        raise ValueError(f"Unknown audio format {name!r}, expected one of: {', '.join(AUDIO_FORMATS)}")
+    _, file_format, subtype = AUDIO_FORMATS[name]
+    if not sf.check_format(file_format, subtype):
+        raise ValueError(f"Audio format {name!r} is not supported by this libsndfile ({sf.__libsndfile_version__})")
+    return name
+
+
+def encode_audio(path_without_extension, audio, audio_format="wav", samplerate=SAMPLE_RATE):
+    """Writes `audio` in `audio_format` and returns the path of the written file."""
+    extension, file_format, subtype = AUDIO_FORMATS[audio_format]
+    path = f"{path_without_extension}.{extension}"
+    sf.write(path, audio, samplerate, format=file_format, subtype=subtype)
+    return path
+
+
+def decode_audio(path):
+    """Reads a clip written by encode_audio back as float32 samples."""
+    return sf.read(path, dtype="float32")[0]
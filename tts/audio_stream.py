@@ -0,0 +1,158 @@
+"""Continuous sounddevice output fed from a ring buffer.
+
+Lets the first synthesized segment of a long message start playing while the
+remaining segments are still being produced, and plays queued messages back
+to back through one stream that stays open for the life of the server.
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import sounddevice as sd
+
+from tts_config import SAMPLE_RATE
+
+
+class RingBuffer:
+    """Single-producer, single-consumer float32 ring buffer.
+
+    The producer only advances `_written` and the consumer only advances
+    `_read`, so neither side needs a lock.
+    """
+    def __init__(self, capacity):
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._capacity = capacity
+        self._written = 0
+        self._read = 0
+
+    @property
+    def available(self):
+        return self._written - self._read
+
+    @property
+    def space(self):
+        return self._capacity - self.available
+
+    @property
+    def read_position(self):
+        return self._read
+
+    @property
+    def write_position(self):
+        return self._written
+
+    def write(self, samples):
+        count = min(len(samples), self.space)
+        start = self._written % self._capacity
+        first = min(count, self._capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:count - first] = samples[first:count]
+        self._written += count
+        return count
+
+    def read_into(self, out):
+        count = min(len(out), self.available)
+        start = self._read % self._capacity
+        first = min(count, self._capacity - start)
+        out[:first] = self._data[start:start + first]
+        out[first:count] = self._data[:count - first]
+        self._read += count
+        return count
+
+    def advance_read_to(self, position):
+        """Consumer side: discards everything before `position`."""
+        self._read = max(self._read, min(position, self._written))
+
+
+class QueuedAudio:
+    """One message inside the PlaybackEngine's buffer, as absolute sample positions."""
+    def __init__(self, message_id, start):
+        self.message_id = message_id
+        self.start = start
+        self.end = None  # set once the whole message has been fed
+        self.skipped = False
+        self.first_audio_at = None
+        self.played = threading.Event()
+
+
+class PlaybackEngine:
+    """One persistent, callback-driven output stream shared by every message.
+
+    Messages are written back to back into a single ring buffer, so
+    consecutive messages play without gaps. Skip and stop only move the read
+    position, which the audio callback applies; the callback never takes a
+    lock (deque append/popleft are atomic).
+    """
+    def __init__(self, samplerate=SAMPLE_RATE, buffer_seconds=30, blocksize=1024):
+        self._buffer = RingBuffer(samplerate * buffer_seconds)
+        self._messages = deque()
+        self._skip_to = None
+        self._stream = sd.OutputStream(samplerate=samplerate, channels=1, dtype="float32", blocksize=blocksize, callback=self._callback)
+
+    def start(self):
+        self._stream.start()
+
+    def close(self):
+        self.stop()
+        self._stream.stop()
+        self._stream.close()
+
+    def _callback(self, outdata, frames, time_info, status):
+        skip_to = self._skip_to
+        if skip_to is not None:
+            self._skip_to = None
+            self._buffer.advance_read_to(skip_to)
+        out = outdata[:, 0]
+        count = self._buffer.read_into(out)
+        out[count:] = 0
+        position = self._buffer.read_position
+        while self._messages and self._messages[0].end is not None and self._messages[0].end <= position:
+            self._messages.popleft().played.set()
+
+    @property
+    def busy(self):
+        return bool(self._messages)
+
+    @property
+    def current_message_id(self):
+        messages = list(self._messages)
+        return messages[0].message_id if messages else None
+
+    def begin(self, message_id):
+        handle = QueuedAudio(message_id, self._buffer.write_position)
+        self._messages.append(handle)
+        return handle
+
+    def feed(self, handle, samples):
+        """Appends samples of `handle`, waiting for room if the buffer is full."""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if handle.first_audio_at is None:
+            handle.first_audio_at = time.perf_counter()
+        offset = 0
+        while offset < len(samples) and not handle.skipped:
+            offset += self._buffer.write(samples[offset:])
+            if offset < len(samples):
+                time.sleep(0.01)
+        if handle.skipped:
+            self._skip_to = self._buffer.write_position
+
+    def end(self, handle):
+        handle.end = self._buffer.write_position
+        if handle.skipped:
+            self._skip_to = handle.end
+
+    def skip(self):
+        """Drops the rest of the message that is playing now."""
+        messages = list(self._messages)
+        if not messages:
+            return
+        current = messages[0]
+        current.skipped = True
+        self._skip_to = current.end if current.end is not None else self._buffer.write_position
+
+    def stop(self):
+        """Drops everything that is queued for output."""
+        for handle in list(self._messages):
+            handle.skipped = True
+        self._skip_to = self._buffer.write_position
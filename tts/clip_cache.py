@@ -0,0 +1,133 @@
+"""Content-addressed cache of synthesized clips.
+
+Chat repeats itself ("gg", copy-pastas), so clips are keyed by the sha256 of
+(normalized text, normalized voice mix, speed, lang code, audio format) and
+reused instead of running KPipeline again. Queue items get a hard link to
+the cached file (a copy where links aren't supported), so deleting a played
+or evicted queue file never touches the cache. The cache is LRU under a byte
+cap; recency survives restarts through the files' mtimes.
+"""
+import hashlib
+import os
+import re
+import shutil
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from voice_mix import normalize_voice_mix, parse_voice_mix
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """NFKC + collapsed whitespace. Case is kept, kokoro reads "GG" and "gg" differently."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def clip_key(text, voice, speed, lang_code, audio_format):
+    voice_key = normalize_voice_mix(parse_voice_mix(voice))
+    raw = "\0".join((normalize_text(text), voice_key, f"{float(speed):.4f}", lang_code, audio_format))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ClipCache:
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (path, nbytes), least recently used first
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Rebuilds the index from the cache directory once at startup."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            key, extension = os.path.splitext(entry.name)
+            if not entry.is_file() or extension == ".tmp":
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, key, entry.path, stat.st_size))
+        for _, key, path, nbytes in sorted(entries):
+            self._entries[key] = (path, nbytes)
+            self.bytes += nbytes
+        with self._lock:
+            self._evict()
+
+    def get(self, key, dest_path_without_extension):
+        """On a hit, links the cached clip to `dest_path_without_extension` + its extension and returns that path."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        path = entry[0]
+        dest = dest_path_without_extension + os.path.splitext(path)[1]
+        try:
+            _link_or_copy(path, dest)
+            os.utime(path)
+        except OSError as e:
+            print(f"TTS: Clip cache entry {key[:12]} unusable ({e})")
+            with self._lock:
+                if self._entries.pop(key, None) is not None:
+                    self.bytes -= entry[1]
+            return None
+        return dest
+
+    def put(self, key, path):
+        """Adds a freshly synthesized clip (the file at `path` stays where it is)."""
+        cached = os.path.join(self.cache_dir, key + os.path.splitext(path)[1])
+        try:
+            tmp_path = f"{cached}.tmp"
+            _link_or_copy(path, tmp_path)
+            os.replace(tmp_path, cached)
+            nbytes = os.path.getsize(cached)
+        except OSError as e:
+            print(f"TTS: Could not cache clip {key[:12]} ({e})")
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (cached, nbytes)
+            self.bytes += nbytes
+            self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            _, (path, nbytes) = self._entries.popitem(last=False)
+            self.bytes -= nbytes
+            self.evicted += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "evicted": self.evicted,
+            }
+
+
+def _link_or_copy(source, dest):
+    if os.path.lexists(dest):
+        os.remove(dest)
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copyfile(source, dest)
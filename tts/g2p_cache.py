@@ -0,0 +1,141 @@
+"""Memoized grapheme-to-phoneme step for kokoro.
+
+KPipeline phonemizes every text chunk with `pipeline.g2p` before running the
+acoustic model. Chat repeats whole lines as well as single words that miss
+the lexicon (usernames, emote names) and go through the slow espeak
+fallback, so both are cached:
+
+- whole chunks: text -> (phonemes, tokens), stored pickled so every hit hands
+  out fresh token objects (kokoro writes timestamps into them);
+- fallback words: word -> (phonemes, rating).
+
+Both are bounded LRUs and are saved to disk on shutdown, keyed by the
+phonemizer in use so a misaki upgrade starts from an empty cache.
+"""
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from importlib import metadata
+
+
+def _phonemizer_id(g2p, lang_code):
+    try:
+        version = metadata.version("misaki")
+    except metadata.PackageNotFoundError:
+        version = None
+    return (lang_code, type(g2p).__module__, type(g2p).__name__, version)
+
+
+class _LRU:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class G2PCache:
+    """Drop-in replacement for `pipeline.g2p`: `pipeline.g2p = G2PCache(pipeline.g2p, lang_code, path)`."""
+    def __init__(self, g2p, lang_code, path, max_texts=4096, max_words=16384):
+        self.g2p = g2p
+        self.path = path
+        self._id = _phonemizer_id(g2p, lang_code)
+        self._lock = threading.Lock()
+        self._texts = _LRU(max_texts)
+        self._words = _LRU(max_words)
+        self.hits = 0
+        self.misses = 0
+        self.word_hits = 0
+        self.word_misses = 0
+        self.seconds = 0.0  # time spent in __call__, hits included
+        self._fallback = getattr(g2p, "fallback", None)
+        if self._fallback is not None:
+            g2p.fallback = self._cached_fallback
+        self._load()
+
+    def __call__(self, text, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            if args or kwargs:
+                return self.g2p(text, *args, **kwargs)
+            with self._lock:
+                cached = self._texts.get(text)
+                if cached is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            if cached is not None:
+                return pickle.loads(cached)
+            result = self.g2p(text)
+            try:
+                data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                return result
+            with self._lock:
+                self._texts.put(text, data)
+            return result
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    def _cached_fallback(self, token):
+        word = token._.alias if token._ is not None and token._.alias is not None else token.text
+        with self._lock:
+            cached = self._words.get(word)
+            if cached is not None:
+                self.word_hits += 1
+                return cached
+            self.word_misses += 1
+        result = self._fallback(token)
+        with self._lock:
+            self._words.put(word, result)
+        return result
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                saved = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"TTS: Ignoring unreadable G2P cache {self.path} ({e})")
+            return
+        if saved.get("id") != self._id:
+            print("TTS: Phonemizer changed, starting with an empty G2P cache")
+            return
+        for text, data in saved.get("texts", []):
+            self._texts.put(text, data)
+        for word, result in saved.get("words", []):
+            self._words.put(word, result)
+        print(f"TTS: Loaded G2P cache ({len(self._texts.entries)} texts, {len(self._words.entries)} words)")
+
+    def save(self):
+        with self._lock:
+            saved = {"id": self._id, "texts": list(self._texts.entries.items()), "words": list(self._words.entries.items())}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(saved, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "word_hits": self.word_hits,
+                "word_misses": self.word_misses,
+                "texts": len(self._texts.entries),
+                "words": len(self._words.entries),
+            }
@@ -0,0 +1,50 @@
+"""Finds chat messages that mention the streamer (see specs-tts.md, Mentions mode).
+
+The streamer's username and aliases count as mentions when written as
+"@name"; nicknames count as bare words or with "@" ("hey jared",
+"@jared"). Everything is compiled into one case-insensitive regex, and a
+batch of messages is matched with a single scan over the texts joined by
+newlines, mapping matches back to messages by offset.
+"""
+import re
+from bisect import bisect_right
+
+
+def _alternation(names):
+    names = sorted({name.strip().lstrip("@").lower() for name in names if name.strip().lstrip("@")}, key=len, reverse=True)
+    return "|".join(re.escape(name) for name in names)
+
+
+class MentionFilter:
+    def __init__(self, username, aliases=(), nicknames=()):
+        self.username = username
+        self.aliases = tuple(aliases)
+        self.nicknames = tuple(nicknames)
+        parts = [rf"(?<!\w)@(?:{_alternation((username, *aliases))})(?!\w)"]
+        if _alternation(nicknames):
+            parts.append(rf"(?<![\w@])@?(?:{_alternation(nicknames)})(?!\w)")
+        self._pattern = re.compile("|".join(parts), re.IGNORECASE)
+
+    def is_mention(self, text):
+        return self._pattern.search(text) is not None
+
+    def match_batch(self, texts):
+        """Returns one bool per text."""
+        texts = [text.replace("\n", " ") for text in texts]
+        starts = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + 1
+        matched = [False] * len(texts)
+        joined = "\n".join(texts)
+        position = 0
+        while True:
+            match = self._pattern.search(joined, position)
+            if match is None:
+                break
+            index = bisect_right(starts, match.start()) - 1
+            matched[index] = True
+            # Skip the rest of this message, it is already known to match
+            position = starts[index + 1] if index + 1 < len(starts) else len(joined)
+        return matched
@@ -0,0 +1,83 @@
+"""Mentions audio past its byte budget: the oldest ready clips and their files are evicted.
+
+Runs the real TTSServer with the default config; only kokoro (a fake engine
+producing long noise clips) and the audio device are replaced.
+
+    python -m pytest tts/test_mentions_budget.py
+"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+np = pytest.importorskip("numpy")
+for _module in ("aiohttp", "soundfile", "sounddevice", "kokoro", "torch", "huggingface_hub"):
+    pytest.importorskip(_module)
+
+import tts_server  # noqa: E402
+from tts_config import SAMPLE_RATE, TTSConfig  # noqa: E402
+from tts_messages import Message  # noqa: E402
+from tts_metrics import LatencyStats  # noqa: E402
+from tts_store import READY  # noqa: E402
+
+
+class NoiseEngine:
+    """Stands in for TTSEngine: every message becomes `seconds` of noise, which FLAC can't shrink much."""
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.synthesis_stats = LatencyStats()
+        self._rng = np.random.default_rng(1)
+
+    def synthesize_batch(self, texts, voice):
+        for position, _ in enumerate(texts):
+            yield position, np.clip(self._rng.standard_normal(int(SAMPLE_RATE * self.seconds)) * 0.3, -1, 1).astype(np.float32)
+
+    def save(self):
+        pass
+
+
+class SilentPlayer:
+    busy = False
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_oldest_mentions_evicted_past_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts_server, "PlaybackEngine", SilentPlayer)
+    config = TTSConfig(
+        data_dir=str(tmp_path),
+        audio_dir=str(tmp_path / "audio"),
+        db_path=str(tmp_path / "tts.sqlite3"),
+        clip_cache_dir=str(tmp_path / "clip_cache"),
+        g2p_cache_path=str(tmp_path / "g2p_cache.pickle"),
+    )
+    server = tts_server.TTSServer(config, NoiseEngine(seconds=60))
+    try:
+        # ~2.5 MB of FLAC per clip, so 120 clips are well past the default 200 MB
+        ids = server.enqueue([Message(f"viewer{i}", f"@{config.username} message number {i}") for i in range(120)])
+        assert len(ids) == 120
+        deadline = time.monotonic() + 120
+        while server.pipeline.size(tts_server.MENTIONS) > server.pipeline.ready_count(tts_server.MENTIONS):
+            assert time.monotonic() < deadline, "synthesis did not finish"
+            time.sleep(0.1)
+
+        usage = server.storage.usage()[tts_server.MENTIONS]
+        assert usage["evicted"] > 0
+        assert usage["bytes"] <= config.mentions_budget_bytes
+        kept = [row[0] for row in server.store.queued_messages(tts_server.MENTIONS, READY)]
+        evicted = ids[:len(ids) - len(kept)]
+        assert kept == ids[len(evicted):]  # oldest first
+        assert len(evicted) == usage["evicted"]
+        audio_files = {name.split(".")[0] for name in os.listdir(config.audio_dir)}
+        assert not audio_files & {f"message_{message_id}" for message_id in evicted}
+        assert {f"message_{message_id}" for message_id in kept} <= audio_files
+    finally:
+        server.pipeline.stop()
+        server.store.close()
@@ -0,0 +1,64 @@
+"""Throughput of batched vs. sequential synthesis on the CPU (messages/sec).
+
+Sequential runs one pipeline call per message (TTSEngine.synthesize_segments),
+batched runs one call per `--batch-size` messages (TTSEngine.synthesize_batch).
+
+    python tts/tts-benchmark-batching.py --messages 64 --batch-size 8
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ["CUDA_VISIBLE_DEVICES"] = ""  # CPU only, before torch is imported
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from tts_config import TTSConfig  # noqa: E402
+from tts_engine import TTSEngine  # noqa: E402
+
+CHAT_LINES = [
+    "gg", "LETS GO", "@streamer hi from Brazil", "that was insane", "first time here, love the vibe",
+    "Cheer100 take my bits", "pog", "what game is this?", "@streamer can you play the boss again",
+    "lol", "hype train!", "Cheer500 for the clutch play", "W", "chat is moving so fast", "o7",
+]
+
+
+def run_sequential(engine, texts):
+    for text in texts:
+        for _ in engine.synthesize_segments(text):
+            pass
+
+
+def run_batched(engine, texts, batch_size):
+    for start in range(0, len(texts), batch_size):
+        for _ in engine.synthesize_batch(texts[start:start + batch_size]):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--threads", type=int, help="torch intra-op threads (default: torch's choice)")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+    engine = TTSEngine(TTSConfig.from_env())
+    engine.load()
+    texts = [CHAT_LINES[i % len(CHAT_LINES)] for i in range(args.messages)]
+    run_sequential(engine, texts[:len(CHAT_LINES)])  # warm G2P and kernels for both modes
+
+    results = {}
+    for name, run in (("sequential", lambda: run_sequential(engine, texts)), ("batched", lambda: run_batched(engine, texts, args.batch_size))):
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        results[name] = len(texts) / elapsed
+        print(f"{name:<11} {len(texts)} messages in {elapsed:.2f}s -> {results[name]:.2f} msgs/sec")
+    print(f"speedup     {results['batched'] / results['sequential']:.2f}x (batch size {args.batch_size})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compares the on-disk clip formats of audio_codec.py.
+
+For every format: bytes on disk, encode time, and decode-to-play latency
+(reading the file back into float32 samples ready for the output stream).
+
+    python tts/tts-benchmark-formats.py                       # synthesizes a sample message
+    python tts/tts-benchmark-formats.py --wav some_clip.wav   # uses an existing clip
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from audio_codec import AUDIO_FORMATS, check_audio_format, decode_audio, encode_audio  # noqa: E402
+from tts_config import SAMPLE_RATE, TTSConfig  # noqa: E402
+
+SAMPLE_TEXT = (
+    "@streamer hey, just wanted to say the last run was amazing, "
+    "that boss fight had the whole chat screaming. Keep it up!"
+)
+
+
+def load_audio(args):
+    if args.wav:
+        audio, samplerate = sf.read(args.wav, dtype="float32")
+        if samplerate != SAMPLE_RATE:
+            sys.exit(f"Expected a {SAMPLE_RATE} Hz clip, got {samplerate} Hz")
+        return audio
+    from tts_engine import TTSEngine
+    engine = TTSEngine(TTSConfig.from_env())
+    engine.load()
+    return engine.synthesize(args.text)
+
+
+def timed(function, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return result, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wav", help="existing 24 kHz clip to encode instead of synthesizing one")
+    parser.add_argument("--text", default=SAMPLE_TEXT)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    audio = load_audio(args)
+    seconds = len(audio) / SAMPLE_RATE
+    print(f"Clip: {seconds:.1f} s, {len(audio)} samples\n")
+    print(f"{'format':<8}{'bytes':>12}{'ratio':>8}{'MB/min':>9}{'encode ms':>11}{'decode ms':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = None
+        for name in AUDIO_FORMATS:
+            try:
+                check_audio_format(name)
+            except ValueError as e:
+                print(f"{name:<8}  skipped: {e}")
+                continue
+            base = os.path.join(directory, f"clip_{name}")
+            path, encode_seconds = timed(lambda: encode_audio(base, audio, name), args.repeat)
+            size = os.path.getsize(path)
+            baseline = baseline or size
+            _, decode_seconds = timed(lambda: decode_audio(path), args.repeat)
+            print(
+                f"{name:<8}{size:>12}{baseline / size:>7.1f}x{size / seconds * 60 / 1048576:>9.2f}"
+                f"{encode_seconds * 1000:>11.2f}{decode_seconds * 1000:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Synthetic raid-sized chat load for the mention filter.
+
+Without --url, measures MentionFilter.match_batch alone on one core and
+checks it sustains --target msgs/sec. With --url, also posts the batches to
+a running TTS server (POST /messages) while timing single-message inserts
+sent alongside, to show queue inserts aren't starved.
+
+    python tts/tts-loadgen-mentions.py --seconds 5
+    python tts/tts-loadgen-mentions.py --url http://127.0.0.1:8765 --rate 2000 --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mention_filter import MentionFilter  # noqa: E402
+
+WORDS = (
+    "gg lol pog kekw lets go hype raid chat insane clutch what that was so good first time here love "
+    "the stream boss fight again please W L o7 monkaS catJAM widepeepoHappy omegalul sadge based"
+).split()
+
+
+def generate_messages(count, username, aliases, nicknames, mention_ratio, seed=1):
+    rng = random.Random(seed)
+    names = [f"@{name}" for name in (username, *aliases, *nicknames)] + list(nicknames)
+    messages = []
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(1, 14))
+        if rng.random() < mention_ratio:
+            name = rng.choice(names)
+            words.insert(rng.randint(0, len(words)), rng.choice((name, name.upper(), name.capitalize())))
+        messages.append({"sent_by": f"raider{rng.randint(1, 5000)}", "text": " ".join(words)})
+    return messages
+
+
+def bench_filter(mention_filter, messages, batch_size, seconds):
+    texts = [message["text"] for message in messages]
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    processed = matched = 0
+    started = time.process_time()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for batch in batches:
+            matched += sum(mention_filter.match_batch(batch))
+            processed += len(batch)
+    return processed / (time.process_time() - started), matched / processed
+
+
+def post(url, payload):
+    request = urllib.request.Request(url, json.dumps(payload).encode("utf-8"), {"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def bench_server(url, messages, batch_size, rate, seconds):
+    """Posts batches at `rate` msgs/sec while a second thread times single inserts."""
+    insert_latencies = []
+    stop = threading.Event()
+
+    def probe():
+        while not stop.is_set():
+            started = time.perf_counter()
+            post(f"{url}/messages", {"sent_by": "probe", "text": "Cheer100 probe", "bits_amount": 100})
+            insert_latencies.append(time.perf_counter() - started)
+            time.sleep(0.1)
+
+    prober = threading.Thread(target=probe, daemon=True)
+    prober.start()
+    sent = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        batch = messages[sent % len(messages):][:batch_size]
+        post(f"{url}/messages", {"messages": batch})
+        sent += len(batch)
+        ahead = sent / rate - (time.perf_counter() - started)
+        if ahead > 0:
+            time.sleep(ahead)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    prober.join()
+    print(f"server      {sent / elapsed:.0f} msgs/sec posted in batches of {batch_size}")
+    if insert_latencies:
+        print(f"inserts     p50 {statistics.median(insert_latencies) * 1000:.1f} ms, max {max(insert_latencies) * 1000:.1f} ms over {len(insert_latencies)} probes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--username", default="streamer")
+    parser.add_argument("--aliases", default="streamer_tv,strmr")
+    parser.add_argument("--nicknames", default="jared")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--mention-ratio", type=float, default=0.05)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--target", type=float, default=5000, help="required filter throughput, msgs/sec")
+    parser.add_argument("--url", help="TTS server to load, e.g. http://127.0.0.1:8765")
+    parser.add_argument("--rate", type=float, default=2000, help="msgs/sec posted to --url")
+    args = parser.parse_args()
+
+    aliases = [name for name in args.aliases.split(",") if name]
+    nicknames = [name for name in args.nicknames.split(",") if name]
+    mention_filter = MentionFilter(args.username, aliases, nicknames)
+    messages = generate_messages(args.messages, args.username, aliases, nicknames, args.mention_ratio)
+
+    throughput, ratio = bench_filter(mention_filter, messages, args.batch_size, args.seconds)
+    verdict = "OK" if throughput >= args.target else "BELOW TARGET"
+    print(f"filter      {throughput:.0f} msgs/sec per core, {ratio:.1%} mentions ({verdict}, target {args.target:.0f})")
+    if args.url:
+        bench_server(args.url.rstrip("/"), messages, args.batch_size, args.rate, args.seconds)
+    sys.exit(0 if throughput >= args.target else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Server-side configuration for the TTS server (see specs-tts.md)."""
+import os
+from dataclasses import dataclass, field
+
+SAMPLE_RATE = 24000  # kokoro default
+
+DATA_DIR = os.path.join(os.path.expanduser("~"), ".twitch-panel", "tts")
+
+# Friendly names used in voice mix strings -> kokoro voice ids
+VOICE_MAP = {
+    "jared": "am_adam",
+    "martha": "am_michael",
+    "lex": "am_liam",
+    "echo": "am_echo",
+    "eric": "am_eric",
+    "fenrir": "am_fenrir",
+    "onyx": "am_onyx",
+    "puck": "am_puck",
+}
+
+
+@dataclass
+class TTSConfig:
+    username: str = "streamer"  # streamer's Twitch username, for parsing mentions
+    aliases: list = field(default_factory=list)  # other names that count as mentions when written as @name
+    nicknames: list = field(default_factory=list)  # names that count as mentions even without the @
+    autoplay_cooldown: float = 3.0  # seconds between automatically played messages
+    voice: str = "jared20_martha80"  # voice mix string, or a plain kokoro voice id
+    lang_code: str = "a"
+    speed: float = 0.75
+    host: str = "127.0.0.1"
+    port: int = 8765
+    lookahead: int = 8  # ready-but-unplayed items per queue before synthesis pauses (mentions: only without a budget)
+    max_pending: int = 1000  # messages waiting for synthesis per queue before new ones are refused
+    batch_size: int = 8  # queued short messages synthesized together in one pipeline call
+    batch_max_chars: int = 160  # longer messages are synthesized alone
+    mentions_budget_bytes: int = 200 * 1024 * 1024  # ready mentions audio kept on disk; oldest is deleted past this
+    bits_audio_format: str = "wav"  # on-disk clip format per queue: wav (float32), pcm16, flac or opus
+    mentions_audio_format: str = "flac"
+    clip_cache_max_bytes: int = 100 * 1024 * 1024  # reusable clips of repeated messages, least recently used go first
+    g2p_cache_entries: int = 4096  # phonemized chat lines kept across restarts
+    data_dir: str = DATA_DIR
+    audio_dir: str = field(default_factory=lambda: os.path.join(DATA_DIR, "audio"))
+    db_path: str = field(default_factory=lambda: os.path.join(DATA_DIR, "tts.sqlite3"))
+    clip_cache_dir: str = field(default_factory=lambda: os.path.join(DATA_DIR, "clip_cache"))
+    g2p_cache_path: str = field(default_factory=lambda: os.path.join(DATA_DIR, "g2p_cache.pickle"))
+
+    @classmethod
+    def from_env(cls):
+        """Builds a config from TTS_* environment variables, falling back to defaults."""
+        config = cls()
+        config.username = os.environ.get("TTS_USERNAME", config.username)
+        config.aliases = [name.strip() for name in os.environ.get("TTS_ALIASES", "").split(",") if name.strip()]
+        config.nicknames = [name.strip() for name in os.environ.get("TTS_NICKNAMES", "").split(",") if name.strip()]
+        config.autoplay_cooldown = float(os.environ.get("TTS_AUTOPLAY_COOLDOWN", config.autoplay_cooldown))
+        config.voice = os.environ.get("TTS_VOICE", config.voice)
+        config.lang_code = os.environ.get("TTS_LANG_CODE", config.lang_code)
+        config.speed = float(os.environ.get("TTS_SPEED", config.speed))
+        config.host = os.environ.get("TTS_HOST", config.host)
+        config.port = int(os.environ.get("TTS_PORT", config.port))
+        config.lookahead = int(os.environ.get("TTS_LOOKAHEAD", config.lookahead))
+        config.max_pending = int(os.environ.get("TTS_MAX_PENDING", config.max_pending))
+        config.batch_size = int(os.environ.get("TTS_BATCH_SIZE", config.batch_size))
+        config.batch_max_chars = int(os.environ.get("TTS_BATCH_MAX_CHARS", config.batch_max_chars))
+        config.mentions_budget_bytes = int(os.environ.get("TTS_MENTIONS_BUDGET_BYTES", config.mentions_budget_bytes))
+        config.bits_audio_format = os.environ.get("TTS_BITS_AUDIO_FORMAT", config.bits_audio_format)
+        config.mentions_audio_format = os.environ.get("TTS_MENTIONS_AUDIO_FORMAT", config.mentions_audio_format)
+        config.clip_cache_max_bytes = int(os.environ.get("TTS_CLIP_CACHE_MAX_BYTES", config.clip_cache_max_bytes))
+        config.g2p_cache_entries = int(os.environ.get("TTS_G2P_CACHE_ENTRIES", config.g2p_cache_entries))
+        config.data_dir = os.environ.get("TTS_DATA_DIR", config.data_dir)
+        config.audio_dir = os.environ.get("TTS_AUDIO_DIR", os.path.join(config.data_dir, "audio"))
+        config.db_path = os.environ.get("TTS_DB_PATH", os.path.join(config.data_dir, "tts.sqlite3"))
+        config.clip_cache_dir = os.environ.get("TTS_CLIP_CACHE_DIR", os.path.join(config.data_dir, "clip_cache"))
+        config.g2p_cache_path = os.environ.get("TTS_G2P_CACHE_PATH", os.path.join(config.data_dir, "g2p_cache.pickle"))
+        return config
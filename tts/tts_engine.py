@@ -0,0 +1,106 @@
+"""kokoro pipeline wrapper that is loaded and warmed once per server process."""
+import os
+import threading
+import time
+
+import numpy as np
+from kokoro import KPipeline
+
+from g2p_cache import G2PCache
+from tts_metrics import LatencyStats
+from voice_mix import VoiceMixer
+
+
+class TTSEngine:
+    def __init__(self, config):
+        self.config = config
+        self.pipeline = None
+        self.mixer = None
+        self.g2p_cache = None
+        self.warmup_seconds = None
+        self.synthesis_stats = LatencyStats()
+        # Per pipeline call: time spent phonemizing vs. in the acoustic model (and the rest of the pipeline)
+        self.g2p_stats = LatencyStats()
+        self.model_stats = LatencyStats()
+        self._lock = threading.Lock()  # KPipeline is not safe to call from several threads at once
+
+    def load(self):
+        """Builds the pipeline and loads the voice embedding with a minimal utterance."""
+        started = time.perf_counter()
+        self.pipeline = KPipeline(lang_code=self.config.lang_code)
+        self.g2p_cache = G2PCache(self.pipeline.g2p, self.config.lang_code, self.config.g2p_cache_path, max_texts=self.config.g2p_cache_entries)
+        self.pipeline.g2p = self.g2p_cache
+        self.mixer = VoiceMixer(self.pipeline, os.path.join(self.config.data_dir, "voice_mixes"))
+        voice = self.mixer.resolve(self.config.voice)
+        list(self.pipeline(".", voice=voice, speed=1.0))  # Single punctuation to load voice
+        self.warmup_seconds = time.perf_counter() - started
+        print(f"TTS: Pipeline warm in {self.warmup_seconds:.2f}s (voice: {self.config.voice})")
+
+    def save(self):
+        """Persists what should survive a restart (the G2P cache)."""
+        if self.g2p_cache is not None:
+            with self._lock:
+                self.g2p_cache.save()
+
+    def _timed(self, results):
+        """Iterates kokoro results, splitting the time spent producing them into G2P and model time."""
+        g2p_before = self.g2p_cache.seconds
+        busy = 0.0
+        iterator = iter(results)
+        while True:
+            started = time.perf_counter()
+            try:
+                result = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                busy += time.perf_counter() - started
+            yield result
+        g2p_seconds = self.g2p_cache.seconds - g2p_before
+        self.g2p_stats.record(g2p_seconds)
+        self.model_stats.record(max(busy - g2p_seconds, 0.0))
+
+    def set_voice(self, voice):
+        """Switches the default voice; mixes are resolved from cache, not reloaded."""
+        with self._lock:
+            self.mixer.resolve(voice)
+        self.config.voice = voice
+
+    def synthesize_segments(self, text, voice=None, speed=None):
+        """Yields audio segments as kokoro produces them."""
+        with self._lock:
+            generator = self.pipeline(
+                text, voice=self.mixer.resolve(voice or self.config.voice),
+                speed=speed or self.config.speed,
+                split_pattern=r'\n+'
+            )
+            for gs, ps, audio in self._timed(generator):
+                if audio is not None:
+                    yield np.asarray(audio, dtype=np.float32)
+
+    def synthesize_batch(self, texts, voice=None, speed=None):
+        """Yields (index into `texts`, audio segment) for several messages synthesized in one pipeline call.
+
+        KModel only runs one phoneme sequence per forward pass, so this doesn't
+        batch inference itself; it amortizes the lock, voice pack transfer and
+        pipeline setup over the batch, and kokoro tags each result with the
+        index of the text it came from.
+        """
+        with self._lock:
+            generator = self.pipeline(
+                list(texts), voice=self.mixer.resolve(voice or self.config.voice),
+                speed=speed or self.config.speed,
+            )
+            for result in self._timed(generator):
+                if result.audio is not None:
+                    yield result.text_index, np.asarray(result.audio, dtype=np.float32)
+
+    def synthesize(self, text, voice=None, speed=None):
+        """Returns the whole utterance as one float32 array, or None if nothing was produced."""
+        started = time.perf_counter()
+        segments = list(self.synthesize_segments(text, voice, speed))
+        self.synthesis_stats.record(time.perf_counter() - started)
+        if not segments:
+            print(f"Warning: No audio generated for text: {text}")
+            return None
+        return np.concatenate(segments) if len(segments) > 1 else segments[0]
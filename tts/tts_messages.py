@@ -0,0 +1,25 @@
+"""Message dataclasses shared by the App and the TTS server (see specs-tts.md)."""
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class Message:
+    sent_by: str  # username
+    text: str  # message text
+
+
+@dataclass
+class BitsMessage(Message):
+    bits_amount: int  # bits sent with the message
+
+
+def message_from_dict(data):
+    if not isinstance(data.get("sent_by"), str) or not isinstance(data.get("text"), str):
+        raise TypeError("sent_by and text must be strings")
+    if data.get("bits_amount") is not None:
+        return BitsMessage(sent_by=data["sent_by"], text=data["text"], bits_amount=int(data["bits_amount"]))
+    return Message(sent_by=data["sent_by"], text=data["text"])
+
+
+def message_to_dict(message):
+    return asdict(message)
@@ -0,0 +1,38 @@
+"""Small latency counters reported by the TTS server's /status endpoint."""
+import statistics
+import threading
+from collections import deque
+
+
+class LatencyStats:
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.last = None
+        self.max = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self._recent.append(seconds)
+            self.count += 1
+            self.total += seconds
+            self.last = seconds
+            self.max = max(self.max, seconds)
+
+    def as_dict(self):
+        with self._lock:
+            recent = sorted(self._recent)
+        result = {
+            "count": self.count,
+            "last": self.last,
+            "max": self.max,
+            "mean": self.total / self.count if self.count else None,
+            "p50": None,
+            "p95": None,
+        }
+        if recent:
+            result["p50"] = statistics.median(recent)
+            result["p95"] = recent[min(len(recent) - 1, int(len(recent) * 0.95))]
+        return result
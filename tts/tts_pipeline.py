@@ -0,0 +1,254 @@
+"""Lookahead synthesis for the TTS queues.
+
+A worker thread synthesizes queued messages ahead of playback while playback
+consumes finished items, so playing item N never waits on item N+1. The
+worker stops producing for a queue once `lookahead` items are ready and
+unplayed (backpressure), and `submit` refuses new items past `max_pending`.
+A queue whose lookahead is None is synthesized as far as it goes; its ready
+audio has to be bounded some other way (the mentions byte budget).
+
+Consecutive short messages of one queue are handed to `synthesize` as a
+batch. Playback may also claim the head item of the batch being synthesized
+and stream its segments as they are produced (see QueueItem.iter_segments).
+Evicted ready items are only flagged and skipped lazily when they reach the
+head.
+"""
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+
+
+@dataclass
+class QueueItem:
+    id: int
+    queue_type: str
+    message: object
+    created_at: float
+    path: str = None
+    audio_bytes: int = 0
+    synthesis_seconds: float = None
+    cancelled: bool = False
+    taken: bool = False  # handed to playback
+    claimed: bool = False  # playback is streaming this item while it is synthesized
+    segments: list = field(default_factory=list, repr=False)
+    segments_done: bool = False
+    _segments_cond: threading.Condition = field(default_factory=threading.Condition, repr=False, compare=False)
+
+    def add_segment(self, audio):
+        with self._segments_cond:
+            self.segments.append(audio)
+            self._segments_cond.notify_all()
+
+    def finish_segments(self):
+        with self._segments_cond:
+            self.segments_done = True
+            self._segments_cond.notify_all()
+
+    def iter_segments(self):
+        """Yields segments as they are produced until synthesis of this item ends."""
+        index = 0
+        while True:
+            with self._segments_cond:
+                self._segments_cond.wait_for(lambda: index < len(self.segments) or self.segments_done)
+                if index >= len(self.segments):
+                    return
+                segment = self.segments[index]
+            index += 1
+            yield segment
+
+
+class SynthesisPipeline:
+    def __init__(self, synthesize, queue_types, lookahead=8, max_pending=1000, on_ready=None, batch_size=1, batch_max_chars=160):
+        self._synthesize = synthesize  # callable([QueueItem, ...]); sets each item's path before finishing its segments
+        self._on_ready = on_ready  # callable(QueueItem), called outside the lock just before an item becomes ready
+        # One cap for every queue, or {queue type: cap or None}
+        self.lookahead = lookahead if isinstance(lookahead, dict) else {queue_type: lookahead for queue_type in queue_types}
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.batch_max_chars = batch_max_chars
+        self.active_queue = queue_types[0]
+        self.failed = 0
+        self._cond = threading.Condition()
+        self._pending = {queue_type: deque() for queue_type in queue_types}
+        self._ready = {queue_type: deque() for queue_type in queue_types}
+        self._ready_evicted = {queue_type: 0 for queue_type in queue_types}  # flagged items still in _ready
+        self._in_progress = []  # the batch being synthesized, in queue order
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="tts-synth", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def submit(self, item):
+        with self._cond:
+            if len(self._pending[item.queue_type]) >= self.max_pending:
+                return False
+            self._pending[item.queue_type].append(item)
+            self._cond.notify_all()
+            return True
+
+    def restore_ready(self, item):
+        """Adds an item whose audio already exists (e.g. restored from the store) to the ready list."""
+        if self._on_ready:
+            self._on_ready(item)
+        with self._cond:
+            self._ready[item.queue_type].append(item)
+            self._cond.notify_all()
+
+    def set_active(self, queue_type):
+        with self._cond:
+            self.active_queue = queue_type
+            self._cond.notify_all()
+
+    def size(self, queue_type):
+        with self._cond:
+            in_progress = sum(1 for item in self._in_progress if item.queue_type == queue_type and not item.cancelled and not item.claimed)
+            return len(self._pending[queue_type]) + self._ready_len(queue_type) + in_progress
+
+    def ready_count(self, queue_type):
+        with self._cond:
+            return self._ready_len(queue_type)
+
+    def evict(self, item):
+        """Drops a ready item; it is removed from the ready list when it reaches the head.
+
+        Returns False if playback already took the item.
+        """
+        with self._cond:
+            if item.taken:
+                return False
+            if not item.cancelled:
+                item.cancelled = True
+                self._ready_evicted[item.queue_type] += 1
+                self._cond.notify_all()
+            return True
+
+    def _has_room(self, queue_type):
+        limit = self.lookahead[queue_type]
+        return limit is None or self._ready_len(queue_type) < limit
+
+    def _ready_len(self, queue_type):
+        return len(self._ready[queue_type]) - self._ready_evicted[queue_type]
+
+    def _pop_ready(self, queue_type):
+        ready = self._ready[queue_type]
+        while ready:
+            item = ready.popleft()
+            if item.cancelled:
+                self._ready_evicted[queue_type] -= 1
+                continue
+            item.taken = True
+            self._cond.notify_all()  # a lookahead slot is free again
+            return item
+        return None
+
+    def take_ready(self, queue_type):
+        with self._cond:
+            return self._pop_ready(queue_type)
+
+    def take_head(self, queue_type):
+        """Returns the next ready item, or claims the head item that is being synthesized right now."""
+        with self._cond:
+            item = self._pop_ready(queue_type) or self._claimable(queue_type)
+            if item is not None and not item.taken:
+                item.claimed = True
+                item.taken = True
+            return item
+
+    def wait_head(self, queue_type, timeout=None):
+        """Blocks until take_head can return an item of `queue_type`, or nothing is left to synthesize for it."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._ready_len(queue_type) or self._claimable(queue_type) or not self._has_unfinished(queue_type) or self._stopping, timeout)
+        return self.take_head(queue_type)
+
+    def clear(self, queue_type):
+        """Removes every queued item of `queue_type` and returns them; an item being synthesized is cancelled."""
+        with self._cond:
+            removed = list(self._pending[queue_type]) + [item for item in self._ready[queue_type] if not item.cancelled]
+            self._pending[queue_type].clear()
+            self._ready[queue_type].clear()
+            self._ready_evicted[queue_type] = 0
+            for item in self._in_progress:
+                if item.queue_type == queue_type and not item.claimed:
+                    item.cancelled = True
+            self._cond.notify_all()
+        return removed
+
+    def _claimable(self, queue_type):
+        """The first item of the running batch that playback may claim (ready items always go first)."""
+        if self._ready_len(queue_type):
+            return None
+        for item in self._in_progress:
+            if item.queue_type == queue_type and not item.cancelled and not item.claimed:
+                return item
+        return None
+
+    def _has_unfinished(self, queue_type):
+        in_progress = any(item.queue_type == queue_type and not item.claimed for item in self._in_progress)
+        return bool(self._pending[queue_type]) or in_progress
+
+    def _is_batchable(self, item):
+        return len(item.message.text) <= self.batch_max_chars
+
+    def _next_batch(self):
+        order = [self.active_queue] + [queue_type for queue_type in self._pending if queue_type != self.active_queue]
+        for queue_type in order:
+            pending = self._pending[queue_type]
+            limit = self.lookahead[queue_type]
+            free = self.batch_size if limit is None else limit - self._ready_len(queue_type)
+            if not pending or free <= 0:
+                continue
+            batch = [pending.popleft()]
+            if self._is_batchable(batch[0]):
+                while pending and len(batch) < min(self.batch_size, free) and self._is_batchable(pending[0]):
+                    batch.append(pending.popleft())
+            return batch
+        return []
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopping or any(
+                    self._pending[queue_type] and self._has_room(queue_type) for queue_type in self._pending
+                ))
+                if self._stopping:
+                    return
+                batch = self._next_batch()
+                self._in_progress = batch
+            try:
+                self._synthesize(batch)
+            except Exception as e:
+                # Items finished before the failure keep their audio
+                print(f"TTS: Synthesis of {', '.join(f'#{item.id}' for item in batch if item.path is None)} failed: {e}")
+            finally:
+                for item in batch:
+                    item.finish_segments()
+            for item in batch:
+                if item.path is not None and not item.cancelled and not item.claimed and self._on_ready:
+                    # Before the item is visible to playback, so accounting always precedes its removal
+                    self._on_ready(item)
+            with self._cond:
+                self._in_progress = []
+                for item in batch:
+                    if item.path is None:
+                        self.failed += 1
+                    elif item.cancelled:
+                        _remove_file(item.path)
+                    elif not item.claimed:
+                        item.segments = []  # played from the file, no need to keep the segments around
+                        self._ready[item.queue_type].append(item)
+                self._cond.notify_all()
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,491 @@
+"""Long-lived local TTS server (see specs-tts.md).
+
+The kokoro pipeline and voice embeddings are loaded once at startup; the
+dashboard then talks to the server over HTTP, or keeps a WebSocket open to
+/ws to have status changes pushed and send commands.
+
+Run from the repo root:
+    python tts/tts_server.py
+
+Endpoints (all POST endpoints reply with the same JSON as GET /status):
+    GET  /status
+    GET  /ws            pushes {"type": "status", "seq", "sent_at", "status"}; accepts {"command": "play", ...}
+    POST /messages      {"sent_by": ..., "text": ..., "bits_amount": ...} or {"messages": [...]}
+    POST /play
+    POST /stop
+    POST /skip
+    POST /autoplay      {"enabled": true}
+    POST /mode          {"mode": "bits" | "mentions"}
+    POST /voice         {"voice": "jared50_lex30_martha20"}
+    POST /queue/clear
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from aiohttp import web
+
+from audio_codec import check_audio_format, decode_audio, encode_audio
+from audio_stream import PlaybackEngine
+from clip_cache import ClipCache, clip_key
+from mention_filter import MentionFilter
+from tts_config import TTSConfig
+from tts_engine import TTSEngine
+from tts_metrics import LatencyStats
+from tts_messages import BitsMessage, Message, message_from_dict
+from tts_pipeline import QueueItem, SynthesisPipeline
+from tts_storage import AudioStorage
+from tts_store import PENDING, READY, QueueStore
+
+BITS = "bits"
+MENTIONS = "mentions"
+
+STATUS_CHECK_SECONDS = 0.25  # how often WebSocket clients' status is checked for unannounced changes
+# What malformed request bodies raise (json.JSONDecodeError is a ValueError); answered with 400, not 500
+BAD_REQUEST_ERRORS = (ValueError, KeyError, TypeError, AttributeError, OSError)
+
+
+class TTSServer:
+    def __init__(self, config, engine):
+        self.config = config
+        self.engine = engine
+        self.mode = BITS
+        self.autoplay = False
+        self.playing = False
+        self.mention_filter = MentionFilter(config.username, config.aliases, config.nicknames)
+        self.audio_formats = {BITS: check_audio_format(config.bits_audio_format), MENTIONS: check_audio_format(config.mentions_audio_format)}
+        os.makedirs(config.data_dir, exist_ok=True)
+        self.store = QueueStore(config.db_path)
+        # Bits audio is never dropped; mentions are capped and lose their oldest ready audio first
+        self.storage = AudioStorage({BITS: None, MENTIONS: config.mentions_budget_bytes})
+        # With a budget, mentions are synthesized ahead without a count cap, so the budget (not the
+        # lookahead) is what bounds their audio on disk; bits keep the lookahead
+        lookahead = {BITS: config.lookahead, MENTIONS: None if config.mentions_budget_bytes else config.lookahead}
+        self.pipeline = SynthesisPipeline(
+            self._synthesize_to_files, (BITS, MENTIONS), lookahead=lookahead, max_pending=config.max_pending,
+            on_ready=self._on_item_ready, batch_size=config.batch_size, batch_max_chars=config.batch_max_chars,
+        )
+        self._play_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-play")
+        self._autoplay_task = None
+        self._loop = None
+        self._sockets = set()
+        self._status_dirty = None  # asyncio.Event, created on startup
+        self._status_seq = 0
+        self._broadcast_task = None
+        self.player = PlaybackEngine()
+        self.first_audio_stats = LatencyStats()
+        os.makedirs(config.audio_dir, exist_ok=True)
+        self.clip_cache = ClipCache(config.clip_cache_dir, config.clip_cache_max_bytes)
+        self._restore_queues()
+        self.pipeline.start()
+        self.player.start()
+
+    def _restore_queues(self):
+        """Puts messages that were still queued when the server last stopped back into the pipeline."""
+        self.store.requeue_interrupted()
+        restored = 0
+        for queue_type in (BITS, MENTIONS):
+            for status in (READY, PENDING):
+                for message_id, _, _, sent_by, text, bits_amount, audio_path, audio_bytes, created_at in self.store.queued_messages(queue_type, status):
+                    message = BitsMessage(sent_by, text, bits_amount) if bits_amount is not None else Message(sent_by, text)
+                    item = QueueItem(id=message_id, queue_type=queue_type, message=message, created_at=created_at)
+                    if status == READY and audio_path and os.path.exists(audio_path):
+                        item.path = audio_path
+                        item.audio_bytes = audio_bytes
+                        self.pipeline.restore_ready(item)
+                    else:
+                        self.pipeline.submit(item)
+                    restored += 1
+        if restored:
+            print(f"TTS: Restored {restored} queued messages")
+
+    @property
+    def queue_size(self):
+        return self.store.queue_size(self.mode)
+
+    def status(self):
+        return {
+            "mode": self.mode,
+            "queue_size": self.queue_size,
+            "queue_sizes": {queue_type: self.store.queue_size(queue_type) for queue_type in (BITS, MENTIONS)},
+            "ready": {queue_type: self.pipeline.ready_count(queue_type) for queue_type in (BITS, MENTIONS)},
+            "lookahead": self.pipeline.lookahead,
+            "autoplay": self.autoplay,
+            "playing": self.playing or self.player.busy,
+            "voice": self.config.voice,
+            "voice_mixes": self.engine.mixer.stats(),
+            "warmup_seconds": self.engine.warmup_seconds,
+            "synthesis": self.engine.synthesis_stats.as_dict(),
+            "synthesis_g2p": self.engine.g2p_stats.as_dict(),
+            "synthesis_model": self.engine.model_stats.as_dict(),
+            "g2p_cache": self.engine.g2p_cache.stats(),
+            "time_to_first_audio": self.first_audio_stats.as_dict(),
+            "storage": self.storage.usage(),
+            "audio_formats": self.audio_formats,
+            "clip_cache": self.clip_cache.stats(),
+        }
+
+    def _synthesize_to_files(self, items):
+        """Synthesis callback of the pipeline: each item gets its audio path and store row before it is finished."""
+        try:
+            self._synthesize_segments_to_files(items)
+        except Exception:
+            for item in items:
+                if not item.segments_done:
+                    self._finish_item(item, None)
+            raise
+
+    def _finish_item(self, item, path):
+        """Publishes an item's audio file, then ends its segments; playback of a streamed item can end right after."""
+        item.path = path
+        if path is None:
+            self.store.mark_error(item.id)
+        else:
+            item.audio_bytes = os.path.getsize(path)
+            self.store.mark_ready(item.id, path, item.audio_bytes)
+        item.finish_segments()
+
+    def _on_item_ready(self, item):
+        """Accounts the audio of a ready item and deletes whatever that pushes out of its queue's budget."""
+        evicted = [old_item for old_item in self.storage.add(item.queue_type, item, item.audio_bytes) if self.pipeline.evict(old_item)]
+        if not evicted:
+            return
+        for old_item in evicted:
+            _remove_file(old_item.path)
+        self.store.soft_delete([old_item.id for old_item in evicted])
+        print(f"TTS: {item.queue_type} audio over budget, evicted {len(evicted)} oldest message(s)")
+        self.notify()
+
+    def _synthesize_segments_to_files(self, items):
+        voice = self.config.voice
+        misses = []  # (item, cache key, path without extension)
+        for item in items:
+            key = clip_key(item.message.text, voice, self.config.speed, self.config.lang_code, self.audio_formats[item.queue_type])
+            base_path = os.path.join(self.config.audio_dir, f"message_{item.id}")
+            path = self.clip_cache.get(key, base_path)
+            if path is not None:
+                item.add_segment(decode_audio(path))  # in case playback is waiting to stream this item
+                self._finish_item(item, path)
+            else:
+                misses.append((item, key, base_path))
+        if not misses:
+            return
+
+        # Segments are published on the items as they are produced so playback can stream them;
+        # an item is encoded and finished as soon as kokoro moves on to a later message of the batch
+        finished = 0
+        started = time.perf_counter()
+
+        def finish_until(position):
+            nonlocal finished, started
+            while finished < position:
+                item, key, base_path = misses[finished]
+                item.synthesis_seconds = time.perf_counter() - started
+                self.engine.synthesis_stats.record(item.synthesis_seconds)
+                path = None
+                if item.segments:
+                    final_audio = np.concatenate(item.segments) if len(item.segments) > 1 else item.segments[0]
+                    # Runs on the synthesis worker, so encoding never delays playback
+                    path = encode_audio(base_path, final_audio, self.audio_formats[item.queue_type])
+                    self.clip_cache.put(key, path)
+                else:
+                    print(f"Warning: No audio generated for text: {item.message.text}")
+                self._finish_item(item, path)
+                started = time.perf_counter()
+                finished += 1
+
+        for position, audio in self.engine.synthesize_batch([item.message.text for item, _, _ in misses], voice):
+            finish_until(position)
+            misses[position][0].add_segment(audio)
+        finish_until(len(misses))
+
+    def _play_item(self, item, requested_at, wait):
+        """Feeds `item` into the shared output stream; with `wait`, returns once it has been heard."""
+        handle = self.player.begin(item.id)
+        try:
+            if item.claimed:
+                segments = item.iter_segments()
+            else:
+                segments = [decode_audio(item.path)]
+            for segment in segments:
+                if handle.skipped:
+                    break
+                self.player.feed(handle, segment)
+            for _ in segments:
+                pass  # skipped early: let synthesis of a streamed item finish so its file can be removed
+            if handle.first_audio_at is not None:
+                self.first_audio_stats.record(handle.first_audio_at - requested_at)
+        finally:
+            self.player.end(handle)
+        if wait:
+            handle.played.wait()
+
+    def enqueue(self, messages):
+        """Stores accepted messages in one batch and queues them for synthesis; returns the ids that were queued."""
+        now = time.time()
+        bits = [message for message in messages if isinstance(message, BitsMessage)]
+        chat = [message for message in messages if not isinstance(message, BitsMessage)]
+        mentions = [message for message, matched in zip(chat, self.mention_filter.match_batch([message.text for message in chat])) if matched]
+        accepted = [(BITS, message) for message in bits] + [(MENTIONS, message) for message in mentions]
+        if not accepted:
+            return []
+        ids = self.store.add_messages([
+            (queue_type, message.sent_by, message.text, getattr(message, "bits_amount", None), now) for queue_type, message in accepted
+        ])
+        queued = []
+        for message_id, (queue_type, message) in zip(ids, accepted):
+            if self.pipeline.submit(QueueItem(id=message_id, queue_type=queue_type, message=message, created_at=now)):
+                queued.append(message_id)
+            else:
+                print(f"TTS: {queue_type} queue is full, dropping message from {message.sent_by}")
+                self.store.mark_error(message_id)
+        return queued
+
+    async def play_next(self, wait=True):
+        """Plays the head of the active queue; without `wait`, returns as soon as it is queued for output."""
+        if self.playing or not self.pipeline.size(self.mode):
+            return False
+        self.playing = True
+        requested_at = time.perf_counter()
+        try:
+            item = self.pipeline.take_head(self.mode)
+            if item is None:
+                # The head of the queue hasn't been picked up by the synthesis worker yet
+                item = await asyncio.get_running_loop().run_in_executor(None, self.pipeline.wait_head, self.mode, 60.0)
+            if item is None:
+                return False
+            self.storage.remove(item.queue_type, item.id)
+            print(f"TTS: Playing #{item.id} from {item.message.sent_by}{' (streaming)' if item.claimed else ''}")
+            self.store.mark_playing(item.id)
+            self.notify()
+            try:
+                await asyncio.get_running_loop().run_in_executor(self._play_executor, self._play_item, item, requested_at, wait)
+                self.store.mark_played(item.id)
+            finally:
+                if item.path:
+                    _remove_file(item.path)
+        finally:
+            self.playing = False
+            self.notify()
+        return True
+
+    async def _autoplay_loop(self):
+        while self.autoplay:
+            # Without a cooldown the next message is fed right behind the current one (gapless)
+            gapless = self.config.autoplay_cooldown <= 0
+            if await self.play_next(wait=not gapless):
+                if not gapless:
+                    await asyncio.sleep(self.config.autoplay_cooldown)
+            else:
+                await asyncio.sleep(0.5)
+
+    def _cancel_autoplay_loop(self):
+        if self._autoplay_task and not self._autoplay_task.done():
+            self._autoplay_task.cancel()
+        self._autoplay_task = None
+
+    # ---- Commands (shared by HTTP and WebSocket) ----
+    async def play(self, data):
+        if self.autoplay:
+            if not self._autoplay_task or self._autoplay_task.done():
+                self._autoplay_task = asyncio.create_task(self._autoplay_loop())
+        else:
+            asyncio.create_task(self.play_next())
+
+    async def stop(self, data):
+        self._cancel_autoplay_loop()
+        self.player.stop()
+
+    async def skip(self, data):
+        self.player.skip()
+
+    async def set_autoplay(self, data):
+        self.autoplay = bool(data.get("enabled"))
+        if not self.autoplay:
+            self._cancel_autoplay_loop()
+
+    async def set_mode(self, data):
+        mode = data.get("mode")
+        if mode not in (BITS, MENTIONS):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.mode = mode
+        self.pipeline.set_active(mode)
+
+    async def set_voice(self, data):
+        await asyncio.get_running_loop().run_in_executor(None, self.engine.set_voice, data.get("voice", ""))
+
+    async def clear_queue(self, data):
+        paths = {item.path for item in self.pipeline.clear(self.mode)}
+        paths.update(audio_path for _, audio_path in self.store.soft_delete_queued(self.mode))
+        self.storage.clear(self.mode)
+        for path in paths:
+            if path:
+                _remove_file(path)
+
+    @property
+    def commands(self):
+        return {
+            "play": self.play,
+            "stop": self.stop,
+            "skip": self.skip,
+            "autoplay": self.set_autoplay,
+            "mode": self.set_mode,
+            "voice": self.set_voice,
+            "queue/clear": self.clear_queue,
+        }
+
+    async def run_command(self, name, data):
+        await self.commands[name](data)
+        self.notify()
+
+    # ---- Status push ----
+    def notify(self):
+        """Schedules a status push to WebSocket clients; safe to call from any thread."""
+        if self._loop is not None and self._status_dirty is not None:
+            self._loop.call_soon_threadsafe(self._status_dirty.set)
+
+    def _status_event(self, status=None):
+        self._status_seq += 1
+        return {"type": "status", "seq": self._status_seq, "sent_at": time.time(), "status": status if status is not None else self.status()}
+
+    def _status_state(self):
+        """In-memory fingerprint the periodic check compares; unlike status() it runs no SQL."""
+        return (
+            self.mode,
+            self.playing or self.player.busy,
+            self.autoplay,
+            tuple(self.pipeline.size(queue_type) for queue_type in (BITS, MENTIONS)),
+            tuple(self.pipeline.ready_count(queue_type) for queue_type in (BITS, MENTIONS)),
+        )
+
+    async def _broadcast_loop(self):
+        """Pushes the status when something changed: on notify(), or when a periodic check sees a difference."""
+        last_state = last_status = None
+        while True:
+            try:
+                await asyncio.wait_for(self._status_dirty.wait(), timeout=STATUS_CHECK_SECONDS)
+                notified = True
+            except asyncio.TimeoutError:
+                notified = False
+            self._status_dirty.clear()
+            if not self._sockets:
+                last_state = last_status = None
+                continue
+            # Playback ending, synthesis finishing etc. aren't always notified; catch them here
+            state = self._status_state()
+            if state == last_state and not notified:
+                continue
+            last_state = state
+            status = self.status()
+            if status == last_status:
+                continue
+            last_status = status
+            event = self._status_event(status)
+            for ws in list(self._sockets):
+                try:
+                    await ws.send_json(event)
+                except (ConnectionResetError, RuntimeError):
+                    self._sockets.discard(ws)
+
+    # ---- HTTP / WebSocket handlers ----
+    async def handle_status(self, request):
+        return web.json_response(self.status())
+
+    async def handle_message(self, request):
+        try:
+            data = await request.json()
+            messages = [message_from_dict(entry) for entry in data["messages"]] if "messages" in data else [message_from_dict(data)]
+        except BAD_REQUEST_ERRORS as e:
+            raise web.HTTPBadRequest(text=f"Invalid message: {e!r}")
+        ids = self.enqueue(messages)
+        self.notify()
+        response = self.status()
+        response.update({"queued": bool(ids), "ids": ids})
+        return web.json_response(response)
+
+    def _command_handler(self, name):
+        async def handle(request):
+            try:
+                data = await request.json() if request.can_read_body else {}
+                if not isinstance(data, dict):
+                    raise TypeError("expected a JSON object")
+                await self.run_command(name, data)
+            except BAD_REQUEST_ERRORS as e:
+                raise web.HTTPBadRequest(text=str(e))
+            return web.json_response(self.status())
+        return handle
+
+    async def handle_ws(self, request):
+        """Persistent dashboard connection: status events are pushed, commands come in as {"command": ..., ...}."""
+        ws = web.WebSocketResponse(heartbeat=10.0)
+        await ws.prepare(request)
+        self._sockets.add(ws)
+        try:
+            await ws.send_json(self._status_event())
+            async for msg in ws:
+                if msg.type != web.WSMsgType.TEXT:
+                    continue
+                command = None
+                try:
+                    data = json.loads(msg.data)
+                    command = data.get("command") if isinstance(data, dict) else None
+                    if command not in self.commands:
+                        raise ValueError(f"Unknown command: {command}")
+                    await self.run_command(command, data)
+                except BAD_REQUEST_ERRORS as e:
+                    await ws.send_json({"type": "error", "command": command, "error": str(e)})
+        finally:
+            self._sockets.discard(ws)
+        return ws
+
+    async def _on_startup(self, app):
+        self._loop = asyncio.get_running_loop()
+        self._status_dirty = asyncio.Event()
+        self._broadcast_task = asyncio.create_task(self._broadcast_loop())
+
+    async def _on_shutdown(self, app):
+        for ws in list(self._sockets):
+            await ws.close()
+
+    async def _on_cleanup(self, app):
+        self._cancel_autoplay_loop()
+        if self._broadcast_task:
+            self._broadcast_task.cancel()
+        self.pipeline.stop()
+        self.player.close()
+        self.store.close()
+        self.engine.save()
+
+    def create_app(self):
+        app = web.Application()
+        app.on_startup.append(self._on_startup)
+        app.on_shutdown.append(self._on_shutdown)
+        app.on_cleanup.append(self._on_cleanup)
+        app.add_routes([
+            web.get("/status", self.handle_status),
+            web.get("/ws", self.handle_ws),
+            web.post("/messages", self.handle_message),
+        ] + [web.post(f"/{name}", self._command_handler(name)) for name in self.commands])
+        return app
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def main():
+    config = TTSConfig.from_env()
+    engine = TTSEngine(config)
+    engine.load()
+    server = TTSServer(config, engine)
+    web.run_app(server.create_app(), host=config.host, port=config.port)
+
+
+if __name__ == "__main__":
+    main()
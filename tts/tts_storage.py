@@ -0,0 +1,59 @@
+"""Per-queue audio byte accounting with oldest-first eviction.
+
+Sizes are tracked as files are produced and consumed, never by scanning the
+audio directory. Each queue keeps its ready items in insertion order, so an
+insert that pushes a queue over its budget evicts from the front; every item
+is evicted at most once, which keeps eviction amortized O(1) per insert.
+"""
+import threading
+from collections import OrderedDict
+
+
+class _QueueUsage:
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes  # None = unlimited
+        self.bytes = 0
+        self.evicted = 0
+        self.items = OrderedDict()  # item id -> (item, nbytes), oldest first
+
+
+class AudioStorage:
+    def __init__(self, budgets):
+        """`budgets` maps queue type -> byte budget (None for no limit)."""
+        self._lock = threading.Lock()
+        self._queues = {queue_type: _QueueUsage(budget_bytes) for queue_type, budget_bytes in budgets.items()}
+
+    def add(self, queue_type, item, nbytes):
+        """Accounts a ready item and returns the items evicted to get back under budget."""
+        with self._lock:
+            usage = self._queues[queue_type]
+            usage.items[item.id] = (item, nbytes)
+            usage.bytes += nbytes
+            evicted = []
+            # The newest item is always kept, even if it alone exceeds the budget
+            while usage.budget_bytes is not None and usage.bytes > usage.budget_bytes and len(usage.items) > 1:
+                _, (old_item, old_bytes) = usage.items.popitem(last=False)
+                usage.bytes -= old_bytes
+                evicted.append(old_item)
+            usage.evicted += len(evicted)
+            return evicted
+
+    def remove(self, queue_type, item_id):
+        with self._lock:
+            usage = self._queues[queue_type]
+            entry = usage.items.pop(item_id, None)
+            if entry is not None:
+                usage.bytes -= entry[1]
+
+    def clear(self, queue_type):
+        with self._lock:
+            usage = self._queues[queue_type]
+            usage.items.clear()
+            usage.bytes = 0
+
+    def usage(self):
+        with self._lock:
+            return {
+                queue_type: {"bytes": usage.bytes, "items": len(usage.items), "budget_bytes": usage.budget_bytes, "evicted": usage.evicted}
+                for queue_type, usage in self._queues.items()
+            }
@@ -0,0 +1,183 @@
+"""SQLite store for the Mentions and Bits queues (see specs-tts.md).
+
+Only metadata lives here; audio stays on the filesystem. The database runs
+in WAL mode, every lookup the server makes is served by the
+(queue_type, status, created_at) index, and per-(queue_type, status) row
+counts are maintained by triggers, so queue sizes are a primary-key lookup
+rather than a scan over months of history. Statements are module constants
+so sqlite3's statement cache reuses the prepared statements.
+"""
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"
+READY = "ready"
+PLAYING = "playing"
+PLAYED = "played"
+ERROR = "error"
+
+QUEUED_STATUSES = (PENDING, READY)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    queue_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    sent_by TEXT NOT NULL,
+    text TEXT NOT NULL,
+    bits_amount INTEGER,
+    audio_path TEXT,
+    audio_bytes INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    timestamp_ready REAL,
+    timestamp_played REAL,
+    is_deleted INTEGER NOT NULL DEFAULT 0,
+    timestamp_deleted REAL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_queue_status_created ON messages(queue_type, status, created_at);
+
+CREATE TABLE IF NOT EXISTS queue_counters (
+    queue_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (queue_type, status)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS messages_count_insert AFTER INSERT ON messages WHEN NEW.is_deleted = 0
+BEGIN
+    INSERT INTO queue_counters (queue_type, status, count) VALUES (NEW.queue_type, NEW.status, 1)
+    ON CONFLICT (queue_type, status) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS messages_count_update AFTER UPDATE OF status, is_deleted ON messages
+BEGIN
+    UPDATE queue_counters SET count = count - 1
+    WHERE OLD.is_deleted = 0 AND queue_type = OLD.queue_type AND status = OLD.status;
+    INSERT INTO queue_counters (queue_type, status, count) SELECT NEW.queue_type, NEW.status, 1 WHERE NEW.is_deleted = 0
+    ON CONFLICT (queue_type, status) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS messages_count_delete AFTER DELETE ON messages WHEN OLD.is_deleted = 0
+BEGIN
+    UPDATE queue_counters SET count = count - 1 WHERE queue_type = OLD.queue_type AND status = OLD.status;
+END;
+"""
+
+_INSERT_MESSAGE = (
+    "INSERT INTO messages (queue_type, status, sent_by, text, bits_amount, created_at) "
+    "VALUES (?, 'pending', ?, ?, ?, ?)"
+)
+_MARK_READY = (
+    "UPDATE messages SET status = 'ready', audio_path = ?, audio_bytes = ?, timestamp_ready = ? "
+    "WHERE id = ? AND status = 'pending' AND is_deleted = 0"
+)
+_MARK_STATUS = "UPDATE messages SET status = ? WHERE id = ?"
+_MARK_PLAYED = "UPDATE messages SET status = 'played', timestamp_played = ? WHERE id = ?"
+_QUEUE_COUNT = "SELECT COALESCE(SUM(count), 0) FROM queue_counters WHERE queue_type = ? AND status IN ('pending', 'ready')"
+_COUNTERS = "SELECT queue_type, status, count FROM queue_counters"
+_SELECT_QUEUED = (
+    "SELECT id, queue_type, status, sent_by, text, bits_amount, audio_path, audio_bytes, created_at FROM messages "
+    "WHERE queue_type = ? AND status = ? AND is_deleted = 0 ORDER BY created_at"
+)
+_SOFT_DELETE_QUEUED = (
+    "UPDATE messages SET is_deleted = 1, timestamp_deleted = ? "
+    "WHERE queue_type = ? AND status = ? AND is_deleted = 0 RETURNING id, audio_path"
+)
+_SOFT_DELETE = "UPDATE messages SET is_deleted = 1, timestamp_deleted = ? WHERE id = ? AND is_deleted = 0"
+
+
+class QueueStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()  # shared by the event loop and the synthesis worker
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, cached_statements=128)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add_messages(self, rows):
+        """Batch-inserts [(queue_type, sent_by, text, bits_amount, created_at), ...] in one transaction; returns their ids."""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                cursor.executemany(_INSERT_MESSAGE, rows)
+                # Single writer inside one transaction: rowids are allocated consecutively
+                last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            return list(range(last_id - len(rows) + 1, last_id + 1))
+
+    def mark_ready(self, message_id, audio_path, audio_bytes):
+        with self._lock:
+            self._conn.execute(_MARK_READY, (audio_path, audio_bytes, time.time(), message_id))
+
+    def mark_playing(self, message_id):
+        with self._lock:
+            self._conn.execute(_MARK_STATUS, (PLAYING, message_id))
+
+    def mark_error(self, message_id):
+        with self._lock:
+            self._conn.execute(_MARK_STATUS, (ERROR, message_id))
+
+    def mark_played(self, message_id):
+        with self._lock:
+            self._conn.execute(_MARK_PLAYED, (time.time(), message_id))
+
+    def queue_size(self, queue_type):
+        """Pending + ready messages in `queue_type`, read from the trigger-maintained counters."""
+        with self._lock:
+            return self._conn.execute(_QUEUE_COUNT, (queue_type,)).fetchone()[0]
+
+    def counters(self):
+        with self._lock:
+            return {(queue_type, status): count for queue_type, status, count in self._conn.execute(_COUNTERS)}
+
+    def queued_messages(self, queue_type, status):
+        """Not-deleted rows of `queue_type` in `status`, oldest first (index range scan)."""
+        with self._lock:
+            return self._conn.execute(_SELECT_QUEUED, (queue_type, status)).fetchall()
+
+    def soft_delete_queued(self, queue_type, statuses=QUEUED_STATUSES):
+        """Marks pending/ready messages of `queue_type` as deleted; returns [(id, audio_path), ...]."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                deleted = []
+                for status in statuses:
+                    deleted.extend(cursor.execute(_SOFT_DELETE_QUEUED, (now, queue_type, status)).fetchall())
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            return deleted
+
+    def soft_delete(self, message_ids):
+        """Marks the given messages as deleted (e.g. evicted audio) in one transaction."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                cursor.executemany(_SOFT_DELETE, [(now, message_id) for message_id in message_ids])
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+
+    def requeue_interrupted(self):
+        """Messages left 'playing' by a crash go back to 'ready' (or 'pending' without audio)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE messages SET status = CASE WHEN audio_path IS NULL THEN 'pending' ELSE 'ready' END "
+                "WHERE status = 'playing' AND is_deleted = 0"
+            )
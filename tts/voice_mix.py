@@ -0,0 +1,115 @@
+"""Voice mix strings ("jared50_lex30_martha20") -> mixed kokoro voice embeddings.
+
+Mixes are computed once as a single weighted tensor contraction over the
+stacked base embeddings, kept in memory, and cached on disk keyed by the
+normalized mix and the hashes of the base voice files, so switching voices
+is a lookup instead of a reload.
+"""
+import hashlib
+import os
+import re
+
+import torch
+from huggingface_hub import hf_hub_download
+
+from tts_config import VOICE_MAP
+
+_MIX_PART = re.compile(r"^([a-z]+)(\d+(?:\.\d+)?)$")
+
+
+def parse_voice_mix(mix, voice_map=VOICE_MAP):
+    """Returns [(kokoro_voice, weight), ...] with weights summing to 1.
+
+    A string that isn't a mix (e.g. "am_michael") is treated as a single voice.
+    """
+    parts = mix.strip().lower().split("_")
+    matches = [_MIX_PART.match(part) for part in parts]
+    if not all(matches):
+        return [(mix.strip(), 1.0)]
+    weights = {}
+    for match in matches:
+        name, percent = match.group(1), float(match.group(2))
+        if name not in voice_map:
+            raise ValueError(f"Unknown voice '{name}' in mix '{mix}' (known: {', '.join(sorted(voice_map))})")
+        voice = voice_map[name]
+        weights[voice] = weights.get(voice, 0.0) + percent
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError(f"Voice mix '{mix}' has no positive weights")
+    return [(voice, weight / total) for voice, weight in sorted(weights.items())]
+
+
+def normalize_voice_mix(components):
+    return ",".join(f"{voice}:{weight:.6f}" for voice, weight in components)
+
+
+class VoiceMixer:
+    def __init__(self, pipeline, cache_dir, voice_map=VOICE_MAP):
+        self.pipeline = pipeline
+        self.cache_dir = cache_dir
+        self.voice_map = voice_map
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._mixes = {}  # mix string -> registered name in pipeline.voices
+        self._file_hashes = {}  # (path, mtime_ns, size) -> sha256
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _voice_file(self, voice):
+        if voice.endswith(".pt"):
+            return voice
+        return hf_hub_download(repo_id=self.pipeline.repo_id, filename=f"voices/{voice}.pt")
+
+    def _file_hash(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._file_hashes.get(key)
+        if digest is None:
+            with open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            self._file_hashes[key] = digest
+        return digest
+
+    def _cache_key(self, components):
+        hasher = hashlib.sha256(normalize_voice_mix(components).encode("utf-8"))
+        for voice, _ in components:
+            hasher.update(self._file_hash(self._voice_file(voice)).encode("ascii"))
+        return hasher.hexdigest()
+
+    @staticmethod
+    def mix(embeddings, weights):
+        """Weighted sum of N embeddings as one tensordot over the stacked tensors."""
+        stacked = torch.stack(embeddings)
+        weights = torch.tensor(weights, dtype=stacked.dtype, device=stacked.device)
+        return torch.tensordot(weights, stacked, dims=1)
+
+    def resolve(self, mix):
+        """Returns the pipeline voice name for `mix`, computing and registering it on first use."""
+        name = self._mixes.get(mix)
+        if name is not None and name in self.pipeline.voices:
+            self.hits += 1
+            return name
+        components = parse_voice_mix(mix, self.voice_map)
+        if len(components) == 1:
+            name = components[0][0]
+            self.pipeline.load_single_voice(name)
+            self._mixes[mix] = name
+            return name
+        name = f"mix:{normalize_voice_mix(components)}"
+        cache_path = os.path.join(self.cache_dir, f"{self._cache_key(components)}.pt")
+        if os.path.exists(cache_path):
+            embedding = torch.load(cache_path, weights_only=True)
+            self.disk_hits += 1
+        else:
+            embeddings = [self.pipeline.load_single_voice(voice) for voice, _ in components]
+            embedding = self.mix(embeddings, [weight for _, weight in components])
+            tmp_path = f"{cache_path}.tmp"
+            torch.save(embedding, tmp_path)
+            os.replace(tmp_path, cache_path)
+            self.misses += 1
+        self.pipeline.voices[name] = embedding
+        self._mixes[mix] = name
+        return name
+
+    def stats(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "loaded": len(self._mixes)}
@@ -0,0 +1,216 @@
+"""Twitch chat over IRC, without a browser.
+
+Twitch chat is plain IRC with IRCv3 tags (https://dev.twitch.tv/docs/irc/);
+reading it needs no authentication (anonymous "justinfan" nick). The client
+runs on asyncio and hands parsed messages to a callback in batches, one per
+read from the socket, so a consumer on another thread (the dashboard) gets
+one hop per burst instead of one per line.
+
+Run against the fake server for testing:
+    python fake_irc_server.py --port 6667
+    python twitch_chat.py somechannel --host 127.0.0.1 --port 6667
+"""
+import asyncio
+import itertools
+import random
+import ssl
+import time
+from dataclasses import dataclass, field
+
+TWITCH_IRC_HOST = "irc.chat.twitch.tv"
+TWITCH_IRC_PORT = 6697  # TLS; 6667 is plain text
+
+_TAG_ESCAPES = {":": ";", "s": " ", "\\": "\\", "r": "\r", "n": "\n"}
+_message_ids = itertools.count(1)
+
+
+@dataclass
+class IRCLine:
+    tags: dict
+    prefix: str
+    command: str
+    params: list
+
+
+@dataclass
+class ChatMessage:
+    channel: str
+    user: str
+    display_name: str
+    text: str
+    color: str = None  # "#RRGGBB" or None if the user never picked one
+    bits: int = 0
+    emotes: list = field(default_factory=list)  # [(emote_id, start, end), ...], end inclusive, in code points
+    badges: list = field(default_factory=list)
+    action: bool = False  # /me message
+    timestamp: float = field(default_factory=time.time)  # when Twitch received it (tmi-sent-ts), else when we did
+    id: int = field(default_factory=lambda: next(_message_ids))  # local, for caching rendered layouts
+
+
+def _unescape_tag(value):
+    if "\\" not in value:
+        return value
+    result = []
+    chars = iter(value)
+    for char in chars:
+        if char == "\\":
+            escaped = next(chars, "")
+            result.append(_TAG_ESCAPES.get(escaped, escaped))
+        else:
+            result.append(char)
+    return "".join(result)
+
+
+def parse_line(line):
+    """Parses one raw IRC line (without CRLF)."""
+    tags = {}
+    if line.startswith("@"):
+        raw_tags, _, line = line[1:].partition(" ")
+        for tag in raw_tags.split(";"):
+            key, _, value = tag.partition("=")
+            tags[key] = _unescape_tag(value)
+    prefix = ""
+    if line.startswith(":"):
+        prefix, _, line = line[1:].partition(" ")
+    line, has_trailing, trailing = line.partition(" :")
+    params = line.split()
+    command = params.pop(0) if params else ""
+    if has_trailing:
+        params.append(trailing)
+    return IRCLine(tags, prefix, command.upper(), params)
+
+
+def _parse_emotes(value):
+    emotes = []
+    for emote in filter(None, value.split("/")):
+        emote_id, _, ranges = emote.partition(":")
+        for span in ranges.split(","):
+            start, _, end = span.partition("-")
+            if start.isdigit() and end.isdigit():
+                emotes.append((emote_id, int(start), int(end)))
+    emotes.sort(key=lambda emote: emote[1])
+    return emotes
+
+
+def chat_message_from_line(irc_line):
+    """Returns a ChatMessage for a PRIVMSG line, None for anything else."""
+    if irc_line.command != "PRIVMSG" or len(irc_line.params) < 2:
+        return None
+    tags = irc_line.tags
+    user = irc_line.prefix.partition("!")[0]
+    text = irc_line.params[1]
+    action = text.startswith("\x01ACTION ") and text.endswith("\x01")
+    if action:
+        text = text[8:-1]
+    sent_ts = tags.get("tmi-sent-ts", "")
+    return ChatMessage(
+        channel=irc_line.params[0].lstrip("#"),
+        user=user,
+        display_name=tags.get("display-name") or user,
+        text=text,
+        color=tags.get("color") or None,
+        bits=int(tags.get("bits") or 0),
+        emotes=_parse_emotes(tags.get("emotes", "")),
+        badges=[badge.partition("/")[0] for badge in tags.get("badges", "").split(",") if badge],
+        action=action,
+        timestamp=int(sent_ts) / 1000 if sent_ts.isdigit() else time.time(),
+    )
+
+
+class TwitchChatClient:
+    """Reads one channel's chat anonymously; reconnects with jittered exponential backoff."""
+    def __init__(self, channel, on_messages, host=TWITCH_IRC_HOST, port=TWITCH_IRC_PORT, use_tls=None, min_backoff=1.0, max_backoff=30.0):
+        self.channel = channel.lower().lstrip("#")
+        self.on_messages = on_messages  # callable([ChatMessage, ...])
+        self.host = host
+        self.port = port
+        self.use_tls = port == TWITCH_IRC_PORT if use_tls is None else use_tls
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.connected = False
+        self.lines_received = 0
+        self.messages_received = 0
+        self._writer = None
+        self._stopping = False
+
+    async def run(self):
+        backoff = self.min_backoff
+        while not self._stopping:
+            try:
+                await self._session()
+                backoff = self.min_backoff
+            except (OSError, asyncio.IncompleteReadError, ConnectionError) as e:
+                print(f"Chat: Connection to {self.host}:{self.port} lost ({e})")
+            self.connected = False
+            if self._stopping:
+                break
+            delay = backoff * random.uniform(0.5, 1.0)
+            backoff = min(backoff * 2, self.max_backoff)
+            await asyncio.sleep(delay)
+
+    def stop(self):
+        self._stopping = True
+        if self._writer is not None:
+            self._writer.close()
+
+    async def _session(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=ssl.create_default_context() if self.use_tls else None)
+        self._writer = writer
+        try:
+            writer.write(
+                "CAP REQ :twitch.tv/tags twitch.tv/commands\r\n"
+                f"NICK justinfan{random.randint(10000, 99999)}\r\n"
+                f"JOIN #{self.channel}\r\n".encode("utf-8")
+            )
+            await writer.drain()
+            self.connected = True
+            print(f"Chat: Joined #{self.channel} on {self.host}:{self.port}")
+            buffer = b""
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    return
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\r\n")
+                messages = []
+                reconnect = False
+                for raw in lines:
+                    if not raw:
+                        continue
+                    self.lines_received += 1
+                    irc_line = parse_line(raw.decode("utf-8", errors="replace"))
+                    if irc_line.command == "PING":
+                        writer.write(f"PONG :{irc_line.params[-1] if irc_line.params else ''}\r\n".encode("utf-8"))
+                    elif irc_line.command == "RECONNECT":
+                        reconnect = True  # the server is going away; reconnect right after this batch
+                    else:
+                        message = chat_message_from_line(irc_line)
+                        if message is not None:
+                            messages.append(message)
+                if messages:
+                    self.messages_received += len(messages)
+                    self.on_messages(messages)
+                if reconnect:
+                    return
+        finally:
+            self._writer = None
+            writer.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print a channel's chat")
+    parser.add_argument("channel")
+    parser.add_argument("--host", default=TWITCH_IRC_HOST)
+    parser.add_argument("--port", type=int, default=TWITCH_IRC_PORT)
+    args = parser.parse_args()
+
+    def print_messages(messages):
+        for message in messages:
+            print(f"{message.display_name}: {message.text}")
+
+    try:
+        asyncio.run(TwitchChatClient(args.channel, print_messages, args.host, args.port).run())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,592 @@
+"""Twitch EventSub over WebSocket, feeding a bounded event bus.
+
+EventSubClient keeps a WebSocket session to EventSub
+(https://dev.twitch.tv/docs/eventsub/handling-websocket-events/), creates
+the subscriptions over Helix once the session is welcomed, follows
+session_reconnect (reading the old connection until the new one is
+welcomed), treats a missed keepalive as a dead connection and
+reconnects with jittered exponential backoff. Notifications become typed
+events (CheerEvent, RaidEvent, ...) published on an EventBus.
+
+EventBus fans every event out to its consumers, each with its own bounded
+queue and a policy for when that queue is full:
+  - "block": nothing is lost; events past the queue wait in the consumer's
+    own backlog (up to `max_backlog`, counted as overflowed), so a slow
+    consumer that must see everything (the TTS bits queue, the log) only
+    holds back itself, never the dispatcher or the other consumers. Only
+    once its backlog is full too does it start losing its oldest events;
+  - "drop_oldest": the oldest queued event is discarded and counted, for
+    consumers that only care about the latest state (UI counters).
+publish() waits while the bus queue itself is full, which stops the client
+from reading the socket faster than events can be dispatched.
+Coalescer folds events into a state that is handed on at most every
+`interval` seconds, so the Qt thread gets one update per interval however
+many events arrived.
+
+Needs aiohttp for the client; the bus itself is plain asyncio. Test against
+the mock server:
+    python fake_eventsub_server.py --port 8080 --rate 20
+    python twitch_eventsub.py --url ws://127.0.0.1:8080/ws --subscriptions-url http://127.0.0.1:8080/eventsub/subscriptions
+"""
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+try:
+    import aiohttp
+except ImportError:  # EventSubClient unavailable; EventBus still works
+    aiohttp = None
+
+EVENTSUB_WS_URL = "wss://eventsub.wss.twitch.tv/ws"
+EVENTSUB_SUBSCRIPTIONS_URL = "https://api.twitch.tv/helix/eventsub/subscriptions"
+
+# (type, version, condition key that takes the broadcaster id)
+SUBSCRIPTIONS = [
+    ("channel.cheer", "1", "broadcaster_user_id"),
+    ("channel.subscribe", "1", "broadcaster_user_id"),
+    ("channel.subscription.gift", "1", "broadcaster_user_id"),
+    ("channel.subscription.message", "1", "broadcaster_user_id"),
+    ("channel.raid", "1", "to_broadcaster_user_id"),
+    ("channel.ad_break.begin", "1", "broadcaster_id"),
+    ("stream.online", "1", "broadcaster_user_id"),
+    ("stream.offline", "1", "broadcaster_user_id"),
+]
+
+
+def load_creds(path):
+    """Reads KEY=value lines (config/creds.env, see specs-new.md, Credentials); missing file -> {}."""
+    creds = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#") and "=" in line:
+                    key, _, value = line.partition("=")
+                    creds[key.strip()] = value.strip().strip("'\"")
+    except OSError:
+        pass
+    return creds
+
+
+def _parse_timestamp(value):
+    # Twitch sends nanoseconds ("2023-07-19T14:56:51.634234626Z"); datetime takes up to microseconds
+    if not value:
+        return time.time()
+    value = value.rstrip("Z")
+    head, dot, fraction = value.partition(".")
+    try:
+        return datetime.fromisoformat(f"{head}{dot}{fraction[:6]}+00:00").timestamp()
+    except ValueError:
+        return time.time()
+
+
+# ======================
+# Events
+# ======================
+@dataclass
+class EventSubEvent:
+    type: str
+    message_id: str
+    timestamp: float  # when Twitch sent it
+    data: dict  # the notification's "event" object as received
+    received_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class CheerEvent(EventSubEvent):
+    user_name: str = ""
+    message: str = ""
+    bits: int = 0
+
+
+@dataclass
+class SubscriptionEvent(EventSubEvent):
+    user_name: str = ""
+    tier: str = "1000"
+    gift: bool = False
+    months: int = 1
+    message: str = ""
+
+
+@dataclass
+class GiftEvent(EventSubEvent):
+    user_name: str = ""
+    tier: str = "1000"
+    total: int = 1
+
+
+@dataclass
+class RaidEvent(EventSubEvent):
+    from_user_name: str = ""
+    viewers: int = 0
+
+
+@dataclass
+class AdBreakEvent(EventSubEvent):
+    duration_seconds: int = 0
+    automatic: bool = False
+
+
+@dataclass
+class StreamStatusEvent(EventSubEvent):
+    online: bool = False
+
+
+_EVENT_FIELDS = {
+    "channel.cheer": (CheerEvent, lambda e: {
+        "user_name": e.get("user_name") or "Anonymous", "message": e.get("message", ""), "bits": int(e.get("bits", 0))}),
+    "channel.subscribe": (SubscriptionEvent, lambda e: {
+        "user_name": e.get("user_name", ""), "tier": e.get("tier", "1000"), "gift": bool(e.get("is_gift"))}),
+    "channel.subscription.message": (SubscriptionEvent, lambda e: {
+        "user_name": e.get("user_name", ""), "tier": e.get("tier", "1000"), "months": int(e.get("cumulative_months") or 1),
+        "message": (e.get("message") or {}).get("text", "")}),
+    "channel.subscription.gift": (GiftEvent, lambda e: {
+        "user_name": e.get("user_name") or "Anonymous", "tier": e.get("tier", "1000"), "total": int(e.get("total", 1))}),
+    "channel.raid": (RaidEvent, lambda e: {"from_user_name": e.get("from_broadcaster_user_name", ""), "viewers": int(e.get("viewers", 0))}),
+    "channel.ad_break.begin": (AdBreakEvent, lambda e: {
+        "duration_seconds": int(e.get("duration_seconds", 0)), "automatic": str(e.get("is_automatic")).lower() == "true"}),
+    "stream.online": (StreamStatusEvent, lambda e: {"online": True}),
+    "stream.offline": (StreamStatusEvent, lambda e: {"online": False}),
+}
+
+
+def event_from_notification(message):
+    """A "notification" message -> typed event (EventSubEvent for types without a class)."""
+    metadata, payload = message["metadata"], message["payload"]
+    event_type = metadata.get("subscription_type") or payload["subscription"]["type"]
+    data = payload.get("event", {})
+    common = {"type": event_type, "message_id": metadata["message_id"], "timestamp": _parse_timestamp(metadata.get("message_timestamp")), "data": data}
+    if event_type in _EVENT_FIELDS:
+        cls, fields = _EVENT_FIELDS[event_type]
+        try:
+            return cls(**common, **fields(data))
+        except (TypeError, ValueError):
+            pass  # malformed event; keep it untyped rather than losing it
+    return EventSubEvent(**common)
+
+
+# ======================
+# Event bus
+# ======================
+class Consumer:
+    POLICIES = ("block", "drop_oldest")
+
+    def __init__(self, name, handler, maxsize=256, policy="block", types=None, max_backlog=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown policy: {policy}")
+        self.name = name
+        self.handler = handler  # async callable(event)
+        self.maxsize = maxsize
+        self.policy = policy
+        self.types = set(types) if types else None  # None: every event
+        self.max_backlog = max_backlog if max_backlog is not None else maxsize * 8  # "block" only
+        self.queue = None
+        self.backlog = deque()  # "block" events that arrived while the queue was full, oldest first
+        self.delivered = 0
+        self.overflowed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.max_lag = 0.0  # received -> handled, seconds
+
+    def wants(self, event):
+        return self.types is None or event.type in self.types
+
+    def offer(self, event):
+        """Queues `event` without waiting, whatever the policy; called by the dispatcher."""
+        if self.policy == "drop_oldest":
+            if self.queue.full():
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.dropped += 1
+            self.queue.put_nowait(event)
+        elif self.backlog or self.queue.full():
+            # Behind the queue, in order; the consumer's own task moves it forward
+            self.overflowed += 1
+            if len(self.backlog) >= self.max_backlog:
+                self.backlog.popleft()
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 100 == 0:
+                    print(f"EventSub: Consumer {self.name} is {self.maxsize + self.max_backlog} events behind, {self.dropped} dropped so far")
+            self.backlog.append(event)
+        else:
+            self.queue.put_nowait(event)
+        self.max_depth = max(self.max_depth, self.queue.qsize() + len(self.backlog))
+
+    def refill(self):
+        """Moves backlog into the queue as far as it has room."""
+        while self.backlog and not self.queue.full():
+            self.queue.put_nowait(self.backlog.popleft())
+
+    def stats(self):
+        return {
+            "policy": self.policy, "depth": self.queue.qsize() if self.queue else 0, "backlog": len(self.backlog), "max_depth": self.max_depth,
+            "delivered": self.delivered, "overflowed": self.overflowed, "dropped": self.dropped, "failed": self.failed,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+        }
+
+
+class EventBus:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.published = 0
+        self._consumers = []
+        self._queue = None
+        self._tasks = []
+
+    def subscribe(self, name, handler, maxsize=256, policy="block", types=None, max_backlog=None):
+        consumer = Consumer(name, handler, maxsize, policy, types, max_backlog)
+        self._consumers.append(consumer)
+        if self._queue is not None:
+            self._start_consumer(consumer)
+        return consumer
+
+    async def start(self):
+        self._queue = asyncio.Queue(self.maxsize)
+        self._tasks.append(asyncio.create_task(self._dispatch()))
+        for consumer in self._consumers:
+            self._start_consumer(consumer)
+
+    def _start_consumer(self, consumer):
+        consumer.queue = asyncio.Queue(consumer.maxsize)
+        self._tasks.append(asyncio.create_task(self._consume(consumer)))
+
+    async def publish(self, event):
+        """Waits while the bus is full; that wait is the backpressure on the producer."""
+        await self._queue.put(event)
+        self.published += 1
+
+    async def _dispatch(self):
+        # Never waits on a consumer: one slow consumer must not delay the others
+        while True:
+            event = await self._queue.get()
+            for consumer in self._consumers:
+                if consumer.wants(event):
+                    consumer.offer(event)
+            self._queue.task_done()
+
+    async def _consume(self, consumer):
+        while True:
+            event = await consumer.queue.get()
+            try:
+                await consumer.handler(event)
+                consumer.delivered += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # one bad consumer must not stop the others
+                consumer.failed += 1
+                print(f"EventSub: Consumer {consumer.name} failed on {event.type}: {e!r}")
+            finally:
+                consumer.max_lag = max(consumer.max_lag, time.monotonic() - event.received_at)
+                consumer.refill()  # before task_done, so join() doesn't return with a backlog left
+                consumer.queue.task_done()
+
+    async def stop(self, timeout=2.0):
+        """Lets queued events drain for up to `timeout` seconds, then cancels the workers."""
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._drain(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _drain(self):
+        await self._queue.join()
+        for consumer in self._consumers:
+            await consumer.queue.join()
+
+    def stats(self):
+        return {
+            "published": self.published, "depth": self._queue.qsize() if self._queue else 0,
+            "consumers": {consumer.name: consumer.stats() for consumer in self._consumers},
+        }
+
+
+# ======================
+# Consumers
+# ======================
+class Coalescer:
+    """Folds events into a state with `reduce(state, event)` and hands it to `emit` at most every `interval` seconds.
+
+    `emit` is called from the event loop (a Qt signal's emit, say), with the
+    state accumulated since the previous call; nothing is emitted while idle.
+    """
+    def __init__(self, emit, reduce, interval=0.25):
+        self.emit = emit
+        self.reduce = reduce
+        self.interval = interval
+        self.emitted = 0
+        self._state = None
+        self._flush_handle = None
+
+    async def handle(self, event):
+        self._state = self.reduce(self._state, event)
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.interval, self._flush)
+
+    def _flush(self):
+        state, self._state, self._flush_handle = self._state, None, None
+        if state is not None:
+            self.emitted += 1
+            self.emit(state)
+
+
+class EventLogger:
+    """Appends every event as one JSON line (todo.md: log all incoming EventSub events)."""
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8", buffering=64 * 1024)
+        self._flush_scheduled = False
+
+    async def handle(self, event):
+        record = asdict(event)
+        record.pop("received_at", None)
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # One flush per burst rather than per event
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_later(0.5, self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        if not self._file.closed:
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class TTSBitsForwarder:
+    """Posts cheers to the TTS server's bits queue (POST /messages), retrying while it is unreachable."""
+    def __init__(self, server_url="http://127.0.0.1:8765", attempts=5, retry_delay=1.0):
+        self.server_url = server_url.rstrip("/")
+        self.attempts = attempts
+        self.retry_delay = retry_delay
+        self.forwarded = 0
+        self.lost = 0
+        self._session = None
+
+    async def handle(self, event):
+        if not isinstance(event, CheerEvent):
+            return
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5))
+        payload = {"sent_by": event.user_name, "text": event.message, "bits_amount": event.bits}
+        for attempt in range(self.attempts):
+            try:
+                async with self._session.post(f"{self.server_url}/messages", json=payload) as response:
+                    if response.status < 500:
+                        self.forwarded += 1
+                        return
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+            # While this waits further cheers collect in this consumer's queue and backlog
+            await asyncio.sleep(self.retry_delay * 2 ** attempt)
+        self.lost += 1
+        print(f"EventSub: TTS server unreachable, cheer from {event.user_name} ({event.bits} bits) not queued")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+# ======================
+# Client
+# ======================
+class EventSubClient:
+    def __init__(self, bus, client_id, token, broadcaster_id, url=EVENTSUB_WS_URL, subscriptions_url=EVENTSUB_SUBSCRIPTIONS_URL,
+                 subscriptions=SUBSCRIPTIONS, min_backoff=1.0, max_backoff=60.0, on_connection_changed=None):
+        if aiohttp is None:
+            raise RuntimeError("EventSubClient needs aiohttp")
+        self.bus = bus
+        self.client_id = client_id
+        self.token = token
+        self.broadcaster_id = broadcaster_id
+        self.url = url
+        self.subscriptions_url = subscriptions_url
+        self.subscriptions = subscriptions
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.on_connection_changed = on_connection_changed  # callable(bool)
+        self.session_id = None
+        self.notifications = 0
+        self.duplicates = 0
+        self._seen_ids = set()
+        self._seen_order = deque()
+        self._stopping = False
+        self._ws = None
+
+    async def run(self):
+        backoff = self.min_backoff
+        async with aiohttp.ClientSession() as session:
+            self._http = session
+            while not self._stopping:
+                try:
+                    await self._session(self.url)
+                    backoff = self.min_backoff
+                except (aiohttp.ClientError, OSError, asyncio.TimeoutError) as e:
+                    print(f"EventSub: Connection lost ({e!r})")
+                finally:
+                    if self.on_connection_changed is not None:
+                        self.on_connection_changed(False)
+                if self._stopping:
+                    break
+                self.session_id = None
+                delay = backoff * random.uniform(0.5, 1.0)
+                backoff = min(backoff * 2, self.max_backoff)
+                await asyncio.sleep(delay)
+
+    async def stop(self):
+        self._stopping = True
+        if self._ws is not None:
+            await self._ws.close()
+
+    async def _session(self, url):
+        """Reads one session until its connection is gone; session_reconnect moves it to a new connection without a gap."""
+        ws = await self._http.ws_connect(url, heartbeat=None)
+        keepalive = 10.0  # the welcome must arrive within 10 s
+        migration = None
+        try:
+            while True:
+                self._ws = ws
+                # Twitch promises a message at least every keepalive_timeout_seconds; silence means a dead connection.
+                # During a hand-off the old connection may go quiet, but stays open up to 30 s
+                msg = await asyncio.wait_for(ws.receive(), keepalive + 5 if migration is None else max(keepalive + 5, 35))
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    moved = await migration if migration is not None and not self._stopping else None
+                    migration = None
+                    if moved is None:
+                        return
+                    ws, welcome = moved
+                    keepalive = await self._on_welcome(welcome)
+                    continue
+                try:
+                    message = json.loads(msg.data)
+                    message_type = message["metadata"]["message_type"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if message_type == "session_welcome":
+                    keepalive = await self._on_welcome(message)
+                elif message_type == "notification":
+                    message_id = message["metadata"].get("message_id")
+                    if self._is_duplicate(message_id):
+                        self.duplicates += 1
+                        continue
+                    self.notifications += 1
+                    await self.bus.publish(event_from_notification(message))
+                elif message_type == "session_reconnect":
+                    if migration is None or migration.done():  # done here means the previous attempt failed
+                        migration = asyncio.create_task(self._migrate(message["payload"]["session"]["reconnect_url"], ws))
+                elif message_type == "revocation":
+                    subscription = message["payload"]["subscription"]
+                    print(f"EventSub: Subscription {subscription.get('type')} revoked ({subscription.get('status')})")
+        finally:
+            self._ws = None
+            if migration is not None:
+                migration.cancel()
+                moved = (await asyncio.gather(migration, return_exceptions=True))[0]
+                if isinstance(moved, tuple):
+                    await moved[0].close()
+            await ws.close()
+
+    async def _migrate(self, url, old_ws):
+        """Connects to a reconnect URL and waits for its welcome, then closes `old_ws`.
+
+        Meanwhile the old connection is still read, so nothing Twitch sends
+        during the hand-off is lost. Returns (new ws, welcome message), or
+        None if the new connection failed; Twitch then drops the old one and
+        run() starts over.
+        """
+        try:
+            ws = await self._http.ws_connect(url, heartbeat=None)
+        except (aiohttp.ClientError, OSError, asyncio.TimeoutError) as e:
+            print(f"EventSub: Could not follow session_reconnect ({e!r})")
+            return None
+        try:
+            msg = await ws.receive(timeout=30)  # Twitch keeps the old connection for 30 s
+            welcome = json.loads(msg.data) if msg.type == aiohttp.WSMsgType.TEXT else None
+            if welcome is None or welcome["metadata"]["message_type"] != "session_welcome":
+                raise ValueError(f"expected session_welcome, got {msg.type}")
+        except (asyncio.TimeoutError, ValueError, KeyError, TypeError) as e:
+            print(f"EventSub: Could not follow session_reconnect ({e!r})")
+            await ws.close()
+            return None
+        except asyncio.CancelledError:
+            await ws.close()
+            raise
+        await old_ws.close()  # wakes up the reader of the old connection
+        return ws, welcome
+
+    async def _on_welcome(self, message):
+        """Subscribes a new session, or resumes a migrated one; returns its keepalive timeout."""
+        session = message["payload"]["session"]
+        resumed = session["id"] == self.session_id
+        self.session_id = session["id"]
+        if not resumed:
+            await self._subscribe(session["id"])
+            if self.on_connection_changed is not None:
+                self.on_connection_changed(True)
+        print(f"EventSub: Session {'resumed' if resumed else 'started'} ({self.session_id})")
+        return float(session.get("keepalive_timeout_seconds") or 10)
+
+    def _is_duplicate(self, message_id):
+        # Twitch may deliver a notification more than once; remember the last 1000 ids
+        if message_id in self._seen_ids:
+            return True
+        self._seen_ids.add(message_id)
+        self._seen_order.append(message_id)
+        if len(self._seen_order) > 1000:
+            self._seen_ids.discard(self._seen_order.popleft())
+        return False
+
+    async def _subscribe(self, session_id):
+        headers = {"Client-Id": self.client_id, "Authorization": f"Bearer {self.token}"}
+        for subscription_type, version, condition_key in self.subscriptions:
+            body = {
+                "type": subscription_type,
+                "version": version,
+                "condition": {condition_key: self.broadcaster_id},
+                "transport": {"method": "websocket", "session_id": session_id},
+            }
+            async with self._http.post(self.subscriptions_url, json=body, headers=headers) as response:
+                if response.status >= 400:
+                    print(f"EventSub: Could not subscribe to {subscription_type}: {response.status} {await response.text()}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Print EventSub events as they arrive")
+    parser.add_argument("--url", default=EVENTSUB_WS_URL)
+    parser.add_argument("--subscriptions-url", default=EVENTSUB_SUBSCRIPTIONS_URL)
+    parser.add_argument("--creds", default=os.path.join("config", "creds.env"))
+    args = parser.parse_args()
+    creds = load_creds(args.creds)
+
+    async def main():
+        bus = EventBus()
+
+        async def print_event(event):
+            print(f"{event.type}: {json.dumps(event.data, ensure_ascii=False)}")
+
+        bus.subscribe("print", print_event)
+        await bus.start()
+        client = EventSubClient(bus, creds.get("TWITCH_CLIENT_ID", "mock"), creds.get("TWITCH_AUTH_TOKEN", "mock"), creds.get("TWITCH_BROADCASTER_ID", "0"),
+                                args.url, args.subscriptions_url)
+        try:
+            await client.run()
+        finally:
+            await bus.stop()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
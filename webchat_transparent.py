@@ -1,19 +1,48 @@
+import json
 import os
 import signal
 
 from PyQt6.QtCore import Qt, QUrl
-from PyQt6.QtWebEngineCore import QWebEnginePage
+from PyQt6.QtWebEngineCore import QWebEnginePage, QWebEngineScript
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWidgets import QWidget, QApplication
 
 # from PyQt6.QtWebEngineCore import QWebEngineSettings
 
-# Enable Developer Extras (Inspector)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (file, injection point): the cleanup engine must observe the page from the start,
+# the styling script needs <head> and the chat <section>
+CHAT_SCRIPTS = [
+    ("cleanup.js", QWebEngineScript.InjectionPoint.DocumentCreation),
+    ("transparent-bg.js", QWebEngineScript.InjectionPoint.DocumentReady),
+]
+
+
+def install_chat_scripts(page, max_lines=150):
+    """Registers the chat scripts on `page` so they run on every (re)load; call before setUrl."""
+    for script_file, injection_point in CHAT_SCRIPTS:
+        script_path = os.path.join(SCRIPT_DIR, script_file)
+        try:
+            with open(script_path, "r", encoding="utf-8") as f:
+                source = f.read()
+        except OSError as e:
+            print(f"Warning: {script_file} not loaded: {e}")
+            continue
+        if script_file == "cleanup.js":
+            source = f"window.__chatCleanupConfig = {json.dumps({'maxLines': max_lines})};\n{source}"
+        script = QWebEngineScript()
+        script.setName(script_file)
+        script.setSourceCode(source)
+        script.setInjectionPoint(injection_point)
+        script.setWorldId(QWebEngineScript.ScriptWorldId.MainWorld)
+        script.setRunsOnSubFrames(False)
+        page.scripts().insert(script)
+        print(f"Registered script: {script_file}")
 
-os.environ["QTWEBENGINE_REMOTE_DEBUGGING"] = "9222"  # Enable dev tools on port 9222
 
 class GameOverlay(QWidget):
-    def __init__(self, background_opacity: float = 0.5):
+    def __init__(self, background_opacity: float = 0.5, max_chat_lines: int = 150):
         super().__init__()
         # self.chat_url = "https://www.twitch.tv/popout/luality/chat?popout="
         # self.chat_url = "https://www.twitch.tv/popout/swol/chat?popout="
@@ -33,8 +62,9 @@ class GameOverlay(QWidget):
         # Initialize chat view
         self.chat_view = QWebEngineView(self)
         self.chat_view.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
-        self.chat_view.loadFinished.connect(self.injectScripts)
+        self.chat_view.loadFinished.connect(self.onLoadFinished)
         # a.loadFinished.connect(lambda success: print('hello page 2'))
+        install_chat_scripts(self.chat_view.page(), max_chat_lines)
         self.chat_view.setUrl(QUrl(self.chat_url))
         self.chat_view.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.chat_view.setStyleSheet("background: transparent;")
@@ -43,39 +73,26 @@ class GameOverlay(QWidget):
         """Resize chat overlay to fit window size."""
         self.chat_view.setGeometry(0, 0, self.width(), self.height())
 
-    def injectScripts(self, success):
-        """Loads and injects JS scripts into the page after load."""
+    def onLoadFinished(self, success):
+        """Scripts are already injected by QWebEngineScript (see install_chat_scripts)."""
         if not success:
             print("Page failed to load!")
             return
         print("Page loaded successfully!")
 
         self.chat_view.page().setBackgroundColor(Qt.GlobalColor.transparent)
+        self.chat_view.page().runJavaScript("window.__chatCleanupEngine && window.__chatCleanupEngine.stats", self.scriptStatsCallback)
 
-        script_files = ["cleanup.js", "transparent-bg.js"]
-        for script_file in script_files:
-            script_path = os.path.join(os.getcwd(), script_file)
-            print(f"Checking for script: {script_file} at {script_path}")
-
-            if os.path.exists(script_path):
-                try:
-                    with open(script_path, "r", encoding="utf-8") as script:
-                        js_code = script.read()
-                        print(f"Injecting script: {script_file}")
-                        self.chat_view.page().runJavaScript(js_code, self.scriptInjectCallback)
-                except Exception as e:
-                    print(f"Error reading {script_file}: {e}")
-            else:
-                print(f"Warning: {script_file} not found in the current directory.")
-
-    def scriptInjectCallback(self, result):
-        """ Callback to check script execution results. """
-        print(f"Script executed, result: {result}")
+    def scriptStatsCallback(self, result):
+        """ Callback with the cleanup engine's counters. """
+        print(f"Chat cleanup stats: {result}")
 
 
 if __name__ == "__main__":
     import sys
 
+    os.environ["QTWEBENGINE_REMOTE_DEBUGGING"] = "9222"  # Enable dev tools on port 9222
+
     app = QApplication(sys.argv)
 
     # Allow Ctrl+C to close the app